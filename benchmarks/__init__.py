@@ -0,0 +1,6 @@
+"""
+Benchmarks for the hot paths of nerf0, on synthetic histories (see benchmarks.generator).
+
+Run the full suite using `python -m benchmarks`; results are printed (or written) as JSON, such that regressions can be
+tracked over time.
+"""
@@ -0,0 +1,95 @@
+"""
+Runs the benchmark suite; see `python -m benchmarks --help`.
+"""
+
+import argparse
+import json
+import platform
+import sys
+from time import perf_counter
+
+from benchmarks.generator import DEFAULT_EDIT_MIX, EditMix
+from benchmarks.suite import BENCHMARKS, SkipBenchmark, make_history
+
+
+def run_benchmark(benchmark, history, repeat):
+    try:
+        run = benchmark(history)
+    except SkipBenchmark as e:
+        return {'skipped': str(e)}
+
+    timings = []
+    try:
+        for i in range(repeat):
+            start = perf_counter()
+            run()
+            timings.append(perf_counter() - start)
+    finally:
+        if hasattr(run, 'cleanup'):
+            run.cleanup()
+
+    timings.sort()
+    result = {
+        'min': timings[0],
+        'median': timings[len(timings) // 2],
+        'repeat': repeat,
+    }
+
+    if hasattr(run, 'units'):
+        # i.e. throughput, for benchmarks that do a known amount of work per run.
+        result['units'] = run.units
+        result['units_per_second'] = run.units / result['median'] if result['median'] else None
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks nerf0's hot paths on a synthetic history.")
+    parser.add_argument('--size', type=int, default=1000, help="the number of steps (edits or undos) in the history")
+    parser.add_argument('--width', type=int, default=10, help="the maximum number of children of any node")
+    parser.add_argument('--depth', type=int, default=4, help="the maximum depth of the tree")
+    parser.add_argument(
+        '--edit-mix', type=int, nargs=4, default=list(DEFAULT_EDIT_MIX), metavar=('INSERT_NODE', 'INSERT_TEXT',
+                                                                                  'REPLACE_TEXT', 'DELETE'),
+        help="relative weights of the various kinds of edits")
+    parser.add_argument('--undo-rate', type=float, default=0.05, help="the probability of a step being an undo")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help="the names of the benchmarks to run (default: all)")
+    parser.add_argument('--output', help="write the JSON results to this file (default: stdout)")
+    args = parser.parse_args()
+
+    parameters = {
+        'size': args.size,
+        'width': args.width,
+        'depth': args.depth,
+        'edit_mix': EditMix(*args.edit_mix),
+        'undo_rate': args.undo_rate,
+        'seed': args.seed,
+    }
+
+    history = make_history(**parameters)
+
+    results = {}
+    for name, benchmark in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+
+        results[name] = run_benchmark(benchmark, history, args.repeat)
+
+    report = {
+        'parameters': dict(parameters, edit_mix=parameters['edit_mix']._asdict(), repeat=args.repeat),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=4, sort_keys=True)
+        sys.stdout.write("\n")
+
+
+if __name__ == '__main__':
+    main()
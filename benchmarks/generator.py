@@ -0,0 +1,222 @@
+"""
+A deterministic generator of synthetic histories, for benchmarking.
+
+The generated histories are what an editing session in the editor would produce: a list of PosActs, in which each edit
+(an insertion, replacement or deletion somewhere in the tree) is bubbled up to the root, and followed by an Actuality.
+Branching is modelled as "undo": with probability `undo_rate`, instead of an edit, an Actuality for some earlier point
+in history is produced; any subsequent edits then branch off from that point.
+
+Editing sessions (sequences of EditNotes, as recorded by dsn.editor.session) can be generated as well; these are
+typing-heavy: mostly insertions and replacements of text around a wandering cursor.
+
+All randomness comes from a random.Random seeded with `seed`, i.e. equal parameters give equal histories.
+
+>>> posacts = generate_history(20, seed=3)
+>>> [pa.as_bytes() for pa in posacts] == [pa.as_bytes() for pa in generate_history(20, seed=3)]
+True
+>>> len([pa for pa in posacts if isinstance(pa, Actuality)])
+21
+"""
+
+import random
+from collections import namedtuple
+
+from hashstore import NoutHashStore
+from memoization import Memoization, Stores
+from posacts import Possibility, Actuality
+from s_address import node_for_s_address
+
+from dsn.editor.clef import CursorDFS, EDelete, InsertNodeChild, InsertNodeSibbling, TextInsert, TextReplace
+from dsn.editor.construct import edit_note_play
+from dsn.editor.structure import EditStructure
+from dsn.historiography.legato import HistoriographyNoteNoutHash, HistoriographyNoteNout, HistoriographyNoteCapo
+from dsn.s_expr.clef import BecomeNode, Delete
+from dsn.s_expr.construct_x import construct_x
+from dsn.s_expr.legato import NoteNout, NoteCapo, NoteSlur, NoteNoutHash
+from dsn.s_expr.structure import TreeNode, TreeText
+from dsn.s_expr.utils import bubble_history_up, calc_possibility, insert_node_at, insert_text_at, replace_text_at
+
+
+# Relative weights of the various kinds of edits.
+EditMix = namedtuple('EditMix', (
+    'insert_node',
+    'insert_text',
+    'replace_text',
+    'delete',
+))
+
+DEFAULT_EDIT_MIX = EditMix(insert_node=1, insert_text=4, replace_text=4, delete=1)
+
+
+def new_stores():
+    return Stores(
+        NoutHashStore(NoteNoutHash, NoteNout, NoteCapo),
+        NoutHashStore(HistoriographyNoteNoutHash, HistoriographyNoteNout, HistoriographyNoteCapo))
+
+
+def generate_history(size, width=10, depth=4, edit_mix=DEFAULT_EDIT_MIX, undo_rate=0.0, seed=0):
+    """Generates a history of `size` steps (edits or undos) as a list of PosActs.
+
+    * width: the maximum number of children of any node
+    * depth: the maximum depth of the tree (the root being at depth 0)
+    """
+    r = random.Random(seed)
+
+    stores = new_stores()
+    m = Memoization()
+
+    posacts = []
+    actualities = []
+
+    def emit(new_posacts):
+        for posact in new_posacts:
+            if isinstance(posact, Possibility):
+                stores.note_nout.add(posact.nout)
+            else:
+                actualities.append(posact.nout_hash)
+
+        posacts.extend(new_posacts)
+
+    # In the beginning, there is the empty root node (as in filehandler.initialize_history)
+    possibility, root_hash = calc_possibility(NoteSlur(BecomeNode(), NoteNoutHash.for_object(NoteCapo())))
+    emit([possibility, Actuality(root_hash)])
+
+    for i in range(size):
+        if len(actualities) > 1 and r.random() < undo_rate:
+            emit([Actuality(r.choice(actualities[:-1]))])
+        else:
+            tree = construct_x(m, stores, actualities[-1])
+            emit(random_edit(r, tree, width, depth, edit_mix, "t%s" % i))
+
+    return posacts
+
+
+def random_node_address(r, tree, depth):
+    """Returns the s_address of a random TreeNode in tree, no deeper than depth - 1."""
+    s_address = []
+    node = tree
+
+    while len(s_address) < depth - 1:
+        node_indices = [i for i, child in enumerate(node.children) if isinstance(child, TreeNode)]
+        choice = r.randrange(len(node_indices) + 1)
+
+        if choice == len(node_indices):
+            break  # i.e. stop descending
+
+        s_address.append(node_indices[choice])
+        node = node.children[node_indices[choice]]
+
+    return s_address
+
+
+def random_edit(r, tree, width, depth, edit_mix, text):
+    """Returns the posacts for a single random edit on tree"""
+    s_address = random_node_address(r, tree, depth)
+    node = node_for_s_address(tree, s_address)
+    text_indices = [i for i, child in enumerate(node.children) if isinstance(child, TreeText)]
+
+    candidates = []
+    if len(node.children) < width:
+        if len(s_address) < depth - 1:
+            candidates.append(('insert_node', edit_mix.insert_node))
+        candidates.append(('insert_text', edit_mix.insert_text))
+
+    if text_indices:
+        candidates.append(('replace_text', edit_mix.replace_text))
+
+    if node.children:
+        candidates.append(('delete', edit_mix.delete))
+
+    kind = _weighted_choice(r, [c for c in candidates if c[1] > 0] or candidates)
+
+    if kind == 'insert_node':
+        return insert_node_at(tree, s_address, r.randint(0, len(node.children)))
+
+    if kind == 'insert_text':
+        return insert_text_at(tree, s_address, r.randint(0, len(node.children)), text)
+
+    if kind == 'replace_text':
+        return replace_text_at(tree, s_address + [r.choice(text_indices)], text)
+
+    # implied: kind == 'delete'
+    possibility, hash_ = calc_possibility(NoteSlur(Delete(r.randrange(len(node.children))), node.metadata.nout_hash))
+    return [possibility] + bubble_history_up(hash_, tree, s_address)
+
+
+def generate_session(m, stores, nout_hash, size, seed=0):
+    """Generates an editing session of `size` EditNotes, starting at nout_hash with the cursor at the root.
+
+    The notes are played while generating (to know where the cursor is); i.e. the resulting Possibilities are added to
+    stores.
+    """
+    r = random.Random(seed)
+    structure = EditStructure(construct_x(m, stores, nout_hash), [], [], None)
+    edit_notes = []
+
+    for i in range(size):
+        edit_note = random_edit_note(r, structure, "s%s" % i)
+        edit_notes.append(edit_note)
+
+        new_s_cursor, posacts, error = edit_note_play(structure, edit_note)
+
+        tree = structure.tree
+        for posact in posacts:
+            if isinstance(posact, Possibility):
+                stores.note_nout.add(posact.nout)
+            else:
+                tree = construct_x(m, stores, posact.nout_hash)
+
+        structure = EditStructure(tree, new_s_cursor, [], None)
+
+    return edit_notes
+
+
+def random_edit_note(r, structure, text):
+    s_cursor = structure.s_cursor
+    cursor_node = node_for_s_address(structure.tree, s_cursor)
+
+    candidates = [('cursor_dfs', 2), ('insert_text', 4), ('insert_node', 1)]
+    if isinstance(cursor_node, TreeText):
+        candidates.append(('replace_text', 4))
+    if s_cursor != []:
+        candidates.append(('delete', 1))
+
+    kind = _weighted_choice(r, candidates)
+
+    if kind == 'cursor_dfs':
+        return CursorDFS(r.choice([-1, 1]))
+
+    if kind == 'insert_text':
+        if isinstance(cursor_node, TreeNode):
+            return TextInsert(s_cursor, len(cursor_node.children), text)
+        return TextInsert(s_cursor[:-1], s_cursor[-1] + 1, text)
+
+    if kind == 'insert_node':
+        if isinstance(cursor_node, TreeNode):
+            return InsertNodeChild()
+        return InsertNodeSibbling(1)
+
+    if kind == 'replace_text':
+        return TextReplace(s_cursor, text)
+
+    # implied: kind == 'delete'
+    return EDelete()
+
+
+def _weighted_choice(r, weighted_options):
+    total = sum(weight for option, weight in weighted_options)
+    pick = r.uniform(0, total)
+
+    for option, weight in weighted_options:
+        pick -= weight
+        if pick <= 0:
+            return option
+
+    return weighted_options[-1][0]
+
+
+def write_history(filename, posacts):
+    """Writes posacts in the format of the editor's files (see filehandler)"""
+    with open(filename, 'wb') as f:
+        for posact in posacts:
+            f.write(posact.as_bytes())
@@ -0,0 +1,71 @@
+"""
+Measures the memory/latency trade-off of Memoization's checkpoint_stride for construct_x on a synthetic history.
+
+For each stride k we measure:
+
+* the time it takes to construct the full history once (all misses)
+* the number of stored structures and the memory (as measured by tracemalloc) that they take up
+* the mean latency of construct_x for random points in the history (i.e. the cost of replaying from a checkpoint)
+
+Usage: python -m benchmarks.memoization_stride [SIZE] [STRIDE ...]
+"""
+
+import random
+import tracemalloc
+from sys import argv
+from time import perf_counter
+
+from memoization import Memoization
+from posacts import Possibility, Actuality
+
+from dsn.s_expr.construct_x import construct_x
+
+from benchmarks.generator import generate_history, new_stores
+
+
+def measure(stride, size, lookups=200):
+    stores = new_stores()
+
+    posacts = generate_history(size, width=size, depth=1)
+    for posact in posacts:
+        if isinstance(posact, Possibility):
+            stores.note_nout.add(posact.nout)
+
+    # i.e. all points in the (linear, root-level) history
+    nout_hashes = [posact.nout_hash for posact in posacts if isinstance(posact, Actuality)]
+
+    m = Memoization(checkpoint_stride=stride)
+    m.construct_x.pin(nout_hashes[-1])  # the present, as the editor's PinningActualityListener would
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    start = perf_counter()
+    construct_x(m, stores, nout_hashes[-1])
+    full_construction = perf_counter() - start
+
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    r = random.Random(1)
+    start = perf_counter()
+    for i in range(lookups):
+        construct_x(m, stores, r.choice(nout_hashes))
+    lookup_latency = (perf_counter() - start) / lookups
+
+    return len(m.construct_x), memory, full_construction, lookup_latency
+
+
+def main():
+    size = int(argv[1]) if len(argv) > 1 else 10000
+    strides = [int(a) for a in argv[2:]] or [1, 2, 4, 8, 16, 32, 64, 128]
+
+    print("%8s %10s %14s %14s %18s" % ("stride", "stored", "memory (KiB)", "full (s)", "lookup (ms)"))
+    for stride in strides:
+        stored, memory, full_construction, lookup_latency = measure(stride, size)
+        print("%8d %10d %14.1f %14.3f %18.3f" % (
+            stride, stored, memory / 1024, full_construction, lookup_latency * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,861 @@
+"""
+The benchmarks of the hot paths.
+
+Each benchmark is a function that takes a History, does any required setup, and returns a callable that does the
+actual (timed) work. Benchmarks that cannot run in the present environment raise SkipBenchmark. The callable may have a
+`units` attribute: the amount of work done per run, from which a throughput is reported.
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+
+from channel import Channel, ClosableChannel
+from filehandler import read_from_file
+from memoization import Memoization
+from posacts import Possibility, Actuality, HashStoreChannelListener, LatestActualityListener
+from s_address import node_for_s_address, s_dfs
+
+from dsn.form_analysis.constants import VT_INTEGER
+from dsn.form_analysis.construct import construct_form
+from dsn.form_analysis.addressed_compiler import evaluate_addressed
+from dsn.form_analysis.bytecode import compile_code, evaluate_bytecode, run_code
+from dsn.form_analysis.compiler import evaluate_compiled
+from dsn.form_analysis.evaluator import builtins_frame, evaluate
+from dsn.form_analysis.stack_evaluator import evaluate as evaluate_with_stack
+from dsn.form_analysis.free_variables import construct_free_variables, free_variables, memoized_free_variables
+from dsn.form_analysis.incremental_evaluation import evaluate_incrementally
+from dsn.form_analysis.into import construct_form_note
+from dsn.form_analysis.lexical_addressing_x import (
+    calculate_name_closure,
+    construct_lambda_tree,
+    construct_lambda_tree_memoized,
+    construct_most_complete_lambda_tree,
+    construct_most_complete_lambda_tree_memoized,
+)
+from dsn.form_analysis.loosely_coupled import analysis_graph, tick
+from dsn.form_analysis.name_closures import construct_name_closures, name_closure
+from dsn.form_analysis.structure import (
+    ApplicationForm,
+    DefineForm,
+    FormList,
+    IfForm,
+    LambdaForm,
+    SequenceForm,
+    Symbol,
+    SymbolList,
+    ValueForm,
+    VariableForm,
+)
+from dsn.form_analysis.unused_definitions import construct_unused_definitions, unused_definitions
+from dsn.editor.session import read_session, replay_session, write_session
+from dsn.historiography.clef import SetNoteNoutHash
+from dsn.historiography.legato import HistoriographyNoteSlur, HistoriographyNoteNoutHash, HistoriographyNoteCapo
+from dsn.s_expr.concoct import concoct_history
+from dsn.s_expr.construct_x import construct_x
+from dsn.s_expr.construct_y import construct_y_from_scratch
+from dsn.s_expr.from_python import s_expr_from_python
+from dsn.s_expr.h_utils import view_past_from_present
+from dsn.s_expr.merge_checks import check_double_edges
+from dsn.s_expr.clef import TextBecome
+from dsn.s_expr.test_utils import iinsert
+from dsn.s_expr.unambiguous_weaving import is_valid_double_edge, uw_double_edge, uw_multi_edge
+from dsn.s_expr.structure import TreeText
+from dsn.s_expr.utils import nouts_for_notes, nouts_for_notes_da_capo, replace_text_at, weave_many_disjoint_replaces
+
+from benchmarks.generator import generate_history, generate_session, new_stores, write_history
+
+
+History = namedtuple('History', (
+    'posacts',
+    'stores',  # Stores, with all possibilities already added
+
+    # the nout_hashes of all Actualities, in order
+    'actualities',
+))
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+def make_history(**generator_parameters):
+    posacts = generate_history(**generator_parameters)
+
+    stores = new_stores()
+    for posact in posacts:
+        if isinstance(posact, Possibility):
+            stores.note_nout.add(posact.nout)
+
+    return History(posacts, stores, [pa.nout_hash for pa in posacts if isinstance(pa, Actuality)])
+
+
+def historiography_note_nout_for(nout_hash):
+    # As the HistoryWidget does it
+    return HistoriographyNoteSlur(
+        SetNoteNoutHash(nout_hash),
+        HistoriographyNoteNoutHash.for_object(HistoriographyNoteCapo()),
+    )
+
+
+def file_load(history):
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    write_history(filename, history.posacts)
+
+    def run():
+        history_channel = ClosableChannel()
+        HashStoreChannelListener(history_channel)
+        LatestActualityListener(history_channel)
+        read_from_file(filename, history_channel)
+
+    run.cleanup = lambda: os.remove(filename)
+    return run
+
+
+def cli_startup(history):
+    """Runs `nerf.py stats` (start, load, construct, report) as a separate process."""
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    write_history(filename, history.posacts)
+
+    nerf_py = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nerf.py')
+
+    def run():
+        subprocess.check_call([sys.executable, nerf_py, 'stats', filename], stdout=subprocess.DEVNULL)
+
+    run.cleanup = lambda: os.remove(filename)
+    return run
+
+
+def typing_session(history, size=200):
+    """Replays a recorded (generated) editing session on top of the final Actuality, headlessly, as the TreeWidget
+    would play it: i.e. end-to-end edit latency, minus rendering."""
+    nout_hash = history.actualities[-1]
+    edit_notes = generate_session(Memoization(), history.stores, nout_hash, size)
+
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    write_session(filename, nout_hash, edit_notes)
+
+    def run():
+        history_channel = Channel()
+        history_channel.connect(
+            lambda posact: history.stores.note_nout.add(posact.nout) if isinstance(posact, Possibility) else None)
+
+        for structure in replay_session(Memoization(), history.stores, history_channel, *read_session(filename)):
+            pass
+
+    run.cleanup = lambda: os.remove(filename)
+    return run
+
+
+def construct_x_incremental(history):
+    """construct_x for each Actuality in order, as the TreeWidget does it."""
+    def run():
+        m = Memoization()
+        for nout_hash in history.actualities:
+            construct_x(m, history.stores, nout_hash)
+
+    return run
+
+
+def construct_x_cold(history):
+    """construct_x for the final Actuality only, without any memoized results."""
+    def run():
+        construct_x(Memoization(), history.stores, history.actualities[-1])
+
+    return run
+
+
+def construct_y_cold(history):
+    def run():
+        construct_y_from_scratch(Memoization(), history.stores, history.actualities[-1])
+
+    return run
+
+
+def view_past_from_present_tail(history, tail=20):
+    """view_past_from_present for the last few Actualities, sharing memoization, as the HistoryWidget does it."""
+    def run():
+        m = Memoization()
+        for nout_hash in history.actualities[-tail:]:
+            view_past_from_present(m, history.stores, historiography_note_nout_for(nout_hash), nout_hash)
+
+    return run
+
+
+def diverging_branches(history, branch_size):
+    """Returns (pod, nout_hash_0, nout_hash_1) for 2 branches of insertions (at both ends of the root respectively)
+    that diverge at the final Actuality."""
+    p = history.stores.note_nout
+
+    # Make sure the root has at least a single child as a reference point for the insertions at both ends.
+    reference, = nouts_for_notes([iinsert(p, 0, [TextBecome("reference")])], history.actualities[-1])
+    pod = p.add(reference.nout)
+    root_length = len(construct_x(Memoization(), history.stores, pod).children)
+
+    def branch(index_for_i):
+        nout_hash = pod
+        for nh in nouts_for_notes(
+                [iinsert(p, index_for_i(i), [TextBecome("b%s" % i)]) for i in range(branch_size)], pod):
+            nout_hash = p.add(nh.nout)
+        return nout_hash
+
+    return pod, branch(lambda i: 0), branch(lambda i: root_length + i)
+
+
+def uw_double_edge_branches(history):
+    """Weaves 2 branches (of insertions at both ends of the root) that diverge at the final Actuality."""
+    p = history.stores.note_nout
+    branch_size = max(1, len(history.actualities) // 10)
+
+    pod, nout_hash_0, nout_hash_1 = diverging_branches(history, branch_size)
+    ordering_mechanism = [0, 1] * branch_size
+
+    def run():
+        for posact in uw_double_edge(Memoization(), history.stores, pod, nout_hash_0, nout_hash_1, ordering_mechanism):
+            if isinstance(posact, Possibility):
+                p.add(posact.nout)
+
+    return run
+
+
+def uw_validate_long_branches(history, branch_size=10000):
+    """Validates (but does not weave) 2 long branches that diverge at the final Actuality."""
+    pod, nout_hash_0, nout_hash_1 = diverging_branches(history, branch_size)
+
+    def run():
+        ok, problems = is_valid_double_edge(Memoization(), history.stores, pod, nout_hash_0, nout_hash_1)
+        assert ok, problems
+
+    return run
+
+
+def uw_multi_edge_branches(history, branch_count=8):
+    """Weaves a number of branches (each inserting next to its own reference child of the root) that diverge at the
+    final Actuality; the pod is calculated, and all pairs of branches are validated."""
+    p = history.stores.note_nout
+    branch_size = max(1, len(history.actualities) // 10)
+
+    pod = history.actualities[-1]
+    for nh in nouts_for_notes(
+            [iinsert(p, 0, [TextBecome("reference %s" % i)]) for i in reversed(range(branch_count))], pod):
+        pod = p.add(nh.nout)
+
+    def branch(i):
+        nout_hash = pod
+        for nh in nouts_for_notes(
+                [iinsert(p, i + 1 + j, [TextBecome("b%s.%s" % (i, j))]) for j in range(branch_size)], pod):
+            nout_hash = p.add(nh.nout)
+        return nout_hash
+
+    nout_hashes = [branch(i) for i in range(branch_count)]
+
+    def run():
+        for posact in uw_multi_edge(Memoization(), history.stores, nout_hashes):
+            if isinstance(posact, Possibility):
+                p.add(posact.nout)
+
+    return run
+
+
+def merge_checks_batch(history, branch_count=16):
+    """Checks all pairs of a number of (short) branches that diverge at the final Actuality using the process pool."""
+    p = history.stores.note_nout
+    pod = history.actualities[-1]
+    root_length = len(construct_x(Memoization(), history.stores, pod).children)
+
+    branches = []
+    for i in range(branch_count):
+        for nh in nouts_for_notes([iinsert(p, i % (root_length + 1), [TextBecome("b%s" % i)])], pod):
+            branches.append(p.add(nh.nout))
+
+    triples = [(pod, branches[i], branches[j]) for i in range(branch_count) for j in range(i + 1, branch_count)]
+
+    def run():
+        check_double_edges(history.stores, triples)
+
+    return run
+
+
+def weave_many(history):
+    """Replaces all texts in the final tree at once (hundreds of concurrent edits, for the default size)."""
+    p = history.stores.note_nout
+    tree = construct_x(Memoization(), history.stores, history.actualities[-1])
+
+    replacements = []
+    for s_address in s_dfs(tree, []):
+        if isinstance(node_for_s_address(tree, s_address), TreeText):
+            for nh in nouts_for_notes_da_capo([TextBecome("w%s" % len(replacements))]):
+                p.add(nh.nout)
+            replacements.append((s_address, nh.nout_hash))
+
+    def run():
+        weave_many_disjoint_replaces(tree, replacements)
+
+    return run
+
+
+def construct_form_note_cold(history):
+    def run():
+        construct_form_note(Memoization(), history.stores, history.actualities[-1])
+
+    return run
+
+
+ProgramHistory = namedtuple('ProgramHistory', (
+    'stores',
+
+    # the nout_hashes of the (s-expr) Actualities, in order
+    's_expr_nout_hashes',
+
+    # the nout_hashes of the form notes for each Actuality, in order
+    'form_nout_hashes',
+))
+
+
+# Texts that a keystroke in a program (see program_history) may produce
+PROGRAM_NAMES = ["a", "b", "c", "x", "y", "1"]
+
+
+def program_s_expr(function_count):
+    """A program of function_count (mutually dependent) function definitions, as input for s_expr_from_python"""
+    return ("lambda", ()) + tuple(
+        ("define", "f%s" % i, ("lambda", ("a", "b"),
+            ("define", "c", ("*", "a", "x")),
+            ("if", ("<", "a", "b"), ("+", "a", ("f%s" % (i - 1), "b", "c")), "y")))
+        for i in range(function_count))
+
+
+def _is_program_name(node):
+    return isinstance(node, TreeText) and node.unicode_ in PROGRAM_NAMES
+
+
+_program_histories = {}
+
+
+def program_history(history, seed=0):
+    """The history of editing a large program: a program with a function for each 10 Actualities in history, followed
+    by as many "keystrokes" as history has Actualities. Each keystroke replaces one of the program's names (or numbers)
+    with another one, i.e. the program's structure stays intact (`into` does not support all possible s-expressions; the
+    synthetic history itself therefore cannot be used as a program)."""
+    return _program_history(len(history.actualities), seed)
+
+
+def _program_history(size, seed=0):
+    if size not in _program_histories:
+        r = random.Random(seed)
+        m = Memoization()
+        stores = new_stores()
+
+        nout_hash = concoct_history(m, stores, s_expr_from_python(program_s_expr(max(1, size // 10))))[-1].nout_hash
+        tree = construct_x(m, stores, nout_hash)
+        s_addresses = [sa for sa in s_dfs(tree, []) if _is_program_name(node_for_s_address(tree, sa))]
+
+        s_expr_nout_hashes = [nout_hash]
+        form_nout_hashes = [construct_form_note(m, stores, nout_hash)[1]]
+        for i in range(size):
+            tree = construct_x(m, stores, nout_hash)
+            for posact in replace_text_at(tree, r.choice(s_addresses), r.choice(PROGRAM_NAMES)):
+                if isinstance(posact, Possibility):
+                    stores.note_nout.add(posact.nout)
+                else:
+                    nout_hash = posact.nout_hash
+
+            s_expr_nout_hashes.append(nout_hash)
+            form_nout_hashes.append(construct_form_note(m, stores, nout_hash)[1])
+
+        _program_histories[size] = ProgramHistory(stores, s_expr_nout_hashes, form_nout_hashes)
+
+    return _program_histories[size]
+
+
+def into_throughput(history):
+    """The translation of s-expr notes into form notes, for each keystroke of program_history in order (starting with a
+    cold Memoization); the units are the s-expr notes translated."""
+    program = program_history(history)
+
+    def translate():
+        m = Memoization()
+        for nout_hash in program.s_expr_nout_hashes:
+            construct_form_note(m, program.stores, nout_hash)
+        return m
+
+    def run():
+        translate()
+
+    m = translate()
+    run.units = len(m.construct_form_note) + len(m.construct_atom_note) + len(m.construct_atom_list_note)
+    return run
+
+
+def analyze_session(history):
+    """`nerf.py analyze` (in-process, output discarded) on a file with an Actuality for each keystroke of
+    program_history; the units are Actualities."""
+    from nerf import StreamingAnalysis
+
+    program = program_history(history)
+    p = program.stores.note_nout
+
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    write_history(filename, [Possibility(p.get(h)) for h in p.previous_hashes] + [
+        Actuality(nout_hash) for nout_hash in program.s_expr_nout_hashes])
+
+    def run():
+        with open(os.devnull, 'w') as devnull:
+            StreamingAnalysis(devnull).read(filename)
+
+    run.units = len(program.s_expr_nout_hashes)
+    run.cleanup = lambda: os.remove(filename)
+    return run
+
+
+def free_variables_incremental(history):
+    """The incremental analysis of free variables for each keystroke of program_history in order, i.e. the per-keystroke
+    cost of keeping the analysis up to date."""
+    program = program_history(history)
+
+    def run():
+        m = Memoization()
+        for form_nout_hash in program.form_nout_hashes:
+            construct_free_variables(m, program.stores, form_nout_hash)
+
+    return run
+
+
+def free_variables_structural(history):
+    """As free_variables_incremental, but analysing the constructed form from scratch for each keystroke."""
+    program = program_history(history)
+
+    def run():
+        m = Memoization()
+        for form_nout_hash in program.form_nout_hashes:
+            free_variables(construct_form(m, program.stores, form_nout_hash))
+
+    return run
+
+
+def free_variables_memoized(history):
+    """As free_variables_structural, but with the analysis memoized per form (by nout_hash), i.e. analysing only the
+    edited forms (and their ancestors) anew."""
+    program = program_history(history)
+
+    def run():
+        m = Memoization()
+        for form_nout_hash in program.form_nout_hashes:
+            memoized_free_variables(m, construct_form(m, program.stores, form_nout_hash))
+
+    return run
+
+
+def unused_definitions_incremental(history):
+    """The incremental analysis of unused definitions (of the program's outermost lambda) for each keystroke of
+    program_history, i.e. the per-keystroke cost of keeping e.g. a sidebar with unused definitions up to date."""
+    program = program_history(history)
+
+    def run():
+        m = Memoization()
+        for form_nout_hash in program.form_nout_hashes:
+            construct_unused_definitions(m, program.stores, form_nout_hash)
+
+    return run
+
+
+def unused_definitions_structural(history):
+    program = program_history(history)
+
+    def run():
+        m = Memoization()
+        for form_nout_hash in program.form_nout_hashes:
+            unused_definitions(construct_form(m, program.stores, form_nout_hash))
+
+    return run
+
+
+def _program_forms(history):
+    return _forms_for(program_history(history))
+
+
+def _forms_for(program):
+    m = Memoization()
+    return [construct_form(m, program.stores, form_nout_hash) for form_nout_hash in program.form_nout_hashes]
+
+
+def loosely_coupled_incremental(history):
+    """The loosely coupled analyses (one clock tick per keystroke of program_history), each tick building on the
+    previous one; the forms themselves are constructed before timing."""
+    forms = _program_forms(history)
+
+    def run():
+        tree = None
+        for current_time, form in enumerate(forms):
+            tree, work = tick(analysis_graph, tree, form, current_time)
+
+    return run
+
+
+def loosely_coupled_from_scratch(history):
+    """As loosely_coupled_incremental, but without reusing the previous tick's analyses."""
+    forms = _program_forms(history)
+
+    def run():
+        for current_time, form in enumerate(forms):
+            tick(analysis_graph, None, form, current_time)
+
+    return run
+
+
+def _most_complete_trees(size, keystrokes):
+    forms = _forms_for(_program_history(size))[:keystrokes + 1]
+    return [construct_most_complete_lambda_tree(construct_lambda_tree(form)) for form in forms]
+
+
+def _scopes(tree):
+    yield tree
+    for child in tree.children:
+        yield from _scopes(child)
+
+
+def name_closures_per_name(history, size=300, keystrokes=10):
+    """calculate_name_closure for each name (that has a lexical address) in each scope, for the first keystrokes of
+    the program_history for the given size (rather than that of history: the cost per keystroke grows with the cube of
+    the program's size); the MostCompleteLambdaTrees are constructed before timing."""
+    trees = _most_complete_trees(size, keystrokes)
+
+    def run():
+        for tree in trees:
+            for scope in _scopes(tree):
+                for name, address in scope.lexical_addresses.items():
+                    if address is not None:
+                        calculate_name_closure(scope, name)
+
+    return run
+
+
+def name_closures_all(history, size=300, keystrokes=10):
+    """As name_closures_per_name, but using name_closures.py: all closures at once, reusing the previous keystroke's"""
+    trees = _most_complete_trees(size, keystrokes)
+
+    def run():
+        m = Memoization()
+        for tree in trees:
+            closures_tree = construct_name_closures(m, tree)
+            for scope, closures in zip(_scopes(tree), _scopes(closures_tree)):
+                for name, address in scope.lexical_addresses.items():
+                    if address is not None:
+                        name_closure(closures, name)
+
+    return run
+
+
+def nested_lambdas_s_expr(function_count, depth):
+    """A program of function_count function definitions, each consisting of depth nested lambdas (with a definition
+    in each of them), as input for s_expr_from_python"""
+    definitions = []
+    for i in range(function_count):
+        form = ("f%s" % (i - 1), "a", "b")
+        for level in range(depth):
+            form = ("lambda", ("a" if level % 2 == 0 else "b",), ("define", "c", ("+", "a", "y")), form)
+        definitions.append(("define", "f%s" % i, form))
+
+    return ("lambda", ()) + tuple(definitions)
+
+
+def _nested_lambdas_program_forms(function_count, depth, edit_count, seed=0):
+    """The forms of nested_lambdas_s_expr, and of edit_count edits of it; each edit replaces one of the program's
+    names (or numbers) with another one (as in program_history)."""
+    r = random.Random(seed)
+    m = Memoization()
+    stores = new_stores()
+
+    nout_hash = concoct_history(m, stores, s_expr_from_python(
+        nested_lambdas_s_expr(function_count, depth)))[-1].nout_hash
+    tree = construct_x(m, stores, nout_hash)
+    s_addresses = [sa for sa in s_dfs(tree, []) if _is_program_name(node_for_s_address(tree, sa))]
+
+    result = [construct_form(m, stores, construct_form_note(m, stores, nout_hash)[1])]
+    for i in range(edit_count):
+        posacts = replace_text_at(construct_x(m, stores, nout_hash), r.choice(s_addresses), r.choice(PROGRAM_NAMES))
+        for posact in posacts:
+            if isinstance(posact, Possibility):
+                stores.note_nout.add(posact.nout)
+        nout_hash = posacts[-1].nout_hash
+        result.append(construct_form(m, stores, construct_form_note(m, stores, nout_hash)[1]))
+
+    return result
+
+
+def lexical_addressing_from_scratch(history, function_count=100, depth=4, edit_count=50):
+    """The MostCompleteLambdaTree (i.e. lexical addresses and name dependencies) of a program with function_count *
+    depth nested lambdas, after each of a number of edits; the units are the edits."""
+    forms = _nested_lambdas_program_forms(function_count, depth, edit_count)
+
+    def run():
+        for form in forms:
+            construct_most_complete_lambda_tree(construct_lambda_tree(form))
+
+    run.units = len(forms)
+    return run
+
+
+def lexical_addressing_memoized(history, function_count=100, depth=4, edit_count=50):
+    """As lexical_addressing_from_scratch, memoized per lambda, i.e. recalculating only for the edited lambdas (and
+    those that enclose them)."""
+    forms = _nested_lambdas_program_forms(function_count, depth, edit_count)
+
+    def run():
+        m = Memoization()
+        for form in forms:
+            construct_most_complete_lambda_tree_memoized(m, construct_lambda_tree_memoized(m, form))
+
+    run.units = len(forms)
+    return run
+
+
+def _v(symbol):
+    return VariableForm(Symbol(symbol))
+
+
+def _apply(procedure, *arguments):
+    return ApplicationForm(_v(procedure), FormList(list(arguments)))
+
+
+def _fib_program(n):
+    return SequenceForm(FormList([
+        DefineForm(Symbol("fib"), LambdaForm(SymbolList([Symbol("n")]), FormList([IfForm(
+            _apply("<", _v("n"), ValueForm(VT_INTEGER, 2)),
+            _v("n"),
+            _apply(
+                "+",
+                _apply("fib", _apply("-", _v("n"), ValueForm(VT_INTEGER, 1))),
+                _apply("fib", _apply("-", _v("n"), ValueForm(VT_INTEGER, 2)))),
+        )]))),
+        _apply("fib", ValueForm(VT_INTEGER, n)),
+    ]))
+
+
+def _fact_program(n, times):
+    """As in examples/factorial.lisp, (fact n) is calculated, `times` times over"""
+    return SequenceForm(FormList([
+        DefineForm(Symbol("fact"), LambdaForm(SymbolList([Symbol("n")]), FormList([IfForm(
+            _apply("=", _v("n"), ValueForm(VT_INTEGER, 1)),
+            ValueForm(VT_INTEGER, 1),
+            _apply("*", _v("n"), _apply("fact", _apply("-", _v("n"), ValueForm(VT_INTEGER, 1))))
+        )]))),
+    ] + [_apply("fact", ValueForm(VT_INTEGER, n)) for i in range(times)]))
+
+
+def evaluation(history, n=16):
+    """Evaluates (fib n) using the tree-walking evaluator; the history itself is not used."""
+    program = _fib_program(n)
+
+    def run():
+        evaluate(program, builtins_frame())
+
+    return run
+
+
+def evaluation_compiled(history, n=16):
+    """As evaluation, but compiling to closures first (the compilation is part of the timed work)"""
+    program = _fib_program(n)
+
+    def run():
+        evaluate_compiled(Memoization(), program, builtins_frame())
+
+    return run
+
+
+def factorial_evaluation(history, n=100, times=100):
+    program = _fact_program(n, times)
+
+    def run():
+        evaluate(program, builtins_frame())
+
+    return run
+
+
+def factorial_compiled(history, n=100, times=100):
+    program = _fact_program(n, times)
+
+    def run():
+        evaluate_compiled(Memoization(), program, builtins_frame())
+
+    return run
+
+
+def evaluation_stack(history, n=16):
+    """As evaluation, but using the evaluator with an explicit stack"""
+    program = _fib_program(n)
+
+    def run():
+        evaluate_with_stack(program, builtins_frame())
+
+    return run
+
+
+def evaluation_addressed(history, n=16):
+    """As evaluation_compiled, but with lexically addressed (array-backed) frames"""
+    program = _fib_program(n)
+
+    def run():
+        evaluate_addressed(program)
+
+    return run
+
+
+def factorial_addressed(history, n=100, times=100):
+    program = _fact_program(n, times)
+
+    def run():
+        evaluate_addressed(program)
+
+    return run
+
+
+def evaluation_bytecode(history, n=16):
+    """As evaluation_compiled, but compiling to bytecode for the VM in bytecode.py"""
+    program = _fib_program(n)
+
+    def run():
+        evaluate_bytecode(program, builtins_frame())
+
+    return run
+
+
+def factorial_bytecode(history, n=100, times=100):
+    program = _fact_program(n, times)
+
+    def run():
+        evaluate_bytecode(program, builtins_frame())
+
+    return run
+
+
+def factorial_bytecode_precompiled(history, n=100, times=100):
+    """As factorial_bytecode, but the compilation (as when the bytecode is read from the cache) is not timed"""
+    code = compile_code(_fact_program(n, times))
+
+    def run():
+        run_code(code, builtins_frame())
+
+    return run
+
+
+def _definitions_program_forms(definition_count, edit_count, seed=0):
+    """The forms of a program of definition_count (fib 10)-based values (each depending on the one 10 places before it),
+    and of edit_count edits of it; each edit changes the argument to fib in one of the definitions."""
+    r = random.Random(seed)
+    m = Memoization()
+    stores = new_stores()
+
+    fib = ("define", "fib", ("lambda", ("n",), ("if", ("<", "n", "2"), "n", (
+        "+", ("fib", ("-", "n", "1")), ("fib", ("-", "n", "2"))))))
+    definitions = tuple(
+        ("define", "d%s" % i, ("+", ("fib", "10"), "d%s" % (i - 10) if i >= 10 else "0"))
+        for i in range(definition_count))
+
+    nout_hash = concoct_history(m, stores, s_expr_from_python(("begin", fib) + definitions))[-1].nout_hash
+
+    result = [construct_form(m, stores, construct_form_note(m, stores, nout_hash)[1])]
+    for i in range(edit_count):
+        # [2 + i, 2, 1, 1]: the argument of fib in the (i - 2)th definition
+        posacts = replace_text_at(construct_x(m, stores, nout_hash), [2 + r.randrange(definition_count), 2, 1, 1],
+                                  r.choice(["9", "10"]))
+        for posact in posacts:
+            if isinstance(posact, Possibility):
+                stores.note_nout.add(posact.nout)
+        nout_hash = posacts[-1].nout_hash
+        result.append(construct_form(m, stores, construct_form_note(m, stores, nout_hash)[1]))
+
+    return result
+
+
+def incremental_evaluation(history, definition_count=100, edit_count=20):
+    """Evaluation of a program after each of a number of edits, re-evaluating only the changed definitions and those
+    that depend on them; the units are the edits."""
+    forms = _definitions_program_forms(definition_count, edit_count)
+
+    def run():
+        state = None
+        for form in forms:
+            state, report = evaluate_incrementally(state, form)
+
+    run.units = len(forms)
+    return run
+
+
+def evaluation_after_each_edit(history, definition_count=100, edit_count=20):
+    """As incremental_evaluation, but evaluating the whole program after each edit"""
+    forms = _definitions_program_forms(definition_count, edit_count)
+
+    def run():
+        for form in forms:
+            evaluate(form, builtins_frame())
+
+    run.units = len(forms)
+    return run
+
+
+def box_layout(history):
+    """The TreeWidget's layout (i.e. construction of the box structure) for the final Actuality."""
+    try:
+        from widgets.tree import TreeWidget
+    except ImportError as e:
+        raise SkipBenchmark("Kivy is not available: %s" % e)
+
+    history_channel = ClosableChannel()
+    widget = TreeWidget(m=Memoization(), stores=history.stores, history_channel=history_channel)
+    history_channel.broadcast(Actuality(history.actualities[-1]))
+
+    def run():
+        widget._construct_box_structure()
+
+    return run
+
+
+BENCHMARKS = [
+    ('file_load', file_load),
+    ('cli_startup', cli_startup),
+    ('typing_session', typing_session),
+    ('construct_x_incremental', construct_x_incremental),
+    ('construct_x_cold', construct_x_cold),
+    ('construct_y_cold', construct_y_cold),
+    ('view_past_from_present_tail', view_past_from_present_tail),
+    ('uw_double_edge', uw_double_edge_branches),
+    ('uw_validate_long_branches', uw_validate_long_branches),
+    ('uw_multi_edge', uw_multi_edge_branches),
+    ('merge_checks', merge_checks_batch),
+    ('weave_many', weave_many),
+    ('construct_form_note_cold', construct_form_note_cold),
+    ('into_throughput', into_throughput),
+    ('analyze_session', analyze_session),
+    ('free_variables_incremental', free_variables_incremental),
+    ('free_variables_structural', free_variables_structural),
+    ('free_variables_memoized', free_variables_memoized),
+    ('unused_definitions_incremental', unused_definitions_incremental),
+    ('unused_definitions_structural', unused_definitions_structural),
+    ('loosely_coupled_incremental', loosely_coupled_incremental),
+    ('loosely_coupled_from_scratch', loosely_coupled_from_scratch),
+    ('evaluation', evaluation),
+    ('evaluation_compiled', evaluation_compiled),
+    ('factorial_evaluation', factorial_evaluation),
+    ('factorial_compiled', factorial_compiled),
+    ('evaluation_stack', evaluation_stack),
+    ('evaluation_addressed', evaluation_addressed),
+    ('factorial_addressed', factorial_addressed),
+    ('evaluation_bytecode', evaluation_bytecode),
+    ('factorial_bytecode', factorial_bytecode),
+    ('factorial_bytecode_precompiled', factorial_bytecode_precompiled),
+    ('name_closures_per_name', name_closures_per_name),
+    ('name_closures_all', name_closures_all),
+    ('lexical_addressing_from_scratch', lexical_addressing_from_scratch),
+    ('lexical_addressing_memoized', lexical_addressing_memoized),
+    ('incremental_evaluation', incremental_evaluation),
+    ('evaluation_after_each_edit', evaluation_after_each_edit),
+    ('box_layout', box_layout),
+]
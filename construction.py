@@ -0,0 +1,95 @@
+"""
+The single mechanism by which structures are constructed out of (linear) histories of notes, for any Clef.
+
+All construct_* functions share the same shape: walk back from some edge_nout_hash until a memoized ancestor is found
+(or until the beginning of time), then play the notes that were not yet memoized in chronological order, memoizing
+along the way. The present module captures that shape once, such that there is a single place for:
+
+* cache lookup: `walk_back`
+* memo policy: the memo tables are StridedMemo objects; what's kept is decided by their `remember`
+* ancestry acceleration: walking back uses the NoutHashStore's index of previous_hashes, i.e. nouts are only parsed if
+    their notes must actually be played.
+* timing hooks: any callable in `timing_hooks` is called as hook(name, played_count, elapsed) after each call to
+    `construct`. Note that constructions are recursive, which means that the elapsed time includes the time spent in
+    (the constructions of) any children.
+
+The thing that's being constructed is called the "state" below. For most Clefs the state is simply the structure; some
+constructions need to carry around a bit more than that while playing (e.g. form_analysis' `into`, which carries the
+s_expr and the constructed structure; it simply memoizes all of it, which is why its memo tables are strided too).
+"""
+
+from time import perf_counter
+
+import instrumentation
+
+timing_hooks = []
+
+
+def walk_back(store, memo, edge_nout_hash):
+    """Returns (found_nout_hash, todo); found_nout_hash is the most recent memoized (partial) history of edge_nout_hash
+    (None if nothing is found), todo is the list of nout_hashes after that, most recent first."""
+    todo = []
+    for nout_hash in store.all_preceding_nout_hashes(edge_nout_hash):
+        if nout_hash in memo:
+            return nout_hash, todo
+        todo.append(nout_hash)
+
+    return None, todo
+
+
+def replay(name, store, memo, state, height, nout_hashes, play):
+    """Plays the nouts for nout_hashes (in the given order) onto state, memoizing each resulting state at its height.
+
+    play :: state, note, nout_hash -> state
+    """
+    played_count = 0
+
+    for nout_hash in nout_hashes:
+        note = store.get(nout_hash).note
+
+        state = play(state, note, nout_hash)
+        height += 1
+
+        memo.remember(nout_hash, state, height)
+        played_count += 1
+
+    if instrumentation.enabled:
+        instrumentation.count("notes_played." + name, played_count)
+
+    return state
+
+
+def construct(name, store, memo, initial_state, play, edge_nout_hash):
+    """Constructs the state for edge_nout_hash."""
+    if timing_hooks:
+        start = perf_counter()
+
+    found_nout_hash, todo = walk_back(store, memo, edge_nout_hash)
+
+    if instrumentation.enabled:
+        # Each nout_hash in todo is a lookup that missed; the walk ends in at most a single hit.
+        instrumentation.count("memo_misses." + name, len(todo))
+        instrumentation.count("memo_hits." + name, 0 if found_nout_hash is None else 1)
+        instrumentation.observe("ancestry_walk." + name, len(todo))
+
+    if found_nout_hash is not None and todo == []:
+        # The requested value was memoized itself; no need to replay anything.
+        result = memo[found_nout_hash]
+
+    else:
+        if found_nout_hash is None:
+            state = initial_state
+            height = 0
+
+        else:
+            state = memo[found_nout_hash]
+            height = memo.height(found_nout_hash)
+
+        result = replay(name, store, memo, state, height, reversed(todo), play)
+
+    if timing_hooks:
+        elapsed = perf_counter() - start
+        for hook in timing_hooks:
+            hook(name, len(todo), elapsed)
+
+    return result
@@ -7,20 +7,100 @@ instead have this be a parameter?
 
 For now I'm going to just pick some options that together describe the functionality of the editor as it currently
 exists.
+
+EditNotes are serializable (as_bytes / from_stream), such that editing sessions can be recorded and replayed.
 """
 
+from vlq import to_vlq, from_vlq, to_signed_vlq, from_signed_vlq
+from utils import rfs
+
+# Type constructor codes
+INSERT_NODE_SIBBLING = 0
+INSERT_NODE_CHILD = 1
+TEXT_REPLACE = 2
+TEXT_INSERT = 3
+SWAP_SIBBLING = 4
+LEAVE_CHILDREN_BEHIND = 5
+ENCLOSE_WITH_PARENT = 6
+E_DELETE = 7
+MOVE_SELECTION_SIBBLING = 8
+MOVE_SELECTION_CHILD = 9
+CURSOR_SET = 10
+CURSOR_DFS = 11
+CURSOR_PARENT = 12
+CURSOR_CHILD = 13
+
 
 class EditNote(object):
-    pass
+
+    @staticmethod
+    def from_stream(byte_stream):
+        byte0 = next(byte_stream)
+        return {
+            INSERT_NODE_SIBBLING: InsertNodeSibbling,
+            INSERT_NODE_CHILD: InsertNodeChild,
+            TEXT_REPLACE: TextReplace,
+            TEXT_INSERT: TextInsert,
+            SWAP_SIBBLING: SwapSibbling,
+            LEAVE_CHILDREN_BEHIND: LeaveChildrenBehind,
+            ENCLOSE_WITH_PARENT: EncloseWithParent,
+            E_DELETE: EDelete,
+            MOVE_SELECTION_SIBBLING: MoveSelectionSibbling,
+            MOVE_SELECTION_CHILD: MoveSelectionChild,
+            CURSOR_SET: CursorSet,
+            CURSOR_DFS: CursorDFS,
+            CURSOR_PARENT: CursorParent,
+            CURSOR_CHILD: CursorChild,
+        }[byte0].from_stream(byte_stream)
+
+    @staticmethod
+    def all_from_stream(byte_stream):
+        while True:
+            try:
+                edit_note = EditNote.from_stream(byte_stream)
+            except StopIteration:
+                return  # the end of the stream (see PosAct.all_from_stream)
+
+            yield edit_note
+
+
+def s_address_as_bytes(s_address):
+    return to_vlq(len(s_address)) + b''.join(to_vlq(i) for i in s_address)
+
+
+def s_address_from_stream(byte_stream):
+    return [from_vlq(byte_stream) for i in range(from_vlq(byte_stream))]
+
+
+def text_as_bytes(text):
+    utf8 = text.encode('utf-8')
+    return to_vlq(len(utf8)) + utf8
+
+
+def text_from_stream(byte_stream):
+    return str(rfs(byte_stream, from_vlq(byte_stream)), 'utf-8')
 
 
 class InsertNodeSibbling(EditNote):
     def __init__(self, direction):
         self.direction = direction
 
+    def as_bytes(self):
+        return bytes([INSERT_NODE_SIBBLING]) + to_signed_vlq(self.direction)
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return InsertNodeSibbling(from_signed_vlq(byte_stream))
+
 
 class InsertNodeChild(EditNote):
-    pass
+
+    def as_bytes(self):
+        return bytes([INSERT_NODE_CHILD])
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return InsertNodeChild()
 
 
 class TextReplace(EditNote):
@@ -28,6 +108,13 @@ class TextReplace(EditNote):
         self.s_address = s_address
         self.text = text
 
+    def as_bytes(self):
+        return bytes([TEXT_REPLACE]) + s_address_as_bytes(self.s_address) + text_as_bytes(self.text)
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return TextReplace(s_address_from_stream(byte_stream), text_from_stream(byte_stream))
+
 
 class TextInsert(EditNote):
     def __init__(self, parent_s_address, index, text):
@@ -35,22 +122,55 @@ class TextInsert(EditNote):
         self.index = index
         self.text = text
 
+    def as_bytes(self):
+        return (bytes([TEXT_INSERT]) + s_address_as_bytes(self.parent_s_address) + to_vlq(self.index) +
+                text_as_bytes(self.text))
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return TextInsert(s_address_from_stream(byte_stream), from_vlq(byte_stream), text_from_stream(byte_stream))
+
 
 class SwapSibbling(EditNote):
     def __init__(self, direction):
         self.direction = direction
 
+    def as_bytes(self):
+        return bytes([SWAP_SIBBLING]) + to_signed_vlq(self.direction)
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return SwapSibbling(from_signed_vlq(byte_stream))
+
 
 class LeaveChildrenBehind(EditNote):
-    pass
+
+    def as_bytes(self):
+        return bytes([LEAVE_CHILDREN_BEHIND])
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return LeaveChildrenBehind()
 
 
 class EncloseWithParent(EditNote):
-    pass
+
+    def as_bytes(self):
+        return bytes([ENCLOSE_WITH_PARENT])
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return EncloseWithParent()
 
 
 class EDelete(EditNote):
-    pass
+
+    def as_bytes(self):
+        return bytes([E_DELETE])
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return EDelete()
 
 
 class MoveSelectionSibbling(EditNote):
@@ -63,26 +183,69 @@ class MoveSelectionSibbling(EditNote):
         self.selection_edge_1 = selection_edge_1
         self.direction = direction
 
+    def as_bytes(self):
+        return (bytes([MOVE_SELECTION_SIBBLING]) + s_address_as_bytes(self.selection_edge_0) +
+                s_address_as_bytes(self.selection_edge_1) + to_signed_vlq(self.direction))
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return MoveSelectionSibbling(
+            s_address_from_stream(byte_stream), s_address_from_stream(byte_stream), from_signed_vlq(byte_stream))
+
 
 class MoveSelectionChild(EditNote):
     def __init__(self, selection_edge_0, selection_edge_1):
         self.selection_edge_0 = selection_edge_0
         self.selection_edge_1 = selection_edge_1
 
+    def as_bytes(self):
+        return (bytes([MOVE_SELECTION_CHILD]) + s_address_as_bytes(self.selection_edge_0) +
+                s_address_as_bytes(self.selection_edge_1))
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return MoveSelectionChild(s_address_from_stream(byte_stream), s_address_from_stream(byte_stream))
+
 
 class CursorSet(EditNote):
     def __init__(self, s_address):
         self.s_address = s_address
 
+    def as_bytes(self):
+        return bytes([CURSOR_SET]) + s_address_as_bytes(self.s_address)
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return CursorSet(s_address_from_stream(byte_stream))
+
 
 class CursorDFS(EditNote):
     def __init__(self, direction):
         self.direction = direction
 
+    def as_bytes(self):
+        return bytes([CURSOR_DFS]) + to_signed_vlq(self.direction)
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return CursorDFS(from_signed_vlq(byte_stream))
+
 
 class CursorParent(EditNote):
-    pass
+
+    def as_bytes(self):
+        return bytes([CURSOR_PARENT])
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return CursorParent()
 
 
 class CursorChild(EditNote):
-    pass
+
+    def as_bytes(self):
+        return bytes([CURSOR_CHILD])
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return CursorChild()
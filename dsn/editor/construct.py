@@ -12,9 +12,9 @@ from dsn.s_expr.legato import NoteSlur, NoteCapo
 from dsn.s_expr.utils import (
     bubble_history_up,
     calc_possibility,
-    insert_text_at,
-    insert_node_at,
-    replace_text_at,
+    local_insert_text_at,
+    local_insert_node_at,
+    local_replace_text_at,
     weave_disjoint_replaces,
 )
 
@@ -42,17 +42,44 @@ from dsn.editor.clef import (
 
 def edit_note_play(structure, edit_note):
     # :: EditStructure, EditNote => (new) s_cursor, posacts, error
+    new_s_cursor, posacts, replacements, error = edit_note_play_local(structure, edit_note)
+    return new_s_cursor, posacts + bubble_replacements(structure.tree, replacements), error
+
+
+def bubble_replacements(tree, replacements):
+    """Bubbles the replacements, as returned by edit_note_play_local, up to the root; returns the posacts for that."""
+    if replacements == []:
+        return []
+
+    if len(replacements) == 1:
+        (s_address, hash_), = replacements
+        return bubble_history_up(hash_, tree, s_address)
+
+    (s_address_0, hash_0), (s_address_1, hash_1) = replacements
+    return weave_disjoint_replaces(tree, s_address_0, hash_0, s_address_1, hash_1)
+
+
+def edit_note_play_local(structure, edit_note):
+    """Like edit_note_play, but without bubbling the changes up to the root.
+
+    :: EditStructure, EditNote => (new) s_cursor, posacts, replacements, error
+
+    replacements is a list of (s_address, nout_hash) tuples: the nodes whose history was changed by the posacts, and
+    their new histories. There are at most 2 such replacements (for moves between different parents); they are
+    disjoint.
+    """
     def an_error():
-        return structure.s_cursor, [], True
+        return structure.s_cursor, [], [], True
 
     if isinstance(edit_note, TextInsert):
-        posacts = insert_text_at(structure.tree, edit_note.parent_s_address, edit_note.index, edit_note.text)
+        posacts, insertion = local_insert_text_at(
+            structure.tree, edit_note.parent_s_address, edit_note.index, edit_note.text)
         new_s_cursor = edit_note.parent_s_address + [edit_note.index]
-        return new_s_cursor, posacts, False
+        return new_s_cursor, posacts, [(edit_note.parent_s_address, insertion)], False
 
     if isinstance(edit_note, TextReplace):
-        posacts = replace_text_at(structure.tree, edit_note.s_address, edit_note.text)
-        return edit_note.s_address, posacts, False
+        posacts, replacement = local_replace_text_at(structure.tree, edit_note.s_address, edit_note.text)
+        return edit_note.s_address, posacts, [(edit_note.s_address[:-1], replacement)], False
 
     if isinstance(edit_note, InsertNodeSibbling):
         if structure.s_cursor == []:
@@ -64,10 +91,10 @@ def edit_note_play(structure, edit_note):
         # from the idea that, for lists of length n, insertions at [0, n] are valid (insertion at n being an append).
         index = structure.s_cursor[-1] + edit_note.direction
 
-        posacts = insert_node_at(structure.tree, structure.s_cursor[:-1], index)
+        posacts, insertion = local_insert_node_at(structure.tree, structure.s_cursor[:-1], index)
         new_s_cursor = structure.s_cursor[:-1] + [index]
 
-        return new_s_cursor, posacts, False
+        return new_s_cursor, posacts, [(structure.s_cursor[:-1], insertion)], False
 
     if isinstance(edit_note, InsertNodeChild):
         cursor_node = node_for_s_address(structure.tree, structure.s_cursor)
@@ -76,10 +103,10 @@ def edit_note_play(structure, edit_note):
             return an_error()
 
         index = len(cursor_node.children)
-        posacts = insert_node_at(structure.tree, structure.s_cursor, index)
+        posacts, insertion = local_insert_node_at(structure.tree, structure.s_cursor, index)
         new_s_cursor = structure.s_cursor + [index]
 
-        return new_s_cursor, posacts, False
+        return new_s_cursor, posacts, [(structure.s_cursor, insertion)], False
 
     if isinstance(edit_note, EDelete):
         if structure.s_cursor == []:
@@ -98,9 +125,7 @@ def edit_note_play(structure, edit_note):
         else:
             new_s_cursor = structure.s_cursor  # "stay in place (although new contents slide into the cursor position)
 
-        posacts = [p] + bubble_history_up(h, structure.tree, delete_from)
-
-        return new_s_cursor, posacts, False
+        return new_s_cursor, [p], [(delete_from, h)], False
 
     if isinstance(edit_note, SwapSibbling):
         if structure.s_cursor == []:
@@ -124,8 +149,7 @@ def edit_note_play(structure, edit_note):
         p1, hash_after_insertion = calc_possibility(NoteSlur(Insert(index, reinsert_later_hash), hash_after_deletion))
 
         new_cursor = structure.s_cursor[:-1] + [index]
-        posacts = [p0, p1] + bubble_history_up(hash_after_insertion, structure.tree, parent_s_address)
-        return new_cursor, posacts, False
+        return new_cursor, [p0, p1], [(parent_s_address, hash_after_insertion)], False
 
     if isinstance(edit_note, MoveSelectionChild):
         cursor_node = node_for_s_address(structure.tree, structure.s_cursor)
@@ -180,9 +204,7 @@ def edit_note_play(structure, edit_note):
                     len(parent_node.children) - 1 - 1,  # len - 1 idiom; -1 for deletion.
                     new_cursor[len(new_cursor) - 1])
 
-        posacts += bubble_history_up(hash_, structure.tree, parent_s_address)
-
-        return new_cursor, posacts, False
+        return new_cursor, posacts, [(parent_s_address, hash_)], False
 
     if isinstance(edit_note, EncloseWithParent):
         cursor_node = node_for_s_address(structure.tree, structure.s_cursor)
@@ -210,16 +232,15 @@ def edit_note_play(structure, edit_note):
         p_replace, hash_replace = calc_possibility(
             NoteSlur(Replace(replace_at_index, hash_enclosure), replace_on_hash))
 
-        posacts = [p_capo, p_create, p_enclosure, p_replace] + bubble_history_up(
-            hash_replace, structure.tree, parent_s_address)
+        posacts = [p_capo, p_create, p_enclosure, p_replace]
 
         # We jump the cursor to the newly enclosed location:
         new_cursor = structure.s_cursor + [0]
 
-        return new_cursor, posacts, False
+        return new_cursor, posacts, [(parent_s_address, hash_replace)], False
 
     def move_cursor(new_cursor):
-        return new_cursor, [], False
+        return new_cursor, [], [], False
 
     if isinstance(edit_note, CursorDFS):
         dfs = s_dfs(structure.tree, [])
@@ -262,7 +283,7 @@ def do_move(structure, edit_note, target_parent_path, target_index):
     selection_edge_1 = edit_note.selection_edge_1
 
     def an_error():
-        return structure.s_cursor, [], True
+        return structure.s_cursor, [], [], True
 
     if selection_edge_0[:-1] != selection_edge_1[:-1]:
         # i.e. if not same-parent: this is an error. This may very well be too restrictive, but I'd rather move in the
@@ -356,13 +377,10 @@ def do_move(structure, edit_note, target_parent_path, target_index):
         posacts.append(p)
 
     if source_parent_path != target_parent_path:
-        posacts = posacts + weave_disjoint_replaces(
-            structure.tree,
-            target_parent_path, wdr_hash,
-            source_parent_path, hash_)
+        replacements = [(target_parent_path, wdr_hash), (source_parent_path, hash_)]
 
     else:
-        posacts = posacts + bubble_history_up(hash_, structure.tree, source_parent_path)
+        replacements = [(source_parent_path, hash_)]
 
     # The current solution for "where to put the cursor after the move" is "at the end". This "seems intuitive" (but
     # that may just be habituation). In any case, it's wat e.g. LibreOffice does when cut/pasting. (However, for a
@@ -374,4 +392,4 @@ def do_move(structure, edit_note, target_parent_path, target_index):
 
     new_cursor = target_parent_path + [target_index + target_offset - cursor_correction]
 
-    return new_cursor, posacts, False
+    return new_cursor, posacts, replacements, False
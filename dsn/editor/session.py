@@ -0,0 +1,92 @@
+"""
+Recording and (headless) replaying of editing sessions.
+
+A session file consists of the NoteNoutHash of the Actuality on which the session started, followed by the EditNotes
+that were played, in order. Replaying a session requires a document that contains the starting point's history; since
+documents are append-only, the document as it was after the session will do.
+
+EditNotes are played relative to the cursor; because the cursor may be moved by other means than EditNotes (e.g. by
+selecting), the recorder inserts a CursorSet before any note that was played at another cursor position than the
+previous note left it at. Changes that arrive over the history channel from other windows are not recorded, i.e. a
+recording is faithful for sessions in which all editing happens in a single TreeWidget.
+"""
+
+import instrumentation
+from posacts import Actuality
+
+from dsn.s_expr.construct_x import construct_x
+from dsn.s_expr.legato import NoteNoutHash
+
+from dsn.editor.clef import EditNote, CursorSet
+from dsn.editor.construct import edit_note_play
+from dsn.editor.structure import EditStructure
+
+
+class SessionRecorder(object):
+    """Records the EditNotes that are broadcast over edit_note_channel (a ClosableChannel) to filename; the file is
+    closed when the channel is closed (or when close() is called)."""
+
+    def __init__(self, edit_note_channel, filename, nout_hash):
+        self.file_ = open(filename, 'wb')
+        self.file_.write(nout_hash.as_bytes())
+        self.file_.flush()
+
+        self.s_cursor = None  # i.e. unknown: the first note is always preceded by a CursorSet
+
+        # receive-only connection
+        edit_note_channel.connect(self.receive, self.close)
+
+    def close(self):
+        self.file_.close()
+
+    def receive(self, data):
+        # Receives: (s_cursor, edit_note, new_s_cursor) for each EditNote played by a TreeWidget
+        s_cursor, edit_note, new_s_cursor = data
+
+        if s_cursor != self.s_cursor:
+            self.file_.write(CursorSet(s_cursor).as_bytes())
+
+        self.file_.write(edit_note.as_bytes())
+        self.file_.flush()
+        self.s_cursor = new_s_cursor
+
+
+def write_session(filename, nout_hash, edit_notes):
+    with open(filename, 'wb') as f:
+        f.write(nout_hash.as_bytes())
+        for edit_note in edit_notes:
+            f.write(edit_note.as_bytes())
+
+
+def read_session(filename):
+    """Returns (nout_hash, edit_notes) for a recorded session"""
+    with open(filename, 'rb') as f:
+        byte_stream = iter(f.read())
+
+    nout_hash = NoteNoutHash.from_stream(byte_stream)
+    return nout_hash, list(EditNote.all_from_stream(byte_stream))
+
+
+def replay_session(m, stores, history_channel, nout_hash, edit_notes):
+    """Plays edit_notes, starting at nout_hash, like the TreeWidget does (minus anything related to rendering); yields
+    the EditStructure after each note.
+
+    The resulting posacts are broadcast over history_channel, which is expected to (directly or indirectly) add the
+    Possibilities to stores.
+    """
+    structure = EditStructure(construct_x(m, stores, nout_hash), [], [], None)
+
+    for edit_note in edit_notes:
+        with instrumentation.timed("edit_latency.replay_session"):
+            new_s_cursor, posacts, error = edit_note_play(structure, edit_note)
+
+            tree = structure.tree
+            for posact in posacts:
+                history_channel.broadcast(posact)
+
+                if isinstance(posact, Actuality):
+                    tree = construct_x(m, stores, posact.nout_hash)
+
+            structure = EditStructure(tree, new_s_cursor, structure.pp_annotations, None)
+
+        yield structure
@@ -0,0 +1,141 @@
+"""
+Edit transactions: playing a sequence of EditNotes as a single change to the document.
+
+Playing EditNotes one by one (edit_note_play) bubbles each edit up to the root, and ends each edit with an Actuality; N
+edits yield N full chains of Replaces from the edited node up to the root. An EditTransaction instead keeps the changed
+nodes' new histories "pending" in a working tree, and bubbles them up only when required:
+
+* when an edit reads the history of a node that has pending changes below it, those changes are bubbled up to (and no
+  further than) that node first.
+* on commit, all that's still pending is bubbled up to the root in a single pass, followed by a single Actuality.
+
+Repeated edits in the same location (the typical case: typing) thus yield a single chain of Replaces to the root.
+
+The posacts that the transaction creates are kept in an OverlayNoutHashStore (rather than the stores themselves) until
+commit; this allows for constructing the working tree without publishing anything.
+"""
+
+from hashstore import OverlayNoutHashStore
+from memoization import Stores
+from s_address import node_for_s_address
+
+from dsn.s_expr.construct_x import construct_x
+from dsn.s_expr.structure import TreeNode
+from dsn.s_expr.utils import _weave_many_disjoint_replaces, calc_actuality
+
+from dsn.editor.construct import edit_note_play_local
+from dsn.editor.structure import EditStructure
+
+
+class EditTransaction(object):
+
+    def __init__(self, m, stores, structure):
+        self.m = m
+        self.overlay = OverlayNoutHashStore(stores.note_nout)
+        self.stores = Stores(self.overlay)
+
+        self.tree = structure.tree
+        self.s_cursor = structure.s_cursor
+        self.pp_annotations = structure.pp_annotations
+
+        self.posacts = []
+
+        # (s_address, nout_hash) tuples; the working tree's node at each s_address is constructed from nout_hash, its
+        # ancestors (unless pending themselves) still have their pre-transaction metadata. Pending nodes may lie inside
+        # other pending nodes; see _innermost.
+        self.pending = []
+
+    def play(self, edit_note):
+        """Plays a single EditNote onto the working tree; returns whether that resulted in an error (in which case
+        nothing changes)."""
+        new_s_cursor, posacts, replacements, error = edit_note_play_local(self._structure(), edit_note)
+        if error:
+            return True
+
+        # The (local part of the) edit reads the histories of the nodes it replaces, and of their descendants; make
+        # sure those histories are up to date. If that's not already the case, replay the edit on the updated tree.
+        flushed = False
+        for s_address, hash_ in replacements:
+            flushed = self._flush_into(s_address) or flushed
+
+        if flushed:
+            new_s_cursor, posacts, replacements, error = edit_note_play_local(self._structure(), edit_note)
+
+        self._add(posacts)
+        for s_address, hash_ in replacements:
+            self._replace(s_address, hash_)
+
+        self.s_cursor = new_s_cursor
+        return False
+
+    def commit(self):
+        """Bubbles all pending changes up to the root; returns (new s_cursor, posacts) for the whole transaction."""
+        if self.pending == []:
+            return self.s_cursor, self.posacts
+
+        posacts, root_hash = _weave_many_disjoint_replaces(self.tree, _innermost(self.pending))
+        self._add(posacts)
+        self.pending = []
+
+        return self.s_cursor, self.posacts + [calc_actuality(root_hash)]
+
+    def _structure(self):
+        # a copy of s_cursor is passed, because edit_note_play_local may modify it in-place
+        return EditStructure(self.tree, self.s_cursor[:], self.pp_annotations, None)
+
+    def _add(self, posacts):
+        for posact in posacts:
+            self.overlay.add(posact.nout)  # implied: posacts from edit notes are Possibilities only
+        self.posacts.extend(posacts)
+
+    def _flush_into(self, s_address):
+        """Bubbles any pending changes strictly below s_address up to s_address."""
+        below = [(pending_address[len(s_address):], hash_) for (pending_address, hash_) in self.pending
+                 if len(pending_address) > len(s_address) and pending_address[:len(s_address)] == s_address]
+
+        if below == []:
+            return False
+
+        posacts, hash_ = _weave_many_disjoint_replaces(node_for_s_address(self.tree, s_address), _innermost(below))
+        self._add(posacts)
+
+        self.pending = [(pending_address, h) for (pending_address, h) in self.pending
+                        if pending_address[:len(s_address)] != s_address]
+        self._set_pending(s_address, hash_)
+        return True
+
+    def _replace(self, s_address, hash_):
+        # Nothing is pending below s_address at this point (see _flush_into in play), but s_address may be pending
+        self.pending = [(pending_address, h) for (pending_address, h) in self.pending if pending_address != s_address]
+        self._set_pending(s_address, hash_)
+
+    def _set_pending(self, s_address, hash_):
+        self.pending.append((s_address, hash_))
+        self.tree = _replace_node(self.tree, s_address, construct_x(self.m, self.stores, hash_))
+
+
+def _innermost(pending):
+    """Drops the pending entries that have other pending entries below them. This is correct because such entries'
+    nodes' metadata (in the working tree) reflects their pending history; which is thus the basis on which the entries
+    below them are bubbled up."""
+    return [(s_address, hash_) for (s_address, hash_) in pending if not any(
+        len(other) > len(s_address) and other[:len(s_address)] == s_address for (other, h) in pending)]
+
+
+def _replace_node(node, s_address, replacement):
+    """Returns a copy of node, with the node at s_address replaced; the ancestors' metadata is left as-is."""
+    if s_address == []:
+        return replacement
+
+    children = node.children[:]
+    children[s_address[0]] = _replace_node(children[s_address[0]], s_address[1:], replacement)
+    return TreeNode(children, node.t2s, node.s2t, node.metadata)
+
+
+def edit_notes_play(m, stores, structure, edit_notes):
+    """Plays edit_notes as a single transaction; returns (new s_cursor, posacts)"""
+    transaction = EditTransaction(m, stores, structure)
+    for edit_note in edit_notes:
+        transaction.play(edit_note)
+    return transaction.commit()
+
@@ -0,0 +1,289 @@
+"""
+Compilation of Forms into closures over lexically addressed, array-backed frames: a variant of compiler.py.
+
+In compiler.py (and in the evaluator) each variable-lookup is a search through a chain of dicts, by name. Here, each
+VariableForm is resolved ahead of time to a (depth, slot) pair: depth is the number of scopes up (as calculated by
+construct_lexically_addressed_lambda_tree), slot is the index of the name in that scope's frame. Frames are flat lists:
+
+[parent_frame, parameter_0, ..., parameter_n, definition_0, ..., definition_m]
+
+i.e. a frame's slots are its lambda's parameters (in order), followed by the names that are defined in the lambda's body
+(in the order of collect_definitions).
+
+A program is compiled as a whole, as the body of a parameterless lambda (the top-level frame). Names that cannot be
+resolved (i.e. that are neither defined in the program nor part of the globals) are reported at compile-time, before
+anything is run. The globals (by default: the builtins) are bound at compile-time, i.e. looking them up costs nothing at
+run-time.
+
+Because the compiled closures depend on the form's surrounding scopes, and not just on the form itself, they are not
+cached by nout_hash (as is done in compiler.py).
+
+Note that a name that is defined in a lambda's body refers to that lambda's slot throughout the body, even before the
+definition is evaluated; using it before then is an error (in the evaluator, such a use would find the name in a
+surrounding scope, if it's defined there).
+"""
+
+from utils import pmts
+
+from dsn.form_analysis.collect_definitions import collect_definitions
+from dsn.form_analysis.compiler import (
+    DEFINITION,
+    NOT_CONSTANT,
+    constant_closure,
+    raising_closure,
+    sequence_closure,
+)
+from dsn.form_analysis.evaluator import BUILTINS, BuiltinProcedure, Procedure
+from dsn.form_analysis.free_variables import free_variables
+from dsn.form_analysis.lexical_addressing_x import (
+    construct_lambda_tree,
+    construct_lexically_addressed_lambda_tree,
+)
+from dsn.form_analysis.structure import (
+    ApplicationForm,
+    DefineForm,
+    FormList,
+    IfForm,
+    LambdaForm,
+    MalformedForm,
+    QuoteForm,
+    SequenceForm,
+    SymbolList,
+    ValueForm,
+    VariableForm,
+)
+
+
+class AddressedProcedure(Procedure):
+    def __init__(self, form, environment, parameter_count, padding, body):
+        self.form = form
+        self.environment = environment  # :: frame, i.e. a list
+        self.parameter_count = parameter_count
+        self.padding = padding  # :: [UNASSIGNED], one for each of the definitions in the lambda's body
+        self.body = body
+
+
+class Unassigned(object):
+    def __repr__(self):
+        return "UNASSIGNED"
+
+
+UNASSIGNED = Unassigned()
+
+
+class Scope(object):
+    """Compile-time information about a single lambda's frame."""
+
+    def __init__(self, parent, addressed_lambda_tree):
+        self.parent = parent
+        self.lexical_addresses = addressed_lambda_tree.lexical_addresses
+
+        lambda_form = addressed_lambda_tree.lambda_form
+        self.slots = {}  # :: {symbol: index in the frame}
+        for i, parameter in enumerate(lambda_form.parameters):
+            self.slots[parameter.symbol] = i + 1
+        self.parameter_count = len(lambda_form.parameters.the_list)
+
+        self.definition_count = 0
+        for define_form in collect_definitions(lambda_form):
+            symbol = define_form.symbol.symbol
+            if symbol is not None and symbol not in self.slots:
+                self.definition_count += 1
+                self.slots[symbol] = self.parameter_count + self.definition_count
+
+        # The children are found by identity of their LambdaForms, rather than by position: constant folding means that
+        # not all lambdas are actually compiled.
+        self.children = {id(child.lambda_form): child for child in addressed_lambda_tree.children}
+
+
+def unresolvable_names(form, global_names):
+    return {name for name in free_variables(form) if name is not None} - set(global_names)
+
+
+def compile_addressed(form, globals_=None):
+    """Returns a closure `() -> value` that evaluates form (a program) in a fresh top-level frame."""
+    if globals_ is None:
+        globals_ = BUILTINS
+    pmts(globals_, dict)
+
+    # The elements of a top-level SequenceForm are the program's top-level forms; they are treated as the body of a
+    # lambda, because (see collect_definitions) that's where definitions must be.
+    top_level_forms = form.sequence.the_list if isinstance(form, SequenceForm) else [form]
+    program = LambdaForm(SymbolList([]), FormList(top_level_forms))
+
+    unresolvable = unresolvable_names(program, globals_)
+    if unresolvable:
+        raise Exception("Unresolvable names: %s" % ", ".join(sorted(unresolvable)))
+
+    # Globals are addressed as None (i.e. "not in any frame"); so is the malformed symbol.
+    surrounding_scope = {name: None for name in globals_}
+    surrounding_scope[None] = None
+
+    addressed_lambda_tree = construct_lexically_addressed_lambda_tree(
+        construct_lambda_tree(program), surrounding_scope)
+
+    scope = Scope(None, addressed_lambda_tree)
+    body, _ = sequence_closure([_compile(globals_, scope, element) for element in top_level_forms])
+    padding = [UNASSIGNED] * scope.definition_count
+
+    def run():
+        return body([None] + padding)
+
+    return run
+
+
+def evaluate_addressed(form, globals_=None):
+    return compile_addressed(form, globals_)()
+
+
+def _compile(globals_, scope, form):
+    """Returns (closure, constant), as in compiler.py"""
+    if isinstance(form, MalformedForm):
+        return raising_closure("Cannot evaluate MalformedForm")
+
+    if isinstance(form, ValueForm):
+        return constant_closure(form.value)
+
+    if isinstance(form, QuoteForm):
+        return constant_closure(form.data)
+
+    if isinstance(form, VariableForm):
+        return _compile_variable(globals_, scope, form.symbol.symbol)
+
+    if isinstance(form, DefineForm):
+        return _compile_define(globals_, scope, form)
+
+    if isinstance(form, IfForm):
+        return _compile_if(globals_, scope, form)
+
+    if isinstance(form, LambdaForm):
+        return _compile_lambda(globals_, scope, form)
+
+    if isinstance(form, SequenceForm):
+        return sequence_closure([_compile(globals_, scope, element) for element in form.sequence])
+
+    if isinstance(form, ApplicationForm):
+        return _compile_application(globals_, scope, form)
+
+    raise Exception("Case analysis fail %s" % type(form))
+
+
+def _compile_variable(globals_, scope, symbol):
+    if symbol is None:
+        return raising_closure("Malformed symbol cannot be looked up")
+
+    depth = scope.lexical_addresses[symbol]
+    if depth is None:
+        return constant_closure(globals_[symbol])
+
+    target = scope
+    for i in range(depth):
+        target = target.parent
+
+    slot = target.slots[symbol]
+
+    if slot <= target.parameter_count:
+        # Parameters are assigned when the frame is created, i.e. they need not be checked for being UNASSIGNED.
+        if depth == 0:
+            return (lambda frame: frame[slot]), NOT_CONSTANT
+
+        if depth == 1:
+            return (lambda frame: frame[0][slot]), NOT_CONSTANT
+
+    def unassigned():
+        raise Exception("Unassigned variable: '%s'" % symbol)
+
+    if depth == 0:
+        def variable(frame):
+            value = frame[slot]
+            if value is UNASSIGNED:
+                unassigned()
+            return value
+
+    elif depth == 1:
+        def variable(frame):
+            value = frame[0][slot]
+            if value is UNASSIGNED:
+                unassigned()
+            return value
+
+    else:
+        def variable(frame):
+            for i in range(depth):
+                frame = frame[0]
+
+            value = frame[slot]
+            if value is UNASSIGNED:
+                unassigned()
+            return value
+
+    return variable, NOT_CONSTANT
+
+
+def _compile_define(globals_, scope, form):
+    symbol = form.symbol.symbol
+    if symbol is None:
+        return raising_closure("Malformed symbol cannot be set")
+
+    if symbol not in scope.slots:
+        raise Exception("Define must be a direct child of a lambda: '%s'" % symbol)
+
+    definition, _ = _compile(globals_, scope, form.definition)
+    slot = scope.slots[symbol]
+
+    def define(frame):
+        frame[slot] = definition(frame)
+        return DEFINITION
+
+    return define, NOT_CONSTANT
+
+
+def _compile_if(globals_, scope, form):
+    predicate, predicate_constant = _compile(globals_, scope, form.predicate)
+
+    if predicate_constant is not NOT_CONSTANT:
+        return _compile(globals_, scope, form.consequent if predicate_constant else form.alternative)
+
+    consequent, _ = _compile(globals_, scope, form.consequent)
+    alternative, _ = _compile(globals_, scope, form.alternative)
+
+    def if_(frame):
+        if predicate(frame):
+            return consequent(frame)
+        return alternative(frame)
+
+    return if_, NOT_CONSTANT
+
+
+def _compile_lambda(globals_, scope, form):
+    lambda_scope = Scope(scope, scope.children[id(form)])
+    body, _ = sequence_closure([_compile(globals_, lambda_scope, element) for element in form.body])
+
+    parameter_count = lambda_scope.parameter_count
+    padding = [UNASSIGNED] * lambda_scope.definition_count
+
+    def lambda_(frame):
+        return AddressedProcedure(form, frame, parameter_count, padding, body)
+
+    return lambda_, NOT_CONSTANT
+
+
+def _compile_application(globals_, scope, form):
+    procedure, _ = _compile(globals_, scope, form.procedure)
+    arguments = [_compile(globals_, scope, argument)[0] for argument in form.arguments]
+
+    def application(frame):
+        return apply(procedure(frame), [argument(frame) for argument in arguments])
+
+    return application, NOT_CONSTANT
+
+
+def apply(procedure, arguments):
+    if isinstance(procedure, AddressedProcedure):
+        assert len(arguments) == procedure.parameter_count
+        return procedure.body([procedure.environment] + arguments + procedure.padding)
+
+    if isinstance(procedure, BuiltinProcedure):
+        return procedure.procedure(*arguments)
+
+    raise Exception("Cannot apply %s" % type(procedure))
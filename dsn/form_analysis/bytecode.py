@@ -0,0 +1,479 @@
+"""
+Compilation of Forms into bytecode for a register-based virtual machine.
+
+Unlike the closures of compiler.py, the compiled artifact (a Code object) is plain data, and can therefore be written to
+disk and read back; BytecodeCache does so, keyed by the form's nout_hash, i.e. a program that is re-run (in the same, or
+another process) need not be recompiled.
+
+## Code & instructions
+
+A Code object is the result of compiling a single lambda's body (or the program as a whole); the lambdas that occur in
+it are compiled into Code objects of their own (`codes`). Instructions are 4 integers wide (opcode & 3 operands), and
+stored in a flat array (array.array); operands refer to registers (an index into the list of registers of the present
+call), or to one of the Code's `constants`, `names` or `codes`, or to an instruction's index (for jumps).
+
+Registers are allocated in stack-like fashion: a form is compiled to put its value in a given target register, and the
+registers above the target are free for the form's intermediate values. For an application, the procedure is put in
+the target register, and the arguments in the registers that directly follow it.
+
+## The VM
+
+The VM's call stack is explicit (a Python list), i.e. the depth of recursion is not bounded by Python's recursion limit.
+Applications in tail position (the branches of an if, the last element of a sequence or of a lambda's body) are compiled
+to TAIL_CALL, which reuses the present call's place on the stack, i.e. tail calls run in constant space.
+
+Environments are Frames (as in the evaluator), i.e. programs can be run in e.g. builtins_frame(), and BuiltinProcedures
+are called directly. Procedures of the tree-walking evaluator are applied using evaluator.apply.
+"""
+
+from array import array
+from os import fdopen, makedirs, path, remove, replace
+from tempfile import mkstemp
+from binascii import hexlify
+
+from utils import pmts, rfs
+from vlq import from_signed_vlq, from_vlq, to_signed_vlq, to_vlq
+
+from dsn.s_expr.structure import SExpr, s_expr_from_stream
+from dsn.form_analysis.evaluator import (
+    BuiltinProcedure,
+    Frame,
+    Procedure,
+    SpecialValue,
+    apply as evaluator_apply,
+)
+from dsn.form_analysis.structure import (
+    ApplicationForm,
+    DefineForm,
+    IfForm,
+    LambdaForm,
+    MalformedForm,
+    QuoteForm,
+    SequenceForm,
+    ValueForm,
+    VariableForm,
+)
+
+# ## Opcodes
+LOAD_CONSTANT = 0  # register, constant: register := constants[constant]
+LOAD_NAME = 1  # register, name: register := the value of names[name] in the environment
+DEFINE = 2  # register, name: names[name] := register (in the present frame); register := a Definition
+MAKE_LAMBDA = 3  # register, code: register := a procedure for codes[code], closing over the environment
+JUMP = 4  # target: continue at instruction target
+JUMP_IF_FALSE = 5  # register, target: if not register, continue at instruction target
+CALL = 6  # register, first, count: register := the result of applying first to the count registers after it
+TAIL_CALL = 7  # first, count: return the result of applying first to the count registers after it
+RETURN = 8  # register: return the value of register
+RAISE = 9  # constant: raise an Exception with constants[constant] as its message
+
+INSTRUCTION_WIDTH = 4
+
+OPCODE_NAMES = ["LOAD_CONSTANT", "LOAD_NAME", "DEFINE", "MAKE_LAMBDA", "JUMP", "JUMP_IF_FALSE", "CALL", "TAIL_CALL",
+                "RETURN", "RAISE"]
+
+# The version of the format of Code (opcodes, operands, and their encoding as bytes). It's part of the filenames of
+# BytecodeCache; i.e. when the format changes, bump it, and Code in the old format is simply not found anymore.
+FORMAT_VERSION = 1
+
+# ## Type constructor codes for constants
+C_NONE = 0
+C_INTEGER = 1
+C_STRING = 2
+C_S_EXPR = 3
+
+
+class Code(object):
+
+    def __init__(self, parameters, register_count, instructions, constants, names, codes):
+        pmts(instructions, array)
+        self.parameters = parameters  # :: [str]
+        self.register_count = register_count
+        self.instructions = instructions
+        self.constants = constants
+        self.names = names  # :: [str]
+        self.codes = codes  # :: [Code]
+
+    def __eq__(self, other):
+        return isinstance(other, Code) and self.as_bytes() == other.as_bytes()
+
+    def as_bytes(self):
+        return (
+            _list_as_bytes(self.parameters, _str_as_bytes) +
+            to_vlq(self.register_count) +
+            _list_as_bytes(self.instructions, to_vlq) +
+            _list_as_bytes(self.constants, _constant_as_bytes) +
+            _list_as_bytes(self.names, _str_as_bytes) +
+            _list_as_bytes(self.codes, lambda code: code.as_bytes()))
+
+    @staticmethod
+    def from_stream(byte_stream):
+        return Code(
+            _list_from_stream(byte_stream, _str_from_stream),
+            from_vlq(byte_stream),
+            array('l', _list_from_stream(byte_stream, from_vlq)),
+            _list_from_stream(byte_stream, _constant_from_stream),
+            _list_from_stream(byte_stream, _str_from_stream),
+            _list_from_stream(byte_stream, Code.from_stream),
+        )
+
+
+def _list_as_bytes(l, element_as_bytes):
+    return to_vlq(len(l)) + b''.join(element_as_bytes(element) for element in l)
+
+
+def _list_from_stream(byte_stream, element_from_stream):
+    return [element_from_stream(byte_stream) for i in range(from_vlq(byte_stream))]
+
+
+def _str_as_bytes(s):
+    utf8 = s.encode('utf-8')
+    return to_vlq(len(utf8)) + utf8
+
+
+def _str_from_stream(byte_stream):
+    return str(rfs(byte_stream, from_vlq(byte_stream)), 'utf-8')
+
+
+def _constant_as_bytes(constant):
+    if constant is None:
+        return bytes([C_NONE])
+
+    if isinstance(constant, int):
+        return bytes([C_INTEGER]) + to_signed_vlq(constant)
+
+    if isinstance(constant, str):
+        return bytes([C_STRING]) + _str_as_bytes(constant)
+
+    if isinstance(constant, SExpr):
+        return bytes([C_S_EXPR]) + constant.as_bytes()
+
+    raise Exception("Cannot serialize constant of type %s" % type(constant))
+
+
+def _constant_from_stream(byte_stream):
+    byte0 = next(byte_stream)
+    if byte0 == C_NONE:
+        return None
+
+    if byte0 == C_INTEGER:
+        return from_signed_vlq(byte_stream)
+
+    if byte0 == C_STRING:
+        return _str_from_stream(byte_stream)
+
+    if byte0 == C_S_EXPR:
+        return s_expr_from_stream(byte_stream)
+
+    raise Exception("Unknown type constructor code %s" % byte0)
+
+
+def pp_code(code, indentation=0):
+    """Human-readable listing of the instructions of a Code (and, recursively, of its codes)"""
+    result = []
+    for i in range(0, len(code.instructions), INSTRUCTION_WIDTH):
+        opcode, a, b, c = code.instructions[i:i + INSTRUCTION_WIDTH]
+        result.append("%s%d %s %d %d %d" % (" " * indentation, i // INSTRUCTION_WIDTH, OPCODE_NAMES[opcode], a, b, c))
+
+    for i, child in enumerate(code.codes):
+        result.append("%scode %d (%s):" % (" " * indentation, i, " ".join(child.parameters)))
+        result.append(pp_code(child, indentation + 4))
+
+    return "\n".join(result)
+
+
+# ## Compilation
+class CodeBuilder(object):
+
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self.register_count = 1
+        self.instructions = array('l')
+        self.constants = []
+        self.constant_indices = {}  # :: {(type, value): index}, for constants that can be shared
+        self.names = []
+        self.codes = []
+
+    def emit(self, opcode, a=0, b=0, c=0):
+        """Returns the index of the emitted instruction."""
+        self.instructions.extend((opcode, a, b, c))
+        return len(self.instructions) // INSTRUCTION_WIDTH - 1
+
+    def patch_jump(self, index):
+        """Makes the jump at index jump to the next instruction to be emitted."""
+        target = len(self.instructions) // INSTRUCTION_WIDTH
+        opcode = self.instructions[index * INSTRUCTION_WIDTH]
+        self.instructions[index * INSTRUCTION_WIDTH + (1 if opcode == JUMP else 2)] = target
+
+    def use_registers(self, count):
+        self.register_count = max(self.register_count, count)
+
+    def constant(self, value):
+        if not isinstance(value, (int, str)):
+            self.constants.append(value)
+            return len(self.constants) - 1
+
+        key = (type(value), value)
+        if key not in self.constant_indices:
+            self.constants.append(value)
+            self.constant_indices[key] = len(self.constants) - 1
+        return self.constant_indices[key]
+
+    def name(self, symbol):
+        if symbol not in self.names:
+            self.names.append(symbol)
+        return self.names.index(symbol)
+
+    def build(self):
+        return Code(self.parameters, self.register_count, self.instructions, self.constants, self.names, self.codes)
+
+
+def compile_code(form):
+    """Compiles form into a Code that evaluates it (with the environment as its frame), and returns its value."""
+    builder = CodeBuilder([])
+    _compile(builder, form, 0, True)
+    return builder.build()
+
+
+def _compile(builder, form, target, tail):
+    """Emits the instructions that evaluate form into the register target; in tail position, the instructions must
+    return (rather than continue with whatever comes next)."""
+
+    if isinstance(form, MalformedForm):
+        builder.emit(RAISE, builder.constant("Cannot evaluate MalformedForm"))
+        return
+
+    if isinstance(form, ValueForm):
+        builder.emit(LOAD_CONSTANT, target, builder.constant(form.value))
+
+    elif isinstance(form, QuoteForm):
+        builder.emit(LOAD_CONSTANT, target, builder.constant(form.data))
+
+    elif isinstance(form, VariableForm):
+        if form.symbol.symbol is None:
+            builder.emit(RAISE, builder.constant("Malformed symbol cannot be looked up"))
+            return
+        builder.emit(LOAD_NAME, target, builder.name(form.symbol.symbol))
+
+    elif isinstance(form, DefineForm):
+        if form.symbol.symbol is None:
+            builder.emit(RAISE, builder.constant("Malformed symbol cannot be set"))
+            return
+        _compile(builder, form.definition, target, False)
+        builder.emit(DEFINE, target, builder.name(form.symbol.symbol))
+
+    elif isinstance(form, IfForm):
+        _compile(builder, form.predicate, target, False)
+        to_alternative = builder.emit(JUMP_IF_FALSE, target)
+        _compile(builder, form.consequent, target, tail)
+        if not tail:
+            to_end = builder.emit(JUMP)
+        builder.patch_jump(to_alternative)
+        _compile(builder, form.alternative, target, tail)
+        if not tail:
+            builder.patch_jump(to_end)
+        return
+
+    elif isinstance(form, LambdaForm):
+        lambda_builder = CodeBuilder([p.symbol for p in form.parameters])
+        _compile_sequence(lambda_builder, form.body.the_list, 0, True)
+        builder.codes.append(lambda_builder.build())
+        builder.emit(MAKE_LAMBDA, target, len(builder.codes) - 1)
+
+    elif isinstance(form, SequenceForm):
+        _compile_sequence(builder, form.sequence.the_list, target, tail)
+        return
+
+    elif isinstance(form, ApplicationForm):
+        arguments = form.arguments.the_list
+        builder.use_registers(target + 1 + len(arguments))
+
+        _compile(builder, form.procedure, target, False)
+        for i, argument in enumerate(arguments):
+            _compile(builder, argument, target + 1 + i, False)
+
+        if tail:
+            builder.emit(TAIL_CALL, target, len(arguments))
+            return
+        builder.emit(CALL, target, target, len(arguments))
+
+    else:
+        raise Exception("Case analysis fail %s" % type(form))
+
+    if tail:
+        builder.emit(RETURN, target)
+
+
+def _compile_sequence(builder, forms, target, tail):
+    if forms == []:
+        # The evaluator fails (implicitly) on empty sequences; we do so explicitly.
+        builder.emit(RAISE, builder.constant("Cannot evaluate empty sequence"))
+        return
+
+    for form in forms[:-1]:
+        _compile(builder, form, target, False)
+    _compile(builder, forms[-1], target, tail)
+
+
+# ## The VM
+class BytecodeProcedure(Procedure):
+    def __init__(self, code, environment):
+        self.code = code
+        self.environment = environment
+
+
+def run_code(code, environment):
+    """Runs code in environment (a Frame), and returns the resulting value."""
+    pmts(code, Code)
+    stack = []  # :: [(code, pc, registers, environment, return-register)]
+
+    instructions, names, constants = code.instructions, code.names, code.constants
+    registers = [None] * code.register_count
+    pc = 0
+
+    while True:
+        opcode = instructions[pc]
+        a = instructions[pc + 1]
+
+        if opcode == LOAD_NAME:
+            symbol = names[instructions[pc + 2]]
+            frame = environment
+            while frame is not None:
+                if symbol in frame.data:
+                    registers[a] = frame.data[symbol]
+                    break
+                frame = frame.parent
+            else:
+                raise KeyError("No such symbol: '%s'" % symbol)
+            pc += INSTRUCTION_WIDTH
+            continue
+
+        if opcode == LOAD_CONSTANT:
+            registers[a] = constants[instructions[pc + 2]]
+            pc += INSTRUCTION_WIDTH
+            continue
+
+        if opcode == JUMP_IF_FALSE:
+            if registers[a]:
+                pc += INSTRUCTION_WIDTH
+            else:
+                pc = instructions[pc + 2] * INSTRUCTION_WIDTH
+            continue
+
+        if opcode == JUMP:
+            pc = a * INSTRUCTION_WIDTH
+            continue
+
+        if opcode == CALL or opcode == TAIL_CALL:
+            if opcode == CALL:
+                first = instructions[pc + 2]
+                count = instructions[pc + 3]
+            else:
+                first = a
+                count = instructions[pc + 2]
+
+            procedure = registers[first]
+            arguments = registers[first + 1:first + 1 + count]
+
+            if isinstance(procedure, BytecodeProcedure):
+                if opcode == CALL:
+                    stack.append((code, pc + INSTRUCTION_WIDTH, registers, environment, a))
+
+                code = procedure.code
+                assert len(arguments) == len(code.parameters)
+                environment = Frame(procedure.environment, dict(zip(code.parameters, arguments)))
+                instructions, names, constants = code.instructions, code.names, code.constants
+                registers = [None] * code.register_count
+                pc = 0
+                continue
+
+            if isinstance(procedure, BuiltinProcedure):
+                value = procedure.procedure(*arguments)
+            else:
+                # i.e. procedures that were created by the tree-walking evaluator
+                value = evaluator_apply(procedure, arguments)
+
+            if opcode == CALL:
+                registers[a] = value
+                pc += INSTRUCTION_WIDTH
+                continue
+
+            # a tail call of a non-bytecode procedure: return its value (as below)
+
+        elif opcode == RETURN:
+            value = registers[a]
+
+        elif opcode == DEFINE:
+            environment.data[names[instructions[pc + 2]]] = registers[a]
+            registers[a] = SpecialValue("Definition")
+            pc += INSTRUCTION_WIDTH
+            continue
+
+        elif opcode == MAKE_LAMBDA:
+            registers[a] = BytecodeProcedure(code.codes[instructions[pc + 2]], environment)
+            pc += INSTRUCTION_WIDTH
+            continue
+
+        elif opcode == RAISE:
+            raise Exception(constants[a])
+
+        else:
+            raise Exception("Unknown opcode %s" % opcode)
+
+        # Return of value to the caller
+        if stack == []:
+            return value
+
+        code, pc, registers, environment, return_register = stack.pop()
+        instructions, names, constants = code.instructions, code.names, code.constants
+        registers[return_register] = value
+
+
+# ## Caching
+class BytecodeCache(object):
+    """Compiled Code, cached by the nout_hash of the form (in memory, and on disk in `directory`)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.d = {}  # nout_hash => Code
+        makedirs(directory, exist_ok=True)
+
+    def filename(self, nout_hash):
+        return path.join(
+            self.directory, "%s.v%s.bytecode" % (str(hexlify(nout_hash.as_bytes()), 'utf-8'), FORMAT_VERSION))
+
+    def write(self, filename, code):
+        # Written to a temporary file first, which is then moved into place (atomically); i.e. an interrupted write
+        # never leaves a truncated file under filename.
+        fd, temporary_filename = mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with fdopen(fd, 'wb') as f:
+                f.write(code.as_bytes())
+            replace(temporary_filename, filename)
+        except BaseException:
+            remove(temporary_filename)
+            raise
+
+    def get(self, form):
+        if form.metadata is None:
+            # Forms that are not constructed out of notes have no nout_hash, and are therefore not cached.
+            return compile_code(form)
+
+        nout_hash = form.metadata.nout_hash
+        if nout_hash in self.d:
+            return self.d[nout_hash]
+
+        filename = self.filename(nout_hash)
+        if path.isfile(filename):
+            with open(filename, 'rb') as f:
+                code = Code.from_stream(iter(f.read()))
+        else:
+            code = compile_code(form)
+            self.write(filename, code)
+
+        self.d[nout_hash] = code
+        return code
+
+
+def evaluate_bytecode(form, environment, cache=None):
+    code = compile_code(form) if cache is None else cache.get(form)
+    return run_code(code, environment)
@@ -34,9 +34,132 @@
 # ((lambda (foo) (define foo 1) foo) 2)
 
 
+from collections import namedtuple
+
+from list_operations import l_insert, l_delete, l_replace
+
+from dsn.form_analysis.clef import (
+    BecomeApplication,
+    BecomeDefine,
+    BecomeIf,
+    BecomeLambda,
+    BecomeMalformed,
+    BecomeQuote,
+    BecomeSequence,
+    BecomeValue,
+    BecomeVariable,
+    DefineChangeSymbol,
+    FormListDelete,
+    FormListInsert,
+    FormListReplace,
+)
+from dsn.form_analysis.construct import construct, construct_atom
+from dsn.form_analysis.legato import FormNoteNoutHash, FormListNoteNoutHash
 from dsn.form_analysis.structure import DefineForm
+from dsn.form_analysis.utils import EMPTY_COUNTS, counted, memoized_analysis
 
 
 def collect_definitions(lambda_form):
     # :: [form]; this is subject to change though
     return [f for f in lambda_form.body if isinstance(f, DefineForm)]
+
+
+def memoized_collect_definitions(m, lambda_form):
+    """As collect_definitions, memoized by nout_hash (see memoized_analysis); returns a tuple."""
+    return memoized_analysis(m, "collect_definitions", lambda f: tuple(collect_definitions(f)), lambda_form)
+
+
+# ## Incremental collection of definitions
+#
+# The definitions of a lambda are those of its body, a FormList; the collection is done incrementally by playing the
+# notes of the form list (FormListInsert, -Delete & -Replace), on top of which the only thing that must be known of each
+# element is which symbol it defines, if any (construct_definitions).
+#
+# Because redefinitions are illegal (see above), they must be detected rather than simply ignored; hence we keep a count
+# for each defined name (rather than a set of names), and the set of doubly-defined names is kept up to date as a part
+# of the analysis. The set of defined names (the keys of the counts) changes only when a count goes from 0 to 1 or vice
+# versa; if it does not change, the previous set (the very same object) is reused, which allows for cheap checks (`is`)
+# for change in analyses that build on the present one.
+
+DefinitionsList = namedtuple('DefinitionsList', (
+    'the_list',  # list of frozensets: for each element, the set of names it defines (i.e. a single name, or nothing)
+    'counts',  # Counts: name => the number of elements that define it
+    'names',  # frozenset of the keys of counts
+    'doubles',  # frozenset of the names that are defined more than once
+    ))
+
+EMPTY_DEFINITIONS_LIST = DefinitionsList([], EMPTY_COUNTS, frozenset(), frozenset())
+
+
+def play_definitions_note(m, stores, structure, note, metadata):
+    if isinstance(note, BecomeDefine):
+        return frozenset([construct_atom(m, stores, note.symbol).symbol])
+
+    if isinstance(note, DefineChangeSymbol):
+        return frozenset([construct_atom(m, stores, note.symbol).symbol])
+
+    if type(note) in [BecomeMalformed, BecomeVariable, BecomeValue, BecomeQuote, BecomeIf, BecomeLambda,
+                      BecomeApplication, BecomeSequence]:
+        # Any other Become: the form is not a definition (anymore)
+        return frozenset()
+
+    # Any other change leaves the form's type (and hence what it defines) intact.
+    return structure
+
+
+def play_definitions_list_note(m, stores, structure, note, metadata):
+    if isinstance(note, FormListInsert):
+        if not (0 <= note.index <= len(structure.the_list)):  # Note: insert _at_ len(..) is ok (a.k.a. append)
+            raise Exception("Out of bounds: %s" % note.index)
+
+        element = construct_definitions(m, stores, note.form_nout_hash)
+        the_list = l_insert(structure.the_list, note.index, element)
+        removed, added = frozenset(), element
+
+    else:
+        if not (0 <= note.index <= len(structure.the_list) - 1):  # For Delete/Replace the check is "inside bounds"
+            raise Exception("Out of bounds: %s" % note.index)
+
+        if isinstance(note, FormListDelete):
+            the_list = l_delete(structure.the_list, note.index)
+            removed, added = structure.the_list[note.index], frozenset()
+
+        elif isinstance(note, FormListReplace):
+            element = construct_definitions(m, stores, note.form_nout_hash)
+            the_list = l_replace(structure.the_list, note.index, element)
+            removed, added = structure.the_list[note.index], element
+
+            if removed == added:
+                return DefinitionsList(the_list, structure.counts, structure.names, structure.doubles)
+
+        else:
+            raise Exception("Unknown note %s" % type(note).__name__)
+
+    if not (removed or added):
+        return DefinitionsList(the_list, structure.counts, structure.names, structure.doubles)
+
+    counts, crossed_0 = counted(structure.counts, removed, -1)
+    counts, crossed_1 = counted(counts, added, 1)
+    crossed = crossed_0 ^ crossed_1
+
+    doubles = structure.doubles
+    for name in removed | added:
+        if (counts.get(name, 0) > 1) != (name in doubles):
+            doubles = doubles ^ frozenset([name])
+
+    return DefinitionsList(the_list, counts, structure.names ^ crossed if crossed else structure.names, doubles)
+
+
+def construct_definitions(m, stores, form_nout_hash):
+    """The names that the form at form_nout_hash defines in its enclosing scope, as a frozenset (of at most 1 name)"""
+    return construct(
+        FormNoteNoutHash, frozenset(), 'construct_definitions', 'form_note_nout', play_definitions_note,
+        m, stores, form_nout_hash)
+
+
+def construct_definitions_list(m, stores, form_list_nout_hash):
+    """Incremental analysis of the definitions in a form list (e.g. a lambda's body): returns a DefinitionsList."""
+    return construct(
+        FormListNoteNoutHash, EMPTY_DEFINITIONS_LIST, 'construct_definitions_list', 'form_list_note_nout',
+        play_definitions_list_note,
+        m, stores, form_list_nout_hash)
@@ -0,0 +1,213 @@
+"""
+Compilation of Forms into (nested) Python closures: an alternative to the tree-walking evaluator in evaluator.py.
+
+The tree-walking evaluator decides what to do with a form (the isinstance-chain) each time it visits it; the compiler
+makes that decision once per form, and produces a closure `environment -> value` that does only the work that remains.
+Along the way, constants are folded: ValueForm & QuoteForm are constants, and so are IfForms with a constant predicate
+and SequenceForms of which all elements are; an IfForm with a constant predicate is compiled as the branch that is
+taken, and constants in a non-final position of a sequence are dropped (they have no effects).
+
+The compiled closures depend on nothing but the form, which means they can be cached by the form's nout_hash (see
+`metadata` in structure.py): after an edit, only the forms that were actually changed (i.e. the edited form and its
+ancestors) are recompiled. Forms without metadata (e.g. those that are constructed by hand) are simply not cached.
+
+Values are the same as those of the evaluator (builtins are BuiltinProcedures, environments are Frames); lambdas
+evaluate to CompiledProcedures, which are CompoundProcedures, i.e. they may be applied by evaluator.apply as well.
+"""
+
+from dsn.form_analysis.evaluator import (
+    BuiltinProcedure,
+    CompoundProcedure,
+    Frame,
+    SpecialValue,
+    apply as evaluator_apply,
+)
+from dsn.form_analysis.structure import (
+    ApplicationForm,
+    DefineForm,
+    IfForm,
+    LambdaForm,
+    MalformedForm,
+    QuoteForm,
+    SequenceForm,
+    ValueForm,
+    VariableForm,
+)
+
+
+class CompiledProcedure(CompoundProcedure):
+    def __init__(self, form, environment, parameters, body):
+        super(CompiledProcedure, self).__init__(form, environment)
+        self.parameters = parameters  # :: [str]
+        self.body = body  # :: [closure]
+
+
+# Marks a compiled form as non-constant (None cannot be used for that purpose, because it may be a constant's value)
+NOT_CONSTANT = object()
+
+DEFINITION = SpecialValue("Definition")
+
+
+def compile_form(m, form):
+    """Returns a closure `environment -> value` that evaluates form (in the same way that evaluator.evaluate does)."""
+    return _compile(m, form)[0]
+
+
+def evaluate_compiled(m, form, environment):
+    return compile_form(m, form)(environment)
+
+
+def _compile(m, form):
+    """Returns (closure, constant); constant is the form's value if it is known at compile-time, NOT_CONSTANT otherwise.
+    """
+    if form.metadata is None:
+        return _compile_uncached(m, form)
+
+    if form.metadata.nout_hash not in m.compile_form:
+        m.compile_form[form.metadata.nout_hash] = _compile_uncached(m, form)
+
+    return m.compile_form[form.metadata.nout_hash]
+
+
+def constant_closure(value):
+    return (lambda environment: value), value
+
+
+def raising_closure(message):
+    def raise_(environment):
+        raise Exception(message)
+
+    return raise_, NOT_CONSTANT
+
+
+def _compile_uncached(m, form):
+    if isinstance(form, MalformedForm):
+        # Not raised at compile-time: the malformed form may very well never be evaluated.
+        return raising_closure("Cannot evaluate MalformedForm")
+
+    if isinstance(form, ValueForm):
+        return constant_closure(form.value)
+
+    if isinstance(form, QuoteForm):
+        return constant_closure(form.data)
+
+    if isinstance(form, VariableForm):
+        return _compile_variable(form.symbol.symbol)
+
+    if isinstance(form, DefineForm):
+        return _compile_define(m, form)
+
+    if isinstance(form, IfForm):
+        return _compile_if(m, form)
+
+    if isinstance(form, LambdaForm):
+        return _compile_lambda(m, form)
+
+    if isinstance(form, SequenceForm):
+        return sequence_closure([_compile(m, element) for element in form.sequence])
+
+    if isinstance(form, ApplicationForm):
+        return _compile_application(m, form)
+
+    raise Exception("Case analysis fail %s" % type(form))
+
+
+def _compile_variable(symbol):
+    if symbol is None:
+        return raising_closure("Malformed symbol cannot be looked up")
+
+    def variable(environment):
+        # Frame.lookup, inlined (i.e. without the per-lookup type checks and recursion)
+        while environment is not None:
+            if symbol in environment.data:
+                return environment.data[symbol]
+            environment = environment.parent
+
+        raise KeyError("No such symbol: '%s'" % symbol)
+
+    return variable, NOT_CONSTANT
+
+
+def _compile_define(m, form):
+    symbol = form.symbol.symbol
+    if symbol is None:
+        return raising_closure("Malformed symbol cannot be set")
+
+    definition, _ = _compile(m, form.definition)
+
+    def define(environment):
+        environment.data[symbol] = definition(environment)
+        return DEFINITION
+
+    return define, NOT_CONSTANT
+
+
+def _compile_if(m, form):
+    predicate, predicate_constant = _compile(m, form.predicate)
+
+    if predicate_constant is not NOT_CONSTANT:
+        # Only the branch that is taken is compiled at all.
+        return _compile(m, form.consequent if predicate_constant else form.alternative)
+
+    consequent, _ = _compile(m, form.consequent)
+    alternative, _ = _compile(m, form.alternative)
+
+    def if_(environment):
+        if predicate(environment):
+            return consequent(environment)
+        return alternative(environment)
+
+    return if_, NOT_CONSTANT
+
+
+def sequence_closure(compiled_elements):
+    if compiled_elements == []:
+        # The evaluator fails (implicitly) on empty sequences; we do so explicitly.
+        return raising_closure("Cannot evaluate empty sequence")
+
+    last, last_constant = compiled_elements[-1]
+
+    # Constants in a non-final position have no effects, so they can be left out.
+    elements = [closure for closure, constant in compiled_elements[:-1] if constant is NOT_CONSTANT]
+
+    if elements == []:
+        return last, last_constant
+
+    def sequence(environment):
+        for element in elements:
+            element(environment)
+        return last(environment)
+
+    return sequence, NOT_CONSTANT
+
+
+def _compile_lambda(m, form):
+    parameters = [p.symbol for p in form.parameters]
+    body, _ = sequence_closure([_compile(m, element) for element in form.body])
+
+    def lambda_(environment):
+        return CompiledProcedure(form, environment, parameters, body)
+
+    return lambda_, NOT_CONSTANT
+
+
+def _compile_application(m, form):
+    procedure, _ = _compile(m, form.procedure)
+    arguments = [_compile(m, argument)[0] for argument in form.arguments]
+
+    def application(environment):
+        return apply(procedure(environment), [argument(environment) for argument in arguments])
+
+    return application, NOT_CONSTANT
+
+
+def apply(procedure, arguments):
+    if isinstance(procedure, CompiledProcedure):
+        assert len(arguments) == len(procedure.parameters)
+        return procedure.body(Frame(procedure.environment, dict(zip(procedure.parameters, arguments))))
+
+    if isinstance(procedure, BuiltinProcedure):
+        return procedure.procedure(*arguments)
+
+    # i.e. procedures that were created by the tree-walking evaluator
+    return evaluator_apply(procedure, arguments)
@@ -1,4 +1,5 @@
 from utils import pmts
+from construction import construct as general_construct
 from list_operations import l_insert, l_delete, l_replace
 
 from dsn.s_expr.construct_x import construct_x
@@ -60,77 +61,77 @@ from dsn.form_analysis.clef import (
 )
 
 
-def play_form_note(m, stores, structure, note, metadata_NOT_YET_USED):
+def play_form_note(m, stores, structure, note, metadata):
     # How to write this? The principled approach is:
     # * start with construction from a structure/note pair. AKA 'play'.
     #
     # * memoization and such will be added after that. Perhaps never to this method at all!
-    # * NOTE: part of 'and such' is: metadata (nout_hashes)
+    # * metadata (YourOwnHash) is set on the resulting forms; it's not part of their structure (i.e. equality).
 
     if isinstance(note, BecomeMalformed):
-        return MalformedForm()
+        return MalformedForm(metadata)
 
     if isinstance(note, BecomeValue):
-        return ValueForm(note.type_, note.value)
+        return ValueForm(note.type_, note.value, metadata)
 
     if isinstance(note, BecomeVariable):
-        return VariableForm(Symbol(note.symbol))
+        return VariableForm(Symbol(note.symbol), metadata)
 
     if isinstance(note, BecomeQuote):
         s_expr = construct_x(m, stores, note.s_expr_nout_hash)
-        return QuoteForm(s_expr)
+        return QuoteForm(s_expr, metadata)
 
     if isinstance(note, BecomeDefine):
         symbol = construct_atom(m, stores, note.symbol)
         definition = construct_form(m, stores, note.definition)
 
-        return DefineForm(symbol, definition)
+        return DefineForm(symbol, definition, metadata)
 
     if isinstance(note, BecomeApplication):
         procedure = construct_form(m, stores, note.procedure)
         parameters = construct_form_list(m, stores, note.parameters)
 
-        return ApplicationForm(procedure, parameters)
+        return ApplicationForm(procedure, parameters, metadata)
 
     if isinstance(note, BecomeIf):
         predicate = construct_form(m, stores, note.predicate)
         consequent = construct_form(m, stores, note.consequent)
         alternative = construct_form(m, stores, note.alternative)
 
-        return IfForm(predicate, consequent, alternative)
+        return IfForm(predicate, consequent, alternative, metadata)
 
     if isinstance(note, BecomeLambda):
         parameters = construct_atom_list(m, stores, note.parameters)
         body = construct_form_list(m, stores, note.body)
 
-        return LambdaForm(parameters, body)
+        return LambdaForm(parameters, body, metadata)
 
     if isinstance(note, BecomeSequence):
         sequence = construct_form_list(m, stores, note.sequence)
-        return SequenceForm(sequence)
+        return SequenceForm(sequence, metadata)
 
     # In all of the below: # TODO CHECK EXISITNG Type matches the change.
 
     if isinstance(note, ChangeQuote):
         s_expr = construct_x(m, stores, note.s_expr_nout_hash)
-        return QuoteForm(s_expr)
+        return QuoteForm(s_expr, metadata)
 
     if isinstance(note, DefineChangeDefinition):
         definition = construct_form(m, stores, note.form_nout_hash)
-        return DefineForm(structure.symbol, definition)
+        return DefineForm(structure.symbol, definition, metadata)
 
     if isinstance(note, DefineChangeSymbol):
         symbol = construct_atom(m, stores, note.symbol)
-        return DefineForm(symbol, structure.definition)
+        return DefineForm(symbol, structure.definition, metadata)
 
     if isinstance(note, ApplicationChangeParameters):
         parameters = construct_form_list(m, stores, note.parameters)
-        return ApplicationForm(structure.procedure, parameters)
+        return ApplicationForm(structure.procedure, parameters, metadata)
 
     if isinstance(note, ApplicationChangeProcedure):
         procedure = construct_form(m, stores, note.form_nout_hash)
 
-        return ApplicationForm(procedure, structure.arguments)
+        return ApplicationForm(procedure, structure.arguments, metadata)
 
     if type(note) in [ChangeIfPredicate, ChangeIfConsequent, ChangeIfAlternative]:
         args = [structure.predicate, structure.consequent, structure.alternative]
@@ -143,23 +144,23 @@ def play_form_note(m, stores, structure, note, metadata_NOT_YET_USED):
 
         args[i] = construct_form(m, stores, note.form_nout_hash)
 
-        return IfForm(*args)
+        return IfForm(*args, metadata=metadata)
 
     if isinstance(note, LambdaChangeBody):
         body = construct_form_list(m, stores, note.body)
 
-        return LambdaForm(structure.parameters, body)
+        return LambdaForm(structure.parameters, body, metadata)
 
     if isinstance(note, LambdaChangeParameters):
         parameters = construct_atom_list(m, stores, note.parameters)
 
-        return LambdaForm(parameters, structure.body)
+        return LambdaForm(parameters, structure.body, metadata)
 
     if isinstance(note, ChangeSequence):
         sequence = construct_form_list(m, stores, note.sequence)
-        return SequenceForm(sequence)
+        return SequenceForm(sequence, metadata)
 
-    raise Exception("Not implemented type %s", type(note).__name__)
+    raise Exception("Not implemented type %s" % type(note).__name__)
 
 
 def play_atom_note(m, stores, structure, note, metadata_NOT_YET_USED):
@@ -231,33 +232,16 @@ def play_form_list_note(m, stores, structure, note, metadata):
 def construct(HashClass, empty_structure, memoization_key, store_key, play, m, stores, edge_nout_hash):
     """This provides a general mechanism for constructing structures by playing notes.
 
-    Refactoring note: this mechanism is so general, that we may want to lift it out of the present module and use it
-    elsewhere as well (e.g. "construct_x")
+    The actual walking back & replaying is done by the general construction engine (see construction.py).
     """
     pmts(edge_nout_hash, HashClass)
 
-    memoization = getattr(m, memoization_key)
-    store = getattr(stores, store_key)
+    def play_note(structure, note, nout_hash):
+        return play(m, stores, structure, note, YourOwnHash(nout_hash))
 
-    structure = empty_structure
-
-    todo = []
-    for tup in store.all_nhtups_for_nout_hash(edge_nout_hash):
-        if tup.nout_hash in memoization:
-            structure = memoization[tup.nout_hash]
-            break
-        todo.append(tup)
-
-    for tup in reversed(todo):
-        edge_nout = tup.nout
-        edge_nout_hash = tup.nout_hash
-
-        note = edge_nout.note
-
-        structure = play(m, stores, structure, note, YourOwnHash(edge_nout_hash))
-        memoization[edge_nout_hash] = structure
-
-    return structure
+    return general_construct(
+        memoization_key, getattr(stores, store_key), getattr(m, memoization_key), empty_structure, play_note,
+        edge_nout_hash)
 
 
 def construct_form(m, stores, edge_nout_hash):
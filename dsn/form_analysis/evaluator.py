@@ -1,3 +1,5 @@
+import operator
+
 from utils import pmts
 
 from dsn.form_analysis.structure import (
@@ -62,6 +64,22 @@ class CompoundProcedure(Procedure):
         self.environment = environment
 
 
+# ## Builtins:
+BUILTINS = {
+    "+": BuiltinProcedure(operator.add),
+    "-": BuiltinProcedure(operator.sub),
+    "*": BuiltinProcedure(operator.mul),
+    "=": BuiltinProcedure(operator.eq),
+    "<": BuiltinProcedure(operator.lt),
+    ">": BuiltinProcedure(operator.gt),
+}
+
+
+def builtins_frame():
+    """A fresh (i.e. safe to define things in) top-level Frame, containing the builtins."""
+    return Frame(None, dict(BUILTINS))
+
+
 # ## Evaluation:
 def evaluate(form, environment):
     if isinstance(form, MalformedForm):
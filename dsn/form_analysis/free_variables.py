@@ -1,9 +1,44 @@
+from collections import namedtuple
+
+from list_operations import l_insert, l_delete, l_replace
+
+from dsn.form_analysis.clef import (
+    ApplicationChangeParameters,
+    ApplicationChangeProcedure,
+    BecomeApplication,
+    BecomeDefine,
+    BecomeIf,
+    BecomeLambda,
+    BecomeMalformed,
+    BecomeQuote,
+    BecomeSequence,
+    BecomeValue,
+    BecomeVariable,
+    ChangeIfAlternative,
+    ChangeIfConsequent,
+    ChangeIfPredicate,
+    ChangeQuote,
+    ChangeSequence,
+    DefineChangeDefinition,
+    DefineChangeSymbol,
+    FormListDelete,
+    FormListInsert,
+    FormListReplace,
+    LambdaChangeBody,
+    LambdaChangeParameters,
+)
+from dsn.form_analysis.collect_definitions import (
+    collect_definitions,
+    construct_definitions_list,
+    memoized_collect_definitions,
+)
+from dsn.form_analysis.construct import construct, construct_atom_list
+from dsn.form_analysis.legato import FormNoteNoutHash, FormListNoteNoutHash
 from dsn.form_analysis.structure import (
     VariableForm,
     LambdaForm,
 )
-from dsn.form_analysis.utils import general_means_of_collection
-from dsn.form_analysis.collect_definitions import collect_definitions
+from dsn.form_analysis.utils import EMPTY_COUNTS, counted, general_means_of_collection, memoized_analysis, same
 
 
 def free_variables(form):
@@ -49,6 +84,26 @@ def free_variables(form):
     return general_means_of_collection(form, free_variables, lambda l: set.union(*l), set())
 
 
+def memoized_free_variables(m, form):
+    """As free_variables, memoized by nout_hash (see memoized_analysis) for the form and all of its descendants, i.e.
+    after an edit only the edited form and its ancestors are analysed anew; returns a frozenset."""
+
+    def analysis(form):
+        if isinstance(form, VariableForm):
+            return frozenset([form.symbol.symbol])
+
+        if isinstance(form, LambdaForm):
+            a = _union(*[memoized_free_variables(m, f) for f in form.body])
+            b = frozenset([d.symbol.symbol for d in memoized_collect_definitions(m, form)])
+            c = frozenset([p.symbol for p in form.parameters])
+            return a - b - c
+
+        return general_means_of_collection(form, lambda f: memoized_free_variables(m, f), lambda l: _union(*l),
+                                           frozenset())
+
+    return memoized_analysis(m, "free_variables", analysis, form)
+
+
 # ## Incremental analysis
 #
 # Here are some thoughts about an incremental analysis of both `collect_definitions` and `free_variables`.
@@ -78,6 +133,9 @@ def free_variables(form):
 # has a close match to this incremental analyses.  Having code that closely matches this intuition is a nice to have.
 # 2. Performance of the non-naive approach might be better (would need to be proven though)
 #
+# (The non-naive approach has since been implemented for free variables; see "Non-naive incremental analysis;
+# implementation" at the end of this file)
+#
 # However, as it stands it's not unsatisfying enough to actually take action on it and implement it as such. The naive
 # approach also has a big advantage: simplicity of implementation (and future maintenance)
 #
@@ -142,3 +200,189 @@ def free_variables(form):
 # analyses potentially encode multiple deletions and additions in a single note - such a setup also removes the need for
 # Change notes. Alternatively, we could have explicit Composition-Notes. N.B. When multiple changes are combined into a
 # single note, the above clef-to-clef approach ("Collecting definitions") must be reconsidered)
+
+#
+# ### Non-naive incremental analysis; implementation
+#
+# The below implements the incremental analysis of free variables along the lines sketched above, by playing form notes
+# (and form list notes) onto the analysis' previous structure. It uses the same construction mechanism as construct_form
+# does; the results are thus memoized per nout_hash, which means that a change deep down in a program costs a single
+# step per ancestor, each step taking time proportional to the change rather than to the size of the (sub)program.
+#
+# It's a construction of its own, next to construct_form rather than a part of it: Forms have no place for the results
+# of analyses, and most constructions of forms don't need their free variables. Both are keyed by the same nout_hash,
+# i.e. for a constructed form, construct_free_variables(m, stores, form.metadata.nout_hash) is its analysis.
+#
+# The analysis' structures keep, besides the set of free variable names, the structures of the form's parts (because
+# change-notes, e.g. ChangeIfPredicate, replace only a single part). At the level of lists we count, for each name, in
+# how many of the elements it occurs as a free variable; this is the "set-membership" counting from the above: the set
+# of names changes only when a count goes from 0 to 1 or vice versa. Whenever a part's set of names does not change,
+# the propagation stops: the previous set of names (the very same object) is reused.
+#
+# The definitions of a lambda are collected incrementally too; see collect_definitions.py
+
+FreeVariables = namedtuple('FreeVariables', (
+    'names',  # frozenset
+    'parts',  # tuple of the analysis' structures for the form's parts, in the order of the form's fields
+    ))
+
+FreeVariablesList = namedtuple('FreeVariablesList', (
+    'the_list',  # list of FreeVariables
+    'counts',  # Counts: name => the number of elements in the_list in which the name occurs as a free variable
+    'names',  # frozenset of the keys of counts
+    ))
+
+
+NO_FREE_VARIABLES = FreeVariables(frozenset(), ())
+
+EMPTY_FREE_VARIABLES_LIST = FreeVariablesList([], EMPTY_COUNTS, frozenset())
+
+
+def _union(*name_sets):
+    return frozenset().union(*name_sets)
+
+
+def _lambda_free_variables(parameters, body, definitions):
+    return FreeVariables(
+        body.names - definitions - frozenset(p.symbol for p in parameters), (parameters, body, definitions))
+
+
+def play_free_variables_note(m, stores, structure, note, metadata):
+    if type(note) in [BecomeMalformed, BecomeValue, BecomeQuote, ChangeQuote]:
+        return NO_FREE_VARIABLES
+
+    if isinstance(note, BecomeVariable):
+        return FreeVariables(frozenset([note.symbol]), ())
+
+    if isinstance(note, BecomeDefine):
+        definition = construct_free_variables(m, stores, note.definition)
+        return FreeVariables(definition.names, (definition,))
+
+    if isinstance(note, DefineChangeSymbol):
+        # No special treatment of Define's LHS (see above): the free variables are unaffected.
+        return structure
+
+    if isinstance(note, DefineChangeDefinition):
+        definition = construct_free_variables(m, stores, note.form_nout_hash)
+        if same(definition.names, structure.names):
+            return FreeVariables(structure.names, (definition,))
+        return FreeVariables(definition.names, (definition,))
+
+    if isinstance(note, BecomeIf):
+        parts = tuple(construct_free_variables(m, stores, h)
+                      for h in [note.predicate, note.consequent, note.alternative])
+        return FreeVariables(_union(*[part.names for part in parts]), parts)
+
+    if type(note) in [ChangeIfPredicate, ChangeIfConsequent, ChangeIfAlternative]:
+        i = {
+            ChangeIfPredicate: 0,
+            ChangeIfConsequent: 1,
+            ChangeIfAlternative: 2,
+        }[type(note)]
+
+        parts = list(structure.parts)
+        old_part, parts[i] = parts[i], construct_free_variables(m, stores, note.form_nout_hash)
+
+        if same(old_part.names, parts[i].names):
+            return FreeVariables(structure.names, tuple(parts))
+        return FreeVariables(_union(*[part.names for part in parts]), tuple(parts))
+
+    if isinstance(note, BecomeApplication):
+        procedure = construct_free_variables(m, stores, note.procedure)
+        arguments = construct_free_variables_list(m, stores, note.parameters)
+        return FreeVariables(procedure.names | arguments.names, (procedure, arguments))
+
+    if type(note) in [ApplicationChangeProcedure, ApplicationChangeParameters]:
+        procedure, arguments = structure.parts
+
+        if isinstance(note, ApplicationChangeProcedure):
+            old_names, procedure = procedure.names, construct_free_variables(m, stores, note.form_nout_hash)
+            new_names = procedure.names
+        else:
+            old_names, arguments = arguments.names, construct_free_variables_list(m, stores, note.parameters)
+            new_names = arguments.names
+
+        if same(old_names, new_names):
+            return FreeVariables(structure.names, (procedure, arguments))
+        return FreeVariables(procedure.names | arguments.names, (procedure, arguments))
+
+    if type(note) in [BecomeSequence, ChangeSequence]:
+        sequence = construct_free_variables_list(m, stores, note.sequence)
+        if structure is not None and same(sequence.names, structure.names):
+            return FreeVariables(structure.names, (sequence,))
+        return FreeVariables(sequence.names, (sequence,))
+
+    if isinstance(note, BecomeLambda):
+        parameters = construct_atom_list(m, stores, note.parameters)
+        return _lambda_free_variables(
+            parameters, construct_free_variables_list(m, stores, note.body),
+            construct_definitions_list(m, stores, note.body).names)
+
+    if isinstance(note, LambdaChangeParameters):
+        old_parameters, body, definitions = structure.parts
+        parameters = construct_atom_list(m, stores, note.parameters)
+
+        if parameters == old_parameters:
+            return FreeVariables(structure.names, (parameters, body, definitions))
+        return _lambda_free_variables(parameters, body, definitions)
+
+    if isinstance(note, LambdaChangeBody):
+        parameters, old_body, old_definitions = structure.parts
+        body = construct_free_variables_list(m, stores, note.body)
+        definitions = construct_definitions_list(m, stores, note.body).names
+
+        if same(body.names, old_body.names) and same(definitions, old_definitions):
+            return FreeVariables(structure.names, (parameters, body, old_definitions))
+        return _lambda_free_variables(parameters, body, definitions)
+
+    raise Exception("Not implemented type %s" % type(note).__name__)
+
+
+def play_free_variables_list_note(m, stores, structure, note, metadata):
+    if isinstance(note, FormListInsert):
+        if not (0 <= note.index <= len(structure.the_list)):  # Note: insert _at_ len(..) is ok (a.k.a. append)
+            raise Exception("Out of bounds: %s" % note.index)
+
+        element = construct_free_variables(m, stores, note.form_nout_hash)
+        the_list = l_insert(structure.the_list, note.index, element)
+        removed, added = frozenset(), element.names
+
+    else:
+        if not (0 <= note.index <= len(structure.the_list) - 1):  # For Delete/Replace the check is "inside bounds"
+            raise Exception("Out of bounds: %s" % note.index)
+
+        if isinstance(note, FormListDelete):
+            the_list = l_delete(structure.the_list, note.index)
+            removed, added = structure.the_list[note.index].names, frozenset()
+
+        elif isinstance(note, FormListReplace):
+            element = construct_free_variables(m, stores, note.form_nout_hash)
+            the_list = l_replace(structure.the_list, note.index, element)
+            removed, added = structure.the_list[note.index].names, element.names
+
+            if same(removed, added):
+                return FreeVariablesList(the_list, structure.counts, structure.names)
+
+        else:
+            raise Exception("Unknown note %s" % type(note).__name__)
+
+    counts, crossed_0 = counted(structure.counts, removed, -1)
+    counts, crossed_1 = counted(counts, added, 1)
+
+    # A name that crossed 0 in both steps (removed, then added back) is in the set of names as before.
+    crossed = crossed_0 ^ crossed_1
+    return FreeVariablesList(the_list, counts, structure.names ^ crossed if crossed else structure.names)
+
+
+def construct_free_variables(m, stores, form_nout_hash):
+    """Incremental analysis of free variables: returns a FreeVariables for the form at form_nout_hash."""
+    return construct(
+        FormNoteNoutHash, None, 'construct_free_variables', 'form_note_nout', play_free_variables_note,
+        m, stores, form_nout_hash)
+
+
+def construct_free_variables_list(m, stores, form_list_nout_hash):
+    return construct(
+        FormListNoteNoutHash, EMPTY_FREE_VARIABLES_LIST, 'construct_free_variables_list', 'form_list_note_nout',
+        play_free_variables_list_note,
+        m, stores, form_list_nout_hash)
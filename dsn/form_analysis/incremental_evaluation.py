@@ -0,0 +1,181 @@
+"""
+Incremental evaluation of a program's top-level definitions, i.e. re-evaluation after an edit of only what's needed.
+
+A program is a list of top-level forms (the elements of a SequenceForm, or the body of a LambdaForm); its definitions
+are kept in a Frame of their own (a child of the globals' Frame, see initial_state) from one evaluation to the next.
+When a definition is removed, it's removed from that Frame only, i.e. any global of the same name (e.g. a builtin that
+the definition shadowed) is visible again. A definition is re-evaluated when:
+
+* it has changed, which is detected by comparing its nout_hash with that of the previous evaluation (forms without
+  metadata, e.g. those that are constructed by hand, are compared by value instead)
+
+* it depends (transitively, as calculated by LocalNameClosures) on a definition that has changed or was removed;
+  unless it's the definition of a lambda: evaluating a LambdaForm does not look up any names (these are looked up when
+  the procedure is applied, in the very same Frame), i.e. its value would be no different. (Its dependencies are still
+  followed, e.g. for `(define x (f 1))` x must be re-evaluated when something that f depends on has changed.)
+
+The definitions are re-evaluated in dependency order (where there are cycles, e.g. for mutually recursive procedures, in
+the order of the program); the top-level expressions (the non-definitions) are evaluated after all definitions, and
+only when they have changed or depend on a re-evaluated or removed definition.
+
+When evaluation raises an exception, the Frame may have been partially updated; the next evaluation should then start
+from scratch (previous_state=None).
+"""
+
+from collections import namedtuple
+
+from dsn.form_analysis.evaluator import Frame, builtins_frame, evaluate
+from dsn.form_analysis.free_variables import free_variables
+from dsn.form_analysis.name_closures import LocalNameClosures
+from dsn.form_analysis.structure import (
+    DefineForm,
+    LambdaForm,
+    SequenceForm,
+)
+
+EvaluationState = namedtuple('EvaluationState', (
+    'frame',  # the program's own Frame (i.e. not the globals' Frame; see initial_state)
+    'definition_keys',  # {symbol: (key, ...)}, for the definitions that were evaluated in frame (see _key)
+    'expression_values',  # [(key, value)], for the top-level expressions in order
+))
+
+EvaluationReport = namedtuple('EvaluationReport', (
+    'evaluated_definitions',  # [symbol], in the order of evaluation
+    'definition_count',
+    'evaluated_expression_count',
+    'expression_count',
+    'values',  # the values of the top-level expressions, in order
+))
+
+
+def _key(form):
+    """What identifies a form for the purpose of detecting change: its nout_hash if it has one, the form itself if not.
+    """
+    if form.metadata is None:
+        return form
+    return form.metadata.nout_hash
+
+
+def initial_state(globals_frame=None):
+    """The state to evaluate a program in for the first time; globals_frame defaults to the builtins."""
+    if globals_frame is None:
+        globals_frame = builtins_frame()
+
+    return EvaluationState(Frame(globals_frame), {}, [])
+
+
+def top_level_forms(program):
+    if isinstance(program, SequenceForm):
+        return program.sequence.the_list
+
+    if isinstance(program, LambdaForm):
+        return program.body.the_list
+
+    raise Exception("Case analysis fail %s" % type(program))
+
+
+def _in_dependency_order(names, dependencies, program_order):
+    result = []
+    seen = set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for dependency in sorted(dependencies[name] & names, key=program_order.get):
+            visit(dependency)
+        result.append(name)
+
+    for name in sorted(names, key=program_order.get):
+        visit(name)
+
+    return result
+
+
+def evaluate_incrementally(previous_state, program):
+    """:: EvaluationState | None, program -> EvaluationState, EvaluationReport"""
+    forms = top_level_forms(program)
+
+    definitions = {}  # {symbol: [DefineForm]}, in the order of the program
+    expressions = []
+    for form in forms:
+        if isinstance(form, DefineForm) and form.symbol.symbol is not None:
+            # Redefinitions are illegal (see collect_definitions), but not yet checked; like the evaluator, we evaluate
+            # all definitions of a name, in order. Unlike the evaluator, we do this in one go: a use of the name
+            # in between two of its definitions (in some other definition) sees the value of the last one.
+            definitions.setdefault(form.symbol.symbol, []).append(form)
+        else:
+            expressions.append(form)
+
+    program_order = {symbol: i for i, symbol in enumerate(definitions)}
+
+    if previous_state is None:
+        previous_state = initial_state()
+
+    frame = previous_state.frame
+    definition_keys = {symbol: tuple(_key(form) for form in forms) for symbol, forms in definitions.items()}
+
+    previous_keys = previous_state.definition_keys
+    changed = {symbol for symbol in definitions if symbol not in previous_keys or (
+        previous_keys[symbol] != definition_keys[symbol])}
+    removed = set(previous_state.definition_keys) - set(definitions)
+
+    for symbol in removed:
+        frame.data.pop(symbol, None)
+
+    # Only dependencies on top-level names are of interest here (other free variables, e.g. builtins, do not change);
+    # this includes the names that were just removed: what depends on those must be re-evaluated (and will fail).
+    top_level_names = set(definitions) | removed
+    dependencies = {
+        symbol: set.union(set(), *[free_variables(form) for form in forms]) & top_level_names
+        for symbol, forms in definitions.items()
+    }
+
+    # The removed names are not defined, i.e. they show up as the "exits" of the closures.
+    closures = LocalNameClosures(dependencies)
+
+    affected = {symbol for symbol in definitions if closures.reach[symbol] & changed or closures.exits[symbol]}
+    to_evaluate = {symbol for symbol in affected if symbol in changed or not all(
+        isinstance(form.definition, LambdaForm) for form in definitions[symbol])}
+
+    evaluated_definitions = _in_dependency_order(to_evaluate, dependencies, program_order)
+    for symbol in evaluated_definitions:
+        for form in definitions[symbol]:
+            evaluate(form, frame)
+
+    # Expressions are matched with those of the previous evaluation by key (rather than by position, which may change)
+    previous_expression_values = list(previous_state.expression_values)
+    expression_values = []
+    evaluated_expression_count = 0
+
+    for expression in expressions:
+        key = _key(expression)
+        matches = [i for i, (k, v) in enumerate(previous_expression_values) if k == key]
+
+        if matches == [] or free_variables(expression) & (affected | removed):
+            value = evaluate(expression, frame)
+            evaluated_expression_count += 1
+        else:
+            value = previous_expression_values.pop(matches[0])[1]
+
+        expression_values.append((key, value))
+
+    state = EvaluationState(frame, definition_keys, expression_values)
+    report = EvaluationReport(
+        evaluated_definitions,
+        len(definitions),
+        evaluated_expression_count,
+        len(expressions),
+        [value for (key, value) in expression_values],
+    )
+    return state, report
+
+
+def pp_evaluation_report(report):
+    return "%s of %s definitions (%s), %s of %s expressions" % (
+        len(report.evaluated_definitions),
+        report.definition_count,
+        " ".join(report.evaluated_definitions),
+        report.evaluated_expression_count,
+        report.expression_count,
+    )
@@ -11,11 +11,12 @@ Should this be part of the s-expr module or the current one? Object Oriented pro
 Functional programmers point out that you can't know... which is true but not useful in actually making a decision.
 """
 from utils import pmts
+from construction import construct
 
 from dsn.s_expr.clef import BecomeNode, Insert, Replace, Delete
 from dsn.s_expr.structure import TreeText, YourOwnHash
-from dsn.s_expr.construct_x import construct_x
-from dsn.s_expr.legato import NoteCapo, NoteNoutHash
+from dsn.s_expr.construct_x import construct_x, x_note_play
+from dsn.s_expr.legato import NoteNoutHash
 
 from dsn.form_analysis.constants import VT_INTEGER, VT_STRING
 from dsn.form_analysis.clef import (
@@ -55,10 +56,6 @@ from dsn.form_analysis.construct import (
     play_atom_note,
     play_atom_list_note,
     # play_form_list_note, NOTE why assymmetriccally not imported here...
-
-    construct_form,
-    construct_atom,
-    construct_atom_list,
 )
 from dsn.form_analysis.structure import (
     ApplicationForm,
@@ -400,8 +397,7 @@ def play_atom_list(m, stores, s_expr_note, previous_s_expr_, s_expr, previous_at
 
 
 def construct_analysis_note(
-        m, stores, edge_nout_hash, memoization_key, store_key, play, play_note, construct_structure, empty_structure,
-        Capo, Slur):
+        m, stores, edge_nout_hash, memoization_key, store_key, play, play_note, empty_structure, Capo, Slur):
     """Generic mechanism to construct any of the 4 types of notes from the form-analysis Clef.
 
     * play: the mechanism of constructing analysis* notes out of s_expr notes
@@ -416,38 +412,24 @@ def construct_analysis_note(
     memoization = getattr(m, memoization_key)
     store = getattr(stores, store_key)
 
-    # In the beginning, there is nothing, which we model as `None`
-    constructed_note = None
-    constructed_structure = empty_structure
-
-    # the below is just a quick & dirty way of constructing the first nout_hash. Because any NoutHashStore contains the
-    # Capo, this is actually a side-effect-free operation.
-    constructed_nout_hash = store.add(Capo())
-
-    todo = []
-    for tup in stores.note_nout.all_nhtups_for_nout_hash(edge_nout_hash):
-        if tup.nout_hash in memoization:
-            constructed_note, constructed_nout_hash = memoization[tup.nout_hash]
+    # While playing, the state is (constructed_note, constructed_nout_hash, constructed_structure, s_expr); the state is
+    # memoized as a whole, which means that constructing for a memoized nout_hash's descendant is a matter of playing
+    # the notes that come after it (rather than constructing the structure & s_expr from first principles).
 
-            # NOTE on why we need to construct from first principles.... rather than taking a single step using "play".
-            constructed_structure = construct_structure(m, stores, constructed_nout_hash)
-            break
-
-        todo.append(tup)
-
-    # The first previous_s_expr is looked up once pre-loop; in the loop itself we simply use the previous loop's value
-    if isinstance(tup.nout, NoteCapo):
-        previous_s_expr = None  # a more explicit means of modelling this might be desirable.
-    else:
-        previous_s_expr = construct_x(m, stores, tup.nout.previous_hash)
+    # In the beginning, there is nothing, which we model as `None`
+    # The Capo's nout_hash is constructed in a quick & dirty way: because any NoutHashStore contains the Capo, this is
+    # actually a side-effect-free operation.
+    initial_state = (None, store.add(Capo()), empty_structure, None)
 
-    for tup in reversed(todo):
-        edge_nout = tup.nout
-        edge_nout_hash = tup.nout_hash
+    def recurse(nout_hash):
+        return construct_x(m, stores, nout_hash)
 
-        note = edge_nout.note
+    def play_s_expr_note(state, note, nout_hash):
+        _, constructed_nout_hash, constructed_structure, previous_s_expr = state
 
-        s_expr = construct_x(m, stores, edge_nout_hash)
+        # The s_expr is stepped, rather than constructed for nout_hash: for a note that touches a single child (Insert,
+        # Replace) only that child is constructed.
+        s_expr = x_note_play(note, previous_s_expr, recurse, YourOwnHash(nout_hash))
 
         constructed_note = play(m, stores, note, previous_s_expr, s_expr, constructed_structure)
 
@@ -465,9 +447,10 @@ def construct_analysis_note(
         constructed_structure = play_note(
             m, stores, constructed_structure, constructed_note, YourOwnHash(constructed_nout_hash))
 
-        memoization[edge_nout_hash] = constructed_note, constructed_nout_hash
+        return constructed_note, constructed_nout_hash, constructed_structure, s_expr
 
-        previous_s_expr = s_expr
+    constructed_note, constructed_nout_hash, _, _ = construct(
+        memoization_key, stores.note_nout, memoization, initial_state, play_s_expr_note, edge_nout_hash)
 
     return constructed_note, constructed_nout_hash
 
@@ -475,16 +458,16 @@ def construct_analysis_note(
 def construct_form_note(m, stores, edge_nout_hash):
     return construct_analysis_note(
         m, stores, edge_nout_hash, 'construct_form_note', 'form_note_nout', play_form, play_form_note,
-        construct_form, None, FormNoteCapo, FormNoteSlur)
+        None, FormNoteCapo, FormNoteSlur)
 
 
 def construct_atom_note(m, stores, edge_nout_hash):
     return construct_analysis_note(
         m, stores, edge_nout_hash, 'construct_atom_note', 'atom_note_nout', play_atom, play_atom_note,
-        construct_atom, None, AtomNoteCapo, AtomNoteSlur)
+        None, AtomNoteCapo, AtomNoteSlur)
 
 
 def construct_atom_list_note(m, stores, edge_nout_hash):
     return construct_analysis_note(
         m, stores, edge_nout_hash, 'construct_atom_list_note', 'atom_list_note_nout', play_atom_list,
-        play_atom_list_note, construct_atom_list, None, AtomListNoteCapo, AtomListNoteSlur)
+        play_atom_list_note, None, AtomListNoteCapo, AtomListNoteSlur)
@@ -1,13 +1,18 @@
 # Lexical Addressing "X", because as of yet, we only do a very particular kind of addressing. Namely: we refer to a
 # scope by "frames up", but we do not address within the scope (e.g.: memory-offset, or var-count-offset)
 
+from types import MappingProxyType
+
+import instrumentation
+
 from utils import pmts
 
-from dsn.form_analysis.free_variables import free_variables
+from dsn.form_analysis.free_variables import free_variables, memoized_free_variables
 from dsn.form_analysis.name_dependencies import name_dependencies
-from dsn.form_analysis.collect_definitions import collect_definitions
-from dsn.form_analysis.utils import general_means_of_collection
+from dsn.form_analysis.collect_definitions import collect_definitions, memoized_collect_definitions
+from dsn.form_analysis.utils import general_means_of_collection, memoized_analysis
 from dsn.form_analysis.structure import (
+    DefineForm,
     LambdaForm,
 )
 
@@ -201,7 +206,8 @@ def construct_most_complete_lambda_tree(lambda_tree, parent_scope=None):
     pmts(lambda_tree, LambdaTree)
 
     if parent_scope is None:
-        lexical_addresses = {}
+        # At the root, there is no surrounding scope to look free variables up in: they are not defined (None)
+        lexical_addresses = {symbol: None for symbol in free_variables(lambda_tree.lambda_form)}
     else:
         pmts(parent_scope, MostCompleteLambdaTree)
         lexical_addresses = parent_scope.lexical_addresses
@@ -286,3 +292,145 @@ def calculate_name_closure(most_complete_scope, name, seen=None):
         # each other, and hence is expected to be a better starting-point for the incremental analysis.
 
     return result
+
+
+# ## Memoized construction
+#
+# The above construct the trees from scratch: at each lambda, free_variables & collect_definitions are (re)calculated,
+# for the lambda's whole body (including any nested lambdas). The below construct the same trees, but memoized by the
+# nout_hash of the lambda forms (i.e. for forms that are constructed out of notes; for others there's no memoization):
+#
+# * Per lambda, the information that's needed for the analyses (LambdaScope) is calculated out of the memoized
+#   structural analyses (free variables, definitions, lambda children) of the lambda's body. After an edit, only the
+#   edited form and its ancestors are analysed anew.
+#
+# * Lexical addresses (and the LexicallyAddressedLambdaTree as a whole) are memoized by the lambda's nout_hash and the
+#   addresses in the surrounding scope of its free variables: i.e. a lambda's addresses are recalculated only when
+#   either its body changed, or the surrounding scope's bindings for the names it uses changed.
+#
+# MostCompleteLambdaTrees have pointers to their parents, and can therefore not be shared between trees; their
+# constituent parts (lexical addresses & name dependencies) are, however.
+
+class LambdaScope(object):
+    # LambdaScopes are memoized (and their name_dependencies shared between MostCompleteLambdaTrees), hence all of their
+    # attributes are immutable.
+
+    def __init__(self, parameters, defined, body_free_variables, name_dependencies, lambda_children):
+        self.parameters = parameters  # :: frozenset of symbols
+        self.defined = defined  # :: frozenset of symbols
+        self.body_free_variables = body_free_variables  # :: frozenset of symbols
+        self.free_variables = body_free_variables - defined - parameters
+        self.name_dependencies = name_dependencies  # as in name_dependencies.py, but a read-only view with frozensets
+        self.lambda_children = lambda_children  # :: tuple; as in find_lambda_children, for the lambda's body
+
+
+def memoized_find_lambda_children(m, form):
+    """As find_lambda_children, memoized by nout_hash (see memoized_analysis); returns a tuple."""
+    if isinstance(form, LambdaForm):
+        return (form,)
+
+    return memoized_analysis(m, "find_lambda_children", lambda form: tuple(general_means_of_collection(
+        form, lambda f: memoized_find_lambda_children(m, f), add_lists, [])), form)
+
+
+def lambda_scope(m, lambda_form):
+    pmts(lambda_form, LambdaForm)
+
+    def analysis(lambda_form):
+        parameters = frozenset(p.symbol for p in lambda_form.parameters)
+        result_name_dependencies = {p: frozenset() for p in parameters}
+        body_free_variables = set()
+        lambda_children = []
+
+        for form in lambda_form.body:
+            form_free_variables = memoized_free_variables(m, form)
+            body_free_variables |= form_free_variables
+            lambda_children.extend(memoized_find_lambda_children(m, form))
+
+            if isinstance(form, DefineForm):
+                result_name_dependencies[form.symbol.symbol] = frozenset(form_free_variables)
+
+        defined = frozenset(f.symbol.symbol for f in memoized_collect_definitions(m, lambda_form))
+        return LambdaScope(parameters, defined, frozenset(body_free_variables),
+                           MappingProxyType(result_name_dependencies), tuple(lambda_children))
+
+    return memoized_analysis(m, "lambda_scope", analysis, lambda_form)
+
+
+def construct_lambda_tree_memoized(m, lambda_form):
+    """As construct_lambda_tree, memoized."""
+    return memoized_analysis(m, "lambda_tree", lambda lambda_form: LambdaTree(lambda_form, [
+        construct_lambda_tree_memoized(m, c) for c in lambda_scope(m, lambda_form).lambda_children]), lambda_form)
+
+
+def _memoized_lexical_addresses(m, surrounding_scope, lambda_form):
+    """As lexical_addressing_x; returns (key, lexical_addresses), key being the memoization-key (or None)."""
+    scope = lambda_scope(m, lambda_form)
+    this_scope = scope.parameters | scope.defined
+
+    # The only information from the surrounding scope that matters: the addresses of the free variables.
+    surrounding = frozenset((symbol, surrounding_scope[symbol]) for symbol in scope.free_variables)
+
+    result = {symbol: 0 for symbol in scope.body_free_variables & this_scope}
+    for symbol, looked_up in surrounding:
+        result[symbol] = None if looked_up is None else looked_up + 1
+
+    key = None if lambda_form.metadata is None else (lambda_form.metadata.nout_hash, surrounding)
+    return key, result
+
+
+def construct_lexically_addressed_lambda_tree_memoized(m, lambda_tree, surrounding_scope=None):
+    """As construct_lexically_addressed_lambda_tree, memoized."""
+    if surrounding_scope is None:
+        surrounding_scope = {}
+
+    pmts(surrounding_scope, dict)
+    pmts(lambda_tree, LambdaTree)
+
+    key, lexical_addresses = _memoized_lexical_addresses(m, surrounding_scope, lambda_tree.lambda_form)
+    memoized = None if key is None else m.lexically_addressed_lambda_tree.get(key)
+    if memoized is not None:
+        instrumentation.count("memo_hits.lexically_addressed_lambda_tree")
+        return memoized
+
+    instrumentation.count("memo_misses.lexically_addressed_lambda_tree")
+
+    result = LexicallyAddressedLambdaTree(
+        lambda_tree.lambda_form,
+        lexical_addresses,
+        [construct_lexically_addressed_lambda_tree_memoized(m, child, lexical_addresses)
+         for child in lambda_tree.children],
+    )
+
+    if key is not None:
+        m.lexically_addressed_lambda_tree[key] = result
+
+    return result
+
+
+def construct_most_complete_lambda_tree_memoized(m, lambda_tree, parent_scope=None):
+    """As construct_most_complete_lambda_tree; the nodes are constructed anew, but their lexical addresses and name
+    dependencies are memoized (and shared between trees)."""
+    pmts(lambda_tree, LambdaTree)
+    lambda_form = lambda_tree.lambda_form
+
+    if parent_scope is None:
+        lexical_addresses = {symbol: None for symbol in lambda_scope(m, lambda_form).free_variables}
+    else:
+        pmts(parent_scope, MostCompleteLambdaTree)
+        lexical_addresses = parent_scope.lexical_addresses
+
+    key, lexical_addresses = _memoized_lexical_addresses(m, lexical_addresses, lambda_form)
+    if key is not None:
+        # shared, such that the same dict is used for the same key (which allows for cheap `is` checks)
+        lexical_addresses = m.most_complete_lexical_addresses.setdefault(key, lexical_addresses)
+
+    result = MostCompleteLambdaTree(
+        parent_scope,
+        lambda_form,
+        lexical_addresses,
+        lambda_scope(m, lambda_form).name_dependencies,
+    )
+
+    result.children = [construct_most_complete_lambda_tree_memoized(m, child, result) for child in lambda_tree.children]
+    return result
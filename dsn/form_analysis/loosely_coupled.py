@@ -1,37 +1,61 @@
 # TODO choose a spelling (analyzed is American, analysed is British)
 
+"""
+A scheduler for loosely coupled analyses over the tree of scopes (see lc/scope.py and sketch.txt).
+
+The analyses form a DAG: each analysis takes the outputs of other analyses (at the same node) as its input, and may
+additionally depend on its own output at the parent node (DOWN) or at the children (UP). There is a single "source"
+analysis, which is simply the input: the scope's (consolidated) form.
+
+Each change to the source is a tick of the clock. On each tick, only the analyses with changed inputs are re-run, and
+only at the nodes where the inputs have changed; if a re-run analysis' output compares equal to its previous output, the
+propagation stops there. To know where to descend to, each node keeps, for each analysis, the latest time at which its
+output at the node itself or at any of its descendants has changed (`recursive_times`).
+
+Changes to the shape of the scope tree are dealt with by matching the nodes of the new tree with those of the previous
+one by position. Because a scope's outputs only depend on its own form and those of its descendants (or its ancestors,
+for DOWN analyses) this is always correct; a node that is matched with an unrelated previous one simply has a changed
+source (and any scope that is added or removed implies a change in its parent's consolidated form).
+"""
 
 from collections import namedtuple
 
+import instrumentation
+
+from dsn.form_analysis.collect_definitions import collect_definitions
+from dsn.form_analysis.lc.scope import ConsolidatedLambdaForm, consolidated_form
+from dsn.form_analysis.lexical_addressing_x import add_lists, find_lambda_children
+from dsn.form_analysis.structure import VariableForm
+from dsn.form_analysis.utils import general_means_of_collection
+
 
 NONE = 0
 UP = 1
 DOWN = 2
 
-# TODO: make .name a property of analysis
-Analysis = namedtuple('Analysis', ['direction', 'dependencies', 'f'])
+Analysis = namedtuple('Analysis', ['name', 'direction', 'dependencies', 'f'])
 
 TimedOutput = namedtuple('TimedOutput', ['time', 'output'])
 
-
-# TODO as a global variable ?! meh.
-analysis_graph = {
-    'analysis-1': Analysis(UP, ['source'], analysis_1),
-    'analysis-2': Analysis(DOWN, ['analysis_1'], analysis_2),
-}
+SOURCE = 'source'
 
 
 class Node(object):
+    """The analyses of a single scope (and their timing); the tree of Nodes mirrors that of lc.scope.Scope."""
 
-    def __init__(self):
-        self.analysed_stuff = {}  # How will we initialize this in practice?
+    def __init__(self, children):
+        self.children = children  # :: [Node]
+        self.lambda_form = None
 
-        # meaning: per analysis, over the current node and all its descendants, what's the latest change?
+        # analysis name => TimedOutput
+        self.analysed_stuff = {}
 
-        # NOTE: if we have this mecahnism, do we need to have a global "something changed" tracking mechanism as well?
-        # maybe that's superfluous then.
+        # meaning: per analysis, over the current node and all its descendants, what's the latest change?
         self.recursive_times = {}
 
+    def __repr__(self):
+        return "(N " + repr(self.children) + ")"
+
     def update(self, analysis_name, analysis_output, current_time):
         # only updates if the set value is actually new.
 
@@ -41,6 +65,9 @@ class Node(object):
 
         return False
 
+    def output(self, analysis_name):
+        return self.analysed_stuff[analysis_name].output
+
 
 def get_next_analyses(analysis_graph, analyses_done, analyses_with_changed_outputs):
     return [a for a in analysis_graph.keys()
@@ -51,61 +78,65 @@ def get_next_analyses(analysis_graph, analyses_done, analyses_with_changed_outpu
             ]
 
 
-def the_algo(tree, current_time):
-    analyses_done = set()
-    analyses_with_changed_outputs = set()
+def the_algo(analysis_graph, tree, current_time):
+    """Propagates the changes to the source (which must already be set on the tree, see `tick`) through the analyses.
+    Returns a dict: analysis name => the number of nodes at which the analysis was actually done."""
+    analyses_done = set([SOURCE])
+    analyses_with_changed_outputs = set([SOURCE]) if tree.recursive_times.get(SOURCE) == current_time else set()
 
-    # did the source-analysis change the outputs?
-    # one answer could just be: that is assumed.
+    work = {}
 
     next_analyses = get_next_analyses(analysis_graph, analyses_done, analyses_with_changed_outputs)
     while next_analyses != []:
-        current_analysis = next_analyses[0]
+        current_analysis = analysis_graph[next_analyses[0]]
 
-        something_changed = do_analysis(all_kinds_of_stuff)
+        work[current_analysis.name] = 0
+        something_changed = do_analysis(current_analysis, tree, current_time, work)
+        instrumentation.count("lc_analyses_done." + current_analysis.name, work[current_analysis.name])
 
-        analyses_done.add(current_analysis)
+        analyses_done.add(current_analysis.name)
         if something_changed:
-            analyses_with_changed_outputs.add(current_analysis)
+            analyses_with_changed_outputs.add(current_analysis.name)
 
         next_analyses = get_next_analyses(analysis_graph, analyses_done, analyses_with_changed_outputs)
 
+    return work
+
 
-def do_analysis(analysis, other_stuff):
+def do_analysis(analysis, tree, current_time, work):
     if analysis.direction == NONE:
-        return do_undirected_analysis(analysis)
+        return do_undirected_analysis(analysis, tree, current_time, work)
     if analysis.direction == UP:
-        return do_upwards_analysis(analysis)
-    raise NotImplemented("The below has the wrong / a different return-type")
-    return do_downwards_analysis(analysis)  # TODO  return types don't match...
+        return do_upwards_analysis(analysis, tree, current_time, work)[2]
+    return do_downwards_analysis(analysis, tree, current_time, work, False, None)
 
 
-def do_undirected_analysis(analysis, node, current_time):
-    dependencies_are_reason_to_descend = False
-    for a_name in analysis.dependencies:
-        if node.recursive_times[a_name] == current_time:
-            dependencies_are_reason_to_descend = True
-            break
+def _reasons(analysis, node, current_time):
+    """Returns (dependencies_are_reason_to_descend, dependencies_are_reason_for_work_at_this_level)"""
+    return (
+        any(node.recursive_times.get(a_name) == current_time for a_name in analysis.dependencies),
+        any(node.analysed_stuff[a_name].time == current_time for a_name in analysis.dependencies),
+    )
 
-    dependencies_are_reason_for_work_at_this_level = False
-    for a_name in analysis.dependencies:
-        if node.analysed_stuff[a_name].time == current_time:
-            dependencies_are_reason_for_work_at_this_level = True
-            break
+
+def do_undirected_analysis(analysis, node, current_time, work):
+    dependencies_are_reason_to_descend, dependencies_are_reason_for_work_at_this_level = _reasons(
+        analysis, node, current_time)
 
     # note: we do pre-order; might as well pick post-order, as long as we don't do the work twice.
     change_at_present_level = False
 
     if dependencies_are_reason_for_work_at_this_level:
-        args = [node.analysed_stuff[a_name].output for a_name in analysis.dependencies]
+        args = [node.output(a_name) for a_name in analysis.dependencies]
         output = analysis.f(*args)
+        work[analysis.name] += 1
         change_at_present_level = node.update(analysis.name, output, current_time)
 
     any_lower_level_change = change_at_present_level
 
     if dependencies_are_reason_to_descend:
         for child in node.children:
-            recursive_result = do_undirected_analysis(analysis, child, current_time)
+            recursive_result = do_undirected_analysis(analysis, child, current_time, work)
             any_lower_level_change = any_lower_level_change or recursive_result
 
     if any_lower_level_change:
@@ -114,34 +145,27 @@ def do_undirected_analysis(analysis, node, current_time):
     return any_lower_level_change
 
 
-def do_downwards_analysis(analysis, node, current_time, parent_changed, parent_output):
-    dependencies_are_reason_to_descend = False
-    for a_name in analysis.dependencies:
-        if node.recursive_times[a_name] == current_time:
-            dependencies_are_reason_to_descend = True
-            break
-
-    dependencies_are_reason_for_work_at_this_level = False
-    for a_name in analysis.dependencies:
-        if node.analysed_stuff[a_name].time == current_time:
-            dependencies_are_reason_for_work_at_this_level = True
-            break
+def do_downwards_analysis(analysis, node, current_time, work, parent_changed, parent_output):
+    dependencies_are_reason_to_descend, dependencies_are_reason_for_work_at_this_level = _reasons(
+        analysis, node, current_time)
 
     change_at_present_level = False
 
-    # TODO: what if you're in initialization mode? i.e. the current value is not yet set?
-    output = node.analysed_stuff[analysis.name].output  # i.e. the status quo;
+    # i.e. the status quo (which does not exist yet for new nodes; but in that case the dependencies are new too)
+    output = node.analysed_stuff[analysis.name].output if analysis.name in node.analysed_stuff else None
 
     if dependencies_are_reason_for_work_at_this_level or parent_changed:
-        args = [node.analysed_stuff[a_name].output for a_name in analysis.dependencies]
+        args = [node.output(a_name) for a_name in analysis.dependencies]
         output = analysis.f(parent_output, *args)
+        work[analysis.name] += 1
         change_at_present_level = node.update(analysis.name, output, current_time)
 
     any_lower_level_change = change_at_present_level
 
     if dependencies_are_reason_to_descend or change_at_present_level:
         for child in node.children:
-            recursive_result = do_downwards_analysis(analysis, child, current_time, change_at_present_level, output)
+            recursive_result = do_downwards_analysis(
+                analysis, child, current_time, work, change_at_present_level, output)
             any_lower_level_change = any_lower_level_change or recursive_result
 
     if any_lower_level_change:
@@ -150,36 +174,29 @@ def do_downwards_analysis(analysis, node, current_time, parent_changed, parent_o
     return any_lower_level_change
 
 
-def do_upwards_analysis(analysis, node, current_time, other_stuff_here_perhaps):
-    dependencies_are_reason_to_descend = False
-    for a_name in analysis.dependencies:
-        if node.recursive_times[a_name] == current_time:
-            dependencies_are_reason_to_descend = True
-            break
-
-    dependencies_are_reason_for_work_at_this_level = False
-    for a_name in analysis.dependencies:
-        if node.analysed_stuff[a_name].time == current_time:
-            dependencies_are_reason_for_work_at_this_level = True
-            break
-
-    children_results = []
+def do_upwards_analysis(analysis, node, current_time, work):
+    """Returns (output, change_at_present_level, any_lower_level_change)"""
+    dependencies_are_reason_to_descend, dependencies_are_reason_for_work_at_this_level = _reasons(
+        analysis, node, current_time)
 
     if dependencies_are_reason_to_descend:
-        for child in node.children:
-            children_results.append(do_upwards_analysis(analysis, child, current_time))
+        children_results = [do_upwards_analysis(analysis, child, current_time, work) for child in node.children]
+    else:
+        # i.e. the status quo
+        children_results = [(child.output(analysis.name), False, False) for child in node.children]
 
     any_lower_level_change = any([cr[2] for cr in children_results])
     some_child_changed = any([cr[1] for cr in children_results])
     change_at_present_level = False
 
-    output = node.analysed_stuff[analysis.name].output  # i.e. the status quo;
+    output = node.analysed_stuff[analysis.name].output if analysis.name in node.analysed_stuff else None
 
     if dependencies_are_reason_for_work_at_this_level or some_child_changed:
-        args = [node.analysed_stuff[a_name].output for a_name in analysis.dependencies]
+        args = [node.output(a_name) for a_name in analysis.dependencies]
 
         children_outputs = [cr[0] for cr in children_results]
         output = analysis.f(children_outputs, *args)
+        work[analysis.name] += 1
         change_at_present_level = node.update(analysis.name, output, current_time)
 
     any_lower_level_change = any_lower_level_change or change_at_present_level
@@ -188,3 +205,124 @@ def do_upwards_analysis(analysis, node, current_time, other_stuff_here_perhaps):
         node.recursive_times[analysis.name] = current_time
 
     return output, change_at_present_level, any_lower_level_change
+
+
+def set_source(previous_node, lambda_form, current_time):
+    """Returns a Node for lambda_form, which carries over the analyses of previous_node (if any), and has the source set
+    to the (consolidated) form of the lambda.
+
+    If previous_node is a Node for the very same lambda_form (which is typical for the unchanged parts of a program: the
+    form constructions are memoized) it is simply reused, i.e. the cost of setting the source tracks the size of the
+    change rather than that of the whole program."""
+    if previous_node is not None and previous_node.lambda_form is lambda_form:
+        return previous_node
+
+    previous_children = previous_node.children if previous_node is not None else []
+
+    node = Node([
+        set_source(previous_children[i] if i < len(previous_children) else None, child, current_time)
+        for i, child in enumerate(add_lists([find_lambda_children(f) for f in lambda_form.body]))])
+    node.lambda_form = lambda_form
+
+    if previous_node is not None:
+        node.analysed_stuff = dict(previous_node.analysed_stuff)
+        node.recursive_times = dict(previous_node.recursive_times)
+
+    changed = node.update(SOURCE, consolidated_form(lambda_form), current_time)
+    if changed or any(child.recursive_times.get(SOURCE) == current_time for child in node.children):
+        node.recursive_times[SOURCE] = current_time
+
+    return node
+
+
+def tick(analysis_graph, previous_tree, lambda_form, current_time):
+    """Does all analyses of analysis_graph on lambda_form, reusing the analyses on previous_tree (the result of the
+    previous tick, or None) where possible. Returns (tree, work); see `the_algo` for the latter.
+
+    Note that nodes of previous_tree may be reused (and updated) in the resulting tree, i.e. previous_tree itself should
+    not be used after calling tick."""
+    tree = set_source(previous_tree, lambda_form, current_time)
+    work = the_algo(analysis_graph, tree, current_time)
+
+    if instrumentation.enabled:
+        # i.e. the work saved, as compared to doing all analyses from scratch
+        instrumentation.count("lc_analyses_skipped", node_count(tree) * len(analysis_graph) - sum(work.values()))
+
+    return tree, work
+
+
+def node_count(tree):
+    return 1 + sum(node_count(child) for child in tree.children)
+
+
+# ## The analyses
+#
+# The analyses below are the loosely coupled equivalents of the structural analyses in free_variables.py,
+# collect_definitions.py, name_dependencies.py and lexical_addressing_x.py; they operate on consolidated forms, i.e.
+# anything in a child scope is not seen directly, but must come from the child's analyses.
+
+ScopeFreeVariables = namedtuple('ScopeFreeVariables', [
+    'names',  # the free variables of the scope's lambda as a whole
+    'body_names',  # the free variables of the forms in the lambda's body (i.e. including the lambda's own names)
+    'children',  # for each of the children-scopes, the free variables of that child
+    ])
+
+
+def consolidated_free_variables(form, children_free_variables):
+    """The free variables of a consolidated form, given the free variables of the children-scopes (by index)."""
+    if isinstance(form, ConsolidatedLambdaForm):
+        return set(children_free_variables[form.index_in_scoped_children])
+
+    if isinstance(form, VariableForm):
+        return set([form.symbol.symbol])
+
+    return general_means_of_collection(
+        form, lambda f: consolidated_free_variables(f, children_free_variables), lambda l: set().union(*l), set())
+
+
+def _parameters(source):
+    return {p.symbol for p in source.parameters}
+
+
+def analyse_definitions(source):
+    return frozenset(d.symbol.symbol for d in collect_definitions(source))
+
+
+def analyse_free_variables(children_outputs, source, definitions):
+    children = tuple(frozenset(child.names) for child in children_outputs)
+    body_names = frozenset(set().union(*[consolidated_free_variables(f, children) for f in source.body]))
+
+    return ScopeFreeVariables(body_names - definitions - _parameters(source), body_names, children)
+
+
+def analyse_name_dependencies(source, free_variables):
+    result = {p: set() for p in _parameters(source)}
+
+    # As in name_dependencies.py, redefinitions are silently allowed.
+    for f in collect_definitions(source):
+        result[f.symbol.symbol] = consolidated_free_variables(f, free_variables.children)
+
+    return result
+
+
+def analyse_lexical_addressing(parent_output, source, definitions, free_variables):
+    surrounding_scope = parent_output if parent_output is not None else {}
+    this_scope = _parameters(source) | definitions
+
+    result = {}
+    for symbol in free_variables.body_names:
+        if symbol in this_scope:
+            result[symbol] = 0
+        else:
+            looked_up = surrounding_scope.get(symbol)
+            result[symbol] = None if looked_up is None else looked_up + 1
+
+    return result
+
+
+analysis_graph = {a.name: a for a in [
+    Analysis('definitions', NONE, [SOURCE], analyse_definitions),
+    Analysis('free_variables', UP, [SOURCE, 'definitions'], analyse_free_variables),
+    Analysis('name_dependencies', NONE, [SOURCE, 'free_variables'], analyse_name_dependencies),
+    Analysis('lexical_addressing', DOWN, [SOURCE, 'definitions', 'free_variables'], analyse_lexical_addressing),
+]}
@@ -0,0 +1,218 @@
+"""
+Name closures for all names in a tree of scopes at once: an alternative to calculate_name_closure (see
+lexical_addressing_x.py) which computes the closure for a single name, walking the dependencies (and follow_parents)
+anew for each name.
+
+The closure of a name consists of the name itself and of everything it depends on, directly or indirectly; as in
+calculate_name_closure, it's a set of (name, levels_up) tuples, levels_up being relative to the scope where the name is
+looked up.
+
+Because a scope's names can only depend on names in the same scope or in enclosing scopes, the calculation is split in
+2:
+
+* Per scope, "locally": which names of the scope itself are reached from each of its names, and through which of the
+  scope's free variables (exits) the dependencies go up. This depends on nothing but the scope's name_dependencies; the
+  dependency graph is condensed into its strongly connected components (Tarjan's algorithm), after which the closures
+  are calculated in a single pass over the components, as bitsets (Python ints). The result (LocalNameClosures) is
+  cached by the lambda form's nout_hash, and shared between all lambdas with equal name_dependencies.
+
+* Per scope in the tree: the local closures, with the exits resolved in the (already calculated) closures of the
+  enclosing scope. The result (ScopeNameClosures) is cached by the pair (LocalNameClosures, the parent's
+  ScopeNameClosures); i.e. after an edit, it's recalculated only for the scopes of which the name_dependencies have
+  changed, and for their descendants.
+
+One difference with calculate_name_closure: the latter answers only for names that are used in the scope's body (i.e.
+which have a lexical address), whereas the present module answers for all names of the scope (including unused ones).
+"""
+
+import instrumentation
+
+from utils import pmts
+
+from dsn.form_analysis.lexical_addressing_x import MostCompleteLambdaTree
+
+
+def strongly_connected_components(successors):
+    """
+    :: [[int]] -> [[int]]; successors[v] is the list of nodes that v has an edge to.
+
+    Tarjan's algorithm (iteratively, i.e. without recursion); the components are returned in reverse topological order,
+    i.e. each component comes after all components that it has an edge to.
+    """
+    index = [None] * len(successors)
+    lowlink = [0] * len(successors)
+    on_stack = [False] * len(successors)
+    stack = []
+    result = []
+    counter = 0
+
+    for root in range(len(successors)):
+        if index[root] is not None:
+            continue
+
+        work = [(root, 0)]  # (node, index of the next successor to visit)
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = lowlink[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+
+            recurse = False
+            for j in range(i, len(successors[v])):
+                w = successors[v][j]
+                if index[w] is None:
+                    work.append((v, j + 1))
+                    work.append((w, 0))
+                    recurse = True
+                    break
+
+                if on_stack[w]:
+                    lowlink[v] = min(lowlink[v], index[w])
+
+            if recurse:
+                continue
+
+            if lowlink[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                result.append(component)
+
+            if work:
+                # back in the caller (the node that has v as its successor)
+                u = work[-1][0]
+                lowlink[u] = min(lowlink[u], lowlink[v])
+
+    return result
+
+
+def _from_bits(bits, elements):
+    return frozenset(elements[i] for i in range(bits.bit_length()) if bits >> i & 1)
+
+
+class LocalNameClosures(object):
+
+    def __init__(self, name_dependencies):
+        # Not sorted: malformed symbols (None) may occur next to proper ones, and can't be compared to them. The order
+        # doesn't matter anyway: it only determines the bit-positions.
+        self.names = list(name_dependencies)
+        self.exit_names = list(set.union(set(), *name_dependencies.values()) - set(self.names))
+
+        name_index = {name: i for i, name in enumerate(self.names)}
+        exit_index = {name: i for i, name in enumerate(self.exit_names)}
+
+        successors = [[name_index[d] for d in name_dependencies[name] if d in name_index] for name in self.names]
+        direct_exits = [sum(1 << exit_index[d] for d in name_dependencies[name] if d in exit_index)
+                        for name in self.names]
+
+        reach_bits = [0] * len(self.names)
+        exit_bits = [0] * len(self.names)
+
+        for component in strongly_connected_components(successors):
+            reached, exits = 0, 0
+            for v in component:
+                reached |= 1 << v
+                exits |= direct_exits[v]
+                for w in successors[v]:
+                    # successors outside the component are in components that have already been done
+                    reached |= reach_bits[w]
+                    exits |= exit_bits[w]
+
+            for v in component:
+                reach_bits[v] = reached
+                exit_bits[v] = exits
+
+        # name => the names of the present scope that it reaches (including itself)
+        self.reach = {name: _from_bits(reach_bits[i], self.names) for i, name in enumerate(self.names)}
+
+        # name => the free variables of the present scope through which it reaches enclosing scopes
+        self.exits = {name: _from_bits(exit_bits[i], self.exit_names) for i, name in enumerate(self.names)}
+
+
+class ScopeNameClosures(object):
+
+    def __init__(self, local, parent):
+        self.local = local
+        self.parent = parent
+        self.free = {}  # name => closure, for the names that are looked up in enclosing scopes (calculated lazily)
+
+        self.closures = {}
+        for name in local.names:
+            closure = {(n, 0) for n in local.reach[name]}
+            for exit_name in local.exits[name]:
+                closure |= self.lookup_in_parent(exit_name)
+            self.closures[name] = frozenset(closure)
+
+    def lookup_in_parent(self, name):
+        if self.parent is None:
+            return frozenset()
+
+        if name not in self.free:
+            self.free[name] = frozenset((n, levels_up + 1) for (n, levels_up) in self.parent.lookup(name))
+        return self.free[name]
+
+    def lookup(self, name):
+        """The closure of name, as looked up in the present scope: a set of (name, levels_up)"""
+        if name in self.closures:
+            return self.closures[name]
+        return self.lookup_in_parent(name)
+
+
+class NameClosuresTree(object):
+    def __init__(self, lambda_form, closures, children):
+        self.lambda_form = lambda_form
+        self.closures = closures  # :: ScopeNameClosures
+        self.children = children
+
+
+def local_name_closures(m, lambda_form, name_dependencies):
+    if lambda_form.metadata is not None and lambda_form.metadata.nout_hash in m.local_name_closures:
+        instrumentation.count("memo_hits.local_name_closures")
+        return m.local_name_closures[lambda_form.metadata.nout_hash]
+
+    key = frozenset((name, frozenset(dependencies)) for name, dependencies in name_dependencies.items())
+    if key in m.local_name_closures_by_dependencies:
+        instrumentation.count("memo_hits.local_name_closures_by_dependencies")
+        result = m.local_name_closures_by_dependencies[key]
+    else:
+        instrumentation.count("memo_misses.local_name_closures_by_dependencies")
+        result = LocalNameClosures(name_dependencies)
+        m.local_name_closures_by_dependencies[key] = result
+
+    if lambda_form.metadata is not None:
+        m.local_name_closures[lambda_form.metadata.nout_hash] = result
+
+    return result
+
+
+def construct_name_closures(m, most_complete_tree, parent_closures=None):
+    """Constructs a NameClosuresTree out of a MostCompleteLambdaTree."""
+    pmts(most_complete_tree, MostCompleteLambdaTree)
+
+    local = local_name_closures(m, most_complete_tree.lambda_form, most_complete_tree.name_dependencies)
+
+    key = (local, parent_closures)
+    if key in m.scope_name_closures:
+        instrumentation.count("memo_hits.scope_name_closures")
+    else:
+        instrumentation.count("memo_misses.scope_name_closures")
+        m.scope_name_closures[key] = ScopeNameClosures(local, parent_closures)
+
+    closures = m.scope_name_closures[key]
+
+    return NameClosuresTree(
+        most_complete_tree.lambda_form,
+        closures,
+        [construct_name_closures(m, child, closures) for child in most_complete_tree.children],
+    )
+
+
+def name_closure(name_closures_tree, name):
+    """As calculate_name_closure, for a NameClosuresTree."""
+    return set(name_closures_tree.closures.lookup(name))
@@ -0,0 +1,168 @@
+"""
+An evaluator with an explicit stack: the same language, values & environments as in evaluator.py, but without using
+Python's stack for the recursion.
+
+In evaluator.py, each evaluation of a sub-form is a recursive call of `evaluate`; the depth of (Lisp) recursion is
+therefore limited by Python's recursion limit, even for loops that are written as tail calls. Here, the work that
+remains to be done once a sub-form has been evaluated (the continuation) is pushed on an explicit stack (a Python list)
+instead. Forms in tail position are evaluated without pushing anything at all; those are: the branches of an IfForm, the
+last element of a SequenceForm, and the last element of a LambdaForm's body. I.e. tail calls run in constant space, and
+the depth of non-tail recursion is bounded by the available memory only.
+
+Each continuation on the stack is a tuple, of which the first element is its kind (one of the below).
+"""
+
+from dsn.form_analysis.evaluator import (
+    BuiltinProcedure,
+    CompoundProcedure,
+    Frame,
+    SpecialValue,
+)
+from dsn.form_analysis.structure import (
+    ApplicationForm,
+    DefineForm,
+    IfForm,
+    LambdaForm,
+    MalformedForm,
+    QuoteForm,
+    SequenceForm,
+    ValueForm,
+    VariableForm,
+)
+
+# (DEFINE, symbol, environment): set the value as symbol's definition
+DEFINE = 0
+
+# (IF, if_form, environment): the value is the predicate's; evaluate one of the branches
+IF = 1
+
+# (SEQUENCE, forms, index, environment): the value is that of forms[index - 1]; evaluate forms[index]
+SEQUENCE = 2
+
+# (APPLICATION, application_form, environment, evaluated): the value is that of the procedure or one of the arguments;
+# evaluated is the list of values of the procedure and the arguments so far.
+APPLICATION = 3
+
+
+def evaluate(form, environment):
+    return _run(form, environment, [])
+
+
+def apply(procedure, arguments):
+    if isinstance(procedure, BuiltinProcedure):
+        return procedure.procedure(*arguments)
+
+    if isinstance(procedure, CompoundProcedure):
+        body, environment = _enter(procedure, arguments)
+        stack = []
+        return _run(_body(body, environment, stack), environment, stack)
+
+    raise Exception("Case analysis fail %s" % type(procedure))
+
+
+def _enter(procedure, arguments):
+    """Returns the body of a CompoundProcedure, and the environment to evaluate it in."""
+    parameters = procedure.form.parameters.the_list
+    assert len(arguments) == len(parameters)
+    new_frame = {parameters[i].symbol: arguments[i] for i in range(len(arguments))}
+    return procedure.form.body.the_list, Frame(procedure.environment, new_frame)
+
+
+def _body(forms, environment, stack):
+    """Returns the first of forms to evaluate; if there are more, the continuation for the rest is pushed."""
+    if forms == []:
+        # The evaluator fails (implicitly) on empty sequences; we do so explicitly.
+        raise Exception("Cannot evaluate empty sequence")
+
+    if len(forms) > 1:
+        stack.append((SEQUENCE, forms, 1, environment))
+
+    return forms[0]
+
+
+def _run(form, environment, stack):
+    """Evaluates form in environment, and then pops the stack until it is empty; returns the resulting value."""
+    while True:
+        # Evaluation of `form`: either a value results, or we continue with a sub-form (having pushed the continuation)
+        if isinstance(form, ValueForm):
+            value = form.value
+
+        elif isinstance(form, VariableForm):
+            value = environment.lookup(form.symbol.symbol)
+
+        elif isinstance(form, ApplicationForm):
+            stack.append((APPLICATION, form, environment, []))
+            form = form.procedure
+            continue
+
+        elif isinstance(form, IfForm):
+            stack.append((IF, form, environment))
+            form = form.predicate
+            continue
+
+        elif isinstance(form, SequenceForm):
+            form = _body(form.sequence.the_list, environment, stack)
+            continue
+
+        elif isinstance(form, DefineForm):
+            stack.append((DEFINE, form.symbol.symbol, environment))
+            form = form.definition
+            continue
+
+        elif isinstance(form, LambdaForm):
+            value = CompoundProcedure(form, environment)
+
+        elif isinstance(form, QuoteForm):
+            value = form.data
+
+        elif isinstance(form, MalformedForm):
+            raise Exception("Cannot evaluate MalformedForm")
+
+        else:
+            raise Exception("Case analysis fail %s" % type(form))
+
+        # Return of `value` to the continuations on the stack, until one of them has a form to evaluate.
+        form = None
+        while form is None:
+            if stack == []:
+                return value
+
+            continuation = stack.pop()
+            kind = continuation[0]
+
+            if kind == APPLICATION:
+                _, application_form, environment, evaluated = continuation
+                evaluated.append(value)
+
+                arguments = application_form.arguments.the_list
+                if len(evaluated) <= len(arguments):
+                    stack.append(continuation)
+                    form = arguments[len(evaluated) - 1]
+                    continue
+
+                procedure = evaluated[0]
+                if isinstance(procedure, BuiltinProcedure):
+                    value = procedure.procedure(*evaluated[1:])
+                    continue
+
+                if not isinstance(procedure, CompoundProcedure):
+                    raise Exception("Case analysis fail %s" % type(procedure))
+
+                # The procedure's body is evaluated in tail position, i.e. without a continuation of its own.
+                body, environment = _enter(procedure, evaluated[1:])
+                form = _body(body, environment, stack)
+
+            elif kind == IF:
+                _, if_form, environment = continuation
+                form = if_form.consequent if value else if_form.alternative
+
+            elif kind == SEQUENCE:
+                _, forms, index, environment = continuation
+                if index + 1 < len(forms):
+                    stack.append((SEQUENCE, forms, index + 1, environment))
+                form = forms[index]
+
+            else:  # kind == DEFINE
+                _, symbol, environment = continuation
+                environment.set(symbol, value)
+                value = SpecialValue("Definition")
@@ -64,6 +64,10 @@ from dsn.s_expr.structure import TreeText, TreeNode
 
 
 class Form(object):
+    # metadata: (optional) information about the form that is not part of the form's structure, e.g. YourOwnHash for
+    # forms that are constructed from a history of notes (see construct.py). Like for s-expressions, metadata is not
+    # taken into account when comparing forms for equality.
+    metadata = None
 
     def __init__(self):
         pass
@@ -78,11 +82,14 @@ class Form(object):
         """
         raise NotImplemented()
 
-# TODO Open question: will we store any history in these Forms too? In the end: Probably we will. Compare what's done
-# with the s-expressions themselves (which also do this)
+# Open question (partially answered by `metadata` above): will we store any more history in these Forms? Compare what's
+# done with the s-expressions themselves.
 
 
 class MalformedForm(Form):
+    def __init__(self, metadata=None):
+        self.metadata = metadata
+
     # Potentially: also add various _specific_ malformednesses, like "Lambda with non-3 params", or "Lambda of which the
     # parameter list is not a list of symbols.
 
@@ -102,9 +109,10 @@ class MalformedForm(Form):
 
 class VariableForm(Form):
 
-    def __init__(self, symbol):
+    def __init__(self, symbol, metadata=None):
         pmts(symbol, Symbol)
         self.symbol = symbol
+        self.metadata = metadata
 
     def as_s_expr(self):
         return TreeText(self.symbol.symbol, metadata=None)
@@ -114,9 +122,10 @@ class VariableForm(Form):
 
 
 class ValueForm(Form):
-    def __init__(self, type_, value):
+    def __init__(self, type_, value, metadata=None):
         self.type_ = type_
         self.value = value
+        self.metadata = metadata
 
     def as_s_expr(self):
         return TreeText(repr(self.value), metadata=None)
@@ -126,8 +135,9 @@ class ValueForm(Form):
 
 
 class QuoteForm(Form):
-    def __init__(self, data):
+    def __init__(self, data, metadata=None):
         self.data = data  # :: SExpr
+        self.metadata = metadata
 
     def as_s_expr(self):
         return TreeNode([TreeText("quote", None), self.data])
@@ -138,10 +148,11 @@ class QuoteForm(Form):
 
 class IfForm(Form):
 
-    def __init__(self, predicate, consequent, alternative):
+    def __init__(self, predicate, consequent, alternative, metadata=None):
         self.predicate = predicate  # :: Form
         self.consequent = consequent  # :: Form
         self.alternative = alternative  # :: Form
+        self.metadata = metadata
 
     def as_s_expr(self):
         return TreeNode([
@@ -159,9 +170,10 @@ class IfForm(Form):
 
 class DefineForm(Form):
 
-    def __init__(self, symbol, definition):
+    def __init__(self, symbol, definition, metadata=None):
         self.symbol = symbol  # :: Symbol
         self.definition = definition  # :: Form
+        self.metadata = metadata
 
     def as_s_expr(self):
         return TreeNode([
@@ -177,9 +189,10 @@ class DefineForm(Form):
 
 
 class LambdaForm(Form):
-    def __init__(self, parameters, body):
+    def __init__(self, parameters, body, metadata=None):
         self.parameters = parameters  # :: AtomList
         self.body = body  # :: FormList
+        self.metadata = metadata
 
     def as_s_expr(self):
         return TreeNode([
@@ -194,9 +207,10 @@ class LambdaForm(Form):
 
 
 class ApplicationForm(Form):
-    def __init__(self, procedure, arguments):
+    def __init__(self, procedure, arguments, metadata=None):
         self.procedure = procedure  # :: Form
         self.arguments = arguments  # :: FormList
+        self.metadata = metadata
 
     def as_s_expr(self):
         return TreeNode([
@@ -210,8 +224,9 @@ class ApplicationForm(Form):
 
 
 class SequenceForm(Form):
-    def __init__(self, sequence):
+    def __init__(self, sequence, metadata=None):
         self.sequence = sequence  # :: FormList
+        self.metadata = metadata
 
     def as_s_expr(self):
         return TreeNode([
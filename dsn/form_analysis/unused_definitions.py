@@ -1,5 +1,11 @@
-from dsn.form_analysis.free_variables import free_variables
-from dsn.form_analysis.collect_definitions import collect_definitions
+from collections import namedtuple
+
+from dsn.form_analysis.clef import BecomeLambda, LambdaChangeBody, LambdaChangeParameters
+from dsn.form_analysis.collect_definitions import collect_definitions, construct_definitions_list
+from dsn.form_analysis.construct import construct, construct_atom_list
+from dsn.form_analysis.free_variables import free_variables, construct_free_variables_list
+from dsn.form_analysis.legato import FormNoteNoutHash
+from dsn.form_analysis.utils import same
 
 
 def set_union(l):
@@ -19,3 +25,81 @@ def unused_parameters(lambda_form):
     free_vars = set_union([free_variables(f) for f in lambda_form.body])
 
     return parameters - free_vars
+
+
+# ## Incremental analysis
+#
+# The unused definitions (and parameters) of a lambda are the defined names (parameters) that are not free in any of
+# the forms in the lambda's body. Both the definitions and the free variables of the body are available as incremental
+# analyses; the present analysis is played on lambda notes only, and recalculates the differences only if one of the
+# underlying sets has actually changed (which, for most edits, it has not).
+
+UnusedDefinitions = namedtuple('UnusedDefinitions', (
+    'parameters',  # frozenset of the parameters' names
+    'body',  # FreeVariablesList
+    'definitions',  # DefinitionsList; note that its `doubles` are the doubly-defined names
+    'unused_definitions',  # frozenset
+    'unused_parameters',  # frozenset
+    ))
+
+
+def play_unused_definitions_note(m, stores, structure, note, metadata):
+    if isinstance(note, BecomeLambda):
+        parameters = frozenset(p.symbol for p in construct_atom_list(m, stores, note.parameters))
+        body = construct_free_variables_list(m, stores, note.body)
+        definitions = construct_definitions_list(m, stores, note.body)
+
+        return UnusedDefinitions(
+            parameters, body, definitions, definitions.names - body.names, parameters - body.names)
+
+    if isinstance(note, LambdaChangeParameters):
+        parameters = frozenset(p.symbol for p in construct_atom_list(m, stores, note.parameters))
+        if parameters == structure.parameters:
+            return structure
+
+        return structure._replace(parameters=parameters, unused_parameters=parameters - structure.body.names)
+
+    if isinstance(note, LambdaChangeBody):
+        body = construct_free_variables_list(m, stores, note.body)
+        definitions = construct_definitions_list(m, stores, note.body)
+
+        unused_definitions = structure.unused_definitions
+        unused_parameters = structure.unused_parameters
+
+        if not (same(body.names, structure.body.names) and same(definitions.names, structure.definitions.names)):
+            unused_definitions = definitions.names - body.names
+
+        if not same(body.names, structure.body.names):
+            unused_parameters = structure.parameters - body.names
+
+        return UnusedDefinitions(structure.parameters, body, definitions, unused_definitions, unused_parameters)
+
+    # Any other note either makes the form something other than a lambda, or changes such a non-lambda form.
+    return None
+
+
+def construct_unused_definitions(m, stores, form_nout_hash):
+    """Incremental analysis of the unused definitions & parameters of the lambda at form_nout_hash: returns an
+    UnusedDefinitions, or None if the form is not a lambda."""
+    return construct(
+        FormNoteNoutHash, None, 'construct_unused_definitions', 'form_note_nout', play_unused_definitions_note,
+        m, stores, form_nout_hash)
+
+
+def self_used_definitions(definitions_per_element, names_per_element, counts):
+    """The definitions that are used by their own definition only (i.e. recursively), which, as far as the rest of the
+    scope is concerned, are just as unused as the unused_definitions proper.
+
+    :: [set of defined names], [set of free variables], {name: count} -> frozenset; the first 2 per element of the
+    lambda's body; counts (name => the number of elements in which the name is free) as in FreeVariablesList."""
+    return frozenset(
+        name
+        for defined, names in zip(definitions_per_element, names_per_element)
+        for name in defined
+        if name in names and counts.get(name) == 1)
+
+
+def unused_or_self_used_definitions(structure):
+    """:: UnusedDefinitions -> frozenset; its unused_definitions and its self_used_definitions"""
+    return structure.unused_definitions | self_used_definitions(
+        structure.definitions.the_list, [element.names for element in structure.body.the_list], structure.body.counts)
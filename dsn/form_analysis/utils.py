@@ -1,3 +1,5 @@
+import instrumentation
+
 from dsn.form_analysis.structure import (
     LambdaForm,
     IfForm,
@@ -32,6 +34,33 @@ def general_means_of_collection(form, f, combine, identity):
     return identity
 
 
+def memoized_analysis(m, name, analysis, form):
+    """Memoizes a structural analysis (i.e. of a form as it is, rather than of its history) in the table m.<name>, by
+    the form's nout_hash. For forms that are constructed out of notes this identifies the form (and all of its
+    descendants); for other forms (metadata is None) the analysis is simply done.
+
+    Because memoized results are shared, they must not be mutated; memoized analyses therefore return immutable
+    results (frozensets, tuples). (None is not a valid result: it denotes a miss)
+
+    Hits and misses are counted (instrumentation) as "memo_hits.<name>" and "memo_misses.<name>".
+    """
+    if form.metadata is None:
+        return analysis(form)
+
+    table = getattr(m, name)
+    key = form.metadata.nout_hash
+
+    result = table.get(key)
+    if result is not None:
+        instrumentation.count("memo_hits." + name)
+        return result
+
+    instrumentation.count("memo_misses." + name)
+    result = analysis(form)
+    table[key] = result
+    return result
+
+
 def transform_children(form, f):
     """Given a form and a form-transforming function f, apply the latter on all the child-forms of the form (but not to
     any non-form attribute of the form).
@@ -47,10 +76,134 @@ def transform_children(form, f):
         return LambdaForm(form.parameters, FormList([f(child) for child in form.body]))
 
     if isinstance(form, ApplicationForm):
-        return ApplicationForm([f(form.procedure)], FormList([f(child) for child in form.arguments]))
+        return ApplicationForm(f(form.procedure), FormList([f(child) for child in form.arguments]))
 
     if isinstance(form, SequenceForm):
         return SequenceForm(FormList([f(child) for child in form.sequence]))
 
     # MalformedForm, VariableForm, ValueForm & QuoteForm have no children, and are returned as-is
     return form
+
+
+# Counts are kept in a persistent map (a hash trie): an update copies only the path from the root to the updated leaf
+# (O(log n) small dicts), and shares everything else with the previous version. The tries' nodes are _Branch objects;
+# their leaves are (small) dicts: name => count.
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_LEAF_CAPACITY = 8
+_HASH_WIDTH = 64  # beyond this shift, the hashes of all names in a leaf are equal; such leaves are not split anymore
+
+
+class _Branch(object):
+    def __init__(self, children):
+        self.children = children  # dict: index (part of the names' hashes) => _Branch | leaf
+
+    def __bool__(self):
+        return bool(self.children)
+
+
+def _updated(node, shift, h, name, count):
+    if isinstance(node, _Branch):
+        index = (h >> shift) & _MASK
+        child = _updated(node.children.get(index, {}), shift + _BITS, h, name, count)
+
+        children = dict(node.children)
+        if child:
+            children[index] = child
+        else:
+            del children[index]
+        return _Branch(children)
+
+    leaf = dict(node)
+    if count == 0:
+        del leaf[name]
+    else:
+        leaf[name] = count
+
+    if len(leaf) <= _LEAF_CAPACITY or shift >= _HASH_WIDTH:
+        return leaf
+
+    children = {}
+    for n, c in leaf.items():
+        children.setdefault((hash(n) >> shift) & _MASK, {})[n] = c
+    return _Branch(children)
+
+
+def _items(node):
+    if isinstance(node, _Branch):
+        for child in node.children.values():
+            yield from _items(child)
+    else:
+        yield from node.items()
+
+
+class Counts(object):
+    """Persistent (i.e. immutable, with updates that share structure) map: name => count; names with a count of 0 are
+    not present.
+
+    >>> a = Counts().updated('x', 1).updated('y', 2)
+    >>> b = a.updated('x', 0)
+    >>> a.get('x'), b.get('x'), b.get('y'), len(a), len(b), 'x' in b
+    (1, None, 2, 2, 1, False)
+    """
+
+    def __init__(self, root=None, length=0):
+        self.root = {} if root is None else root
+        self.length = length
+
+    def get(self, name, default=None):
+        h = hash(name)
+        node, shift = self.root, 0
+        while isinstance(node, _Branch):
+            node = node.children.get((h >> shift) & _MASK)
+            if node is None:
+                return default
+            shift += _BITS
+        return node.get(name, default)
+
+    def updated(self, name, count):
+        """Returns a Counts with the count for name set to count (0: removed)."""
+        previous = self.get(name, 0)
+        if count == previous:
+            return self
+
+        return Counts(_updated(self.root, 0, hash(name), name, count), self.length + (count != 0) - (previous != 0))
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return (name for (name, count) in _items(self.root))
+
+    def items(self):
+        return _items(self.root)
+
+    def __repr__(self):
+        return "Counts(%r)" % dict(self.items())
+
+
+EMPTY_COUNTS = Counts()
+
+
+def counted(counts, names, amount):
+    """Returns counts (a Counts) with amount added for each of names; and the names for which the count went from 0 to
+    something else or vice versa (i.e. the names that were added to, or removed from, the set of keys). The cost is
+    proportional to the number of names, not to the size of counts."""
+    crossed = set()
+
+    for name in names:
+        previous = counts.get(name, 0)
+        if previous == 0 or previous + amount == 0:
+            crossed.add(name)
+        counts = counts.updated(name, previous + amount)
+
+    return counts, crossed
+
+
+def same(a, b):
+    """Equality, with a shortcut for the (common) case of unchanged, i.e. shared, values."""
+    return a is b or a == b
@@ -1,3 +1,5 @@
+from construction import construct
+
 from historiography import Historiography, HistoriographyAt
 
 
@@ -7,23 +9,10 @@ def play_historiography_note(historiography_note, historiography_at):
 
 
 def construct_historiography(m, stores, historiography_note_nout_hash):
-    # In the beginning, there is the empty historiography
-    historiography_at = HistoriographyAt(Historiography(stores.note_nout), 0)
-
-    todo = []
-    for tup in stores.historiography_note_nout.all_nhtups_for_nout_hash(historiography_note_nout_hash):
-        if tup.nout_hash in m.construct_historiography:
-            historiography_at = m.construct_historiography[tup.nout_hash]
-            break
-        todo.append(tup)
-
-    for tup in reversed(todo):
-        edge_nout = tup.nout
-        edge_nout_hash = tup.nout_hash
+    def play(historiography_at, note, nout_hash):
+        return play_historiography_note(note, historiography_at)
 
-        note = edge_nout.note
-
-        historiography_at = play_historiography_note(note, historiography_at)
-        m.construct_historiography[edge_nout_hash] = historiography_at
-
-    return historiography_at
+    # In the beginning, there is the empty historiography
+    return construct(
+        'construct_historiography', stores.historiography_note_nout, m.construct_historiography,
+        HistoriographyAt(Historiography(stores.note_nout), 0), play, historiography_note_nout_hash)
@@ -1,5 +1,6 @@
 from spacetime import st_become, st_insert, st_replace, st_delete
 from utils import pmts
+from construction import construct
 from list_operations import l_become, l_insert, l_delete, l_replace
 
 from dsn.s_expr.clef import BecomeNode, Insert, Delete, Replace, TextBecome
@@ -89,22 +90,8 @@ def construct_x(m, stores, edge_nout_hash):
         # This is used for by `play` to construct Trees for nouts, i.e. for Replace & Insert.
         return construct_x(m, stores, nout_hash)
 
-    tree = None  # In the beginning, there is nothing, which we model as `None`
+    def play(tree, note, nout_hash):
+        return x_note_play(note, tree, recurse, YourOwnHash(nout_hash))
 
-    todo = []
-    for tup in stores.note_nout.all_nhtups_for_nout_hash(edge_nout_hash):
-        if tup.nout_hash in m.construct_x:
-            tree = m.construct_x[tup.nout_hash]
-            break
-        todo.append(tup)
-
-    for tup in reversed(todo):
-        edge_nout = tup.nout
-        edge_nout_hash = tup.nout_hash
-
-        note = edge_nout.note
-
-        tree = x_note_play(note, tree, recurse, YourOwnHash(edge_nout_hash))
-        m.construct_x[edge_nout_hash] = tree
-
-    return tree
+    # In the beginning, there is nothing, which we model as `None`
+    return construct('construct_x', stores.note_nout, m.construct_x, None, play, edge_nout_hash)
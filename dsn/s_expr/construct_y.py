@@ -5,6 +5,7 @@ from spacetime import st_become, st_insert, st_replace, st_delete
 from collections import namedtuple
 from list_operations import l_become, l_insert, l_delete, l_replace
 
+import instrumentation
 from historiography import HistoriographyTreeNode
 from dsn.historiography.construct import construct_historiography
 
@@ -161,8 +162,11 @@ def construct_y(m, stores, historiography_note_nout):
     # I'd still like to somehow make that more explicit to get better correctness guarantees.
     historiography_note_nout_hash = stores.historiography_note_nout.add(historiography_note_nout)
     if historiography_note_nout_hash in m.construct_y:
+        instrumentation.count("memo_hits.construct_y")
         return m.construct_y[historiography_note_nout_hash]
 
+    instrumentation.count("memo_misses.construct_y")
+
     historiography_at = construct_historiography(m, stores, historiography_note_nout_hash)
 
     def recurse(historiography_note_nout):
@@ -177,9 +181,11 @@ def construct_y(m, stores, historiography_note_nout):
         assert whats_new_pod in m.construct_historiography_treenode
         structure, dissonant = m.construct_historiography_treenode[whats_new_pod]
 
-    new_hashes = reversed(list(historiography_at.whats_new()))
+    new_hashes = list(reversed(list(historiography_at.whats_new())))
     annotated_hashes = []
 
+    # We don't use the engine in construction.py here: the starting point is already given by the historiography's
+    # point of divergence, and each state must be stored (construct_historiography_treenode is a plain dict).
     for new_hash in new_hashes:
         new_nout = stores.note_nout.get(new_hash)
 
@@ -188,6 +194,9 @@ def construct_y(m, stores, historiography_note_nout):
 
         annotated_hashes.append(AnnotatedHash(new_hash, dissonant, rhi))
 
+    if instrumentation.enabled:
+        instrumentation.count("notes_played.construct_y", len(new_hashes))
+
     m.construct_y[historiography_note_nout_hash] = structure, annotated_hashes
     return structure, annotated_hashes
 
@@ -1,5 +1,7 @@
 from collections import namedtuple
 
+import instrumentation
+
 from dsn.s_expr.construct_y import RecursiveHistoryInfo, construct_y
 from dsn.historiography.legato import HistoriographyNoteNoutHash
 
@@ -62,8 +64,11 @@ def view_past_from_present(m, stores, historiography_note_nout, present_note_nou
     historiography_note_nout_hash = HistoriographyNoteNoutHash.for_object(historiography_note_nout)
 
     if (historiography_note_nout_hash, present_note_nout_hash) in m.view_past_from_present:
+        instrumentation.count("memo_hits.view_past_from_present")
         return m.view_past_from_present[(historiography_note_nout_hash, present_note_nout_hash)]
 
+    instrumentation.count("memo_misses.view_past_from_present")
+
     # In the below, past_htn is an unused variable. Although it's tempting to think of it as a good source of
     # information for e.g.  the children's historiography_note_nout parameter, such values are not available granularly
     # enough. Namely: we have a `past_htn` available for each "historiographic step" (call to Historiography.append_x),
@@ -0,0 +1,87 @@
+"""
+Batch checks of many potential merges at once: "which of these pairs of branches can be woven?"
+
+Each check is an independent (and CPU-bound) call to is_valid_double_edge; checks are therefore spread over a
+ProcessPoolExecutor. Each worker process receives a read-only snapshot of the note_nout store once (when it starts) and
+keeps its own Memoization across the checks it does, which makes checks that share a pod (the typical case: many
+branches off the same base) cheaper after the first.
+
+Hashes are sent to and from the workers as bytes, because the Hash classes are dynamically created (and hence not
+picklable).
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import instrumentation
+from hashstore import NoutHashStore, ReadOnlyHashStore
+from memoization import Memoization, Stores
+
+from dsn.s_expr.legato import NoteNout, NoteCapo, NoteNoutHash
+from dsn.s_expr.unambiguous_weaving import is_valid_double_edge
+
+
+ThroughputReport = namedtuple('ThroughputReport', (
+    'checks',
+    'workers',
+    'seconds',
+    ))
+
+
+def pp_throughput_report(report):
+    return "%s checks in %.3fs using %s worker(s) (%.1f checks/s)" % (
+        report.checks, report.seconds, report.workers, report.checks / report.seconds if report.seconds else 0)
+
+
+# The worker processes' state; set once per process by _initialize_worker
+_worker_m = None
+_worker_stores = None
+
+
+def _initialize_worker(snapshot):
+    global _worker_m, _worker_stores
+
+    _worker_m = Memoization()
+    _worker_stores = Stores(ReadOnlyHashStore(NoutHashStore.from_snapshot(NoteNoutHash, NoteNout, NoteCapo, snapshot)))
+
+
+def _check(triple_bytes):
+    pod, nout_hash_0, nout_hash_1 = [NoteNoutHash(hash_bytes) for hash_bytes in triple_bytes]
+    return is_valid_double_edge(_worker_m, _worker_stores, pod, nout_hash_0, nout_hash_1)
+
+
+def check_double_edges(stores, triples, max_workers=None, m=None):
+    """Checks each (pod, nout_hash_0, nout_hash_1) of triples using is_valid_double_edge; returns ([(ok, problems), ...]
+    in the order of triples, ThroughputReport).
+
+    max_workers defaults to the number of CPUs; with max_workers=1 the checks are done in the present process (which
+    saves the cost of starting a worker & snapshotting the store), using m as the Memoization (a fresh one if None)."""
+    triples = list(triples)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    start = perf_counter()
+
+    if max_workers == 1:
+        if m is None:
+            m = Memoization()
+        results = [is_valid_double_edge(m, stores, pod, nout_hash_0, nout_hash_1)
+                   for (pod, nout_hash_0, nout_hash_1) in triples]
+
+    else:
+        triples_bytes = [tuple(nout_hash.as_bytes() for nout_hash in triple) for triple in triples]
+
+        # Chunks of a few checks each: large enough to keep the per-task overhead low, small enough to balance the load.
+        chunksize = max(1, len(triples) // (max_workers * 4))
+
+        with ProcessPoolExecutor(max_workers, initializer=_initialize_worker,
+                                 initargs=(stores.note_nout.snapshot(),)) as executor:
+            results = list(executor.map(_check, triples_bytes, chunksize=chunksize))
+
+    report = ThroughputReport(len(triples), max_workers, perf_counter() - start)
+    instrumentation.observe("merge_checks.batch_time", report.seconds)
+    instrumentation.count("merge_checks.checks", report.checks)
+
+    return results, report
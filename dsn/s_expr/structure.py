@@ -1,5 +1,5 @@
-from vlq import to_vlq
-from utils import pmts
+from vlq import from_vlq, to_vlq
+from utils import pmts, rfs
 
 # Type constructor codes
 TREE_NODE = 0
@@ -34,7 +34,7 @@ class TreeNode(SExpr):
         return isinstance(other, TreeNode) and self.children == other.children and self.broken == other.broken
 
     def as_bytes(self):
-        # as of yet unused
+        # used for serialization of quoted data (see s_expr_from_stream)
         return bytes([TREE_NODE]) + to_vlq(len(self.children)) + b''.join([c.as_bytes() for c in self.children])
 
     def broken_equivalent(self, metadata):
@@ -59,11 +59,26 @@ class TreeText(SExpr):
         return isinstance(other, TreeText) and self.unicode_ == other.unicode_ and self.broken == other.broken
 
     def as_bytes(self):
-        # as of yet unused
+        # used for serialization of quoted data (see s_expr_from_stream)
         utf8 = self.unicode_.encode('utf-8')
         return bytes([TREE_TEXT]) + to_vlq(len(utf8)) + utf8
 
 
+def s_expr_from_stream(byte_stream):
+    """The inverse of as_bytes; N.B. the result has no metadata, i.e. it represents the present structure only."""
+    byte0 = next(byte_stream)
+
+    if byte0 == TREE_TEXT:
+        length = from_vlq(byte_stream)
+        return TreeText(str(rfs(byte_stream, length), 'utf-8'), None)
+
+    if byte0 == TREE_NODE:
+        length = from_vlq(byte_stream)
+        return TreeNode([s_expr_from_stream(byte_stream) for i in range(length)])
+
+    raise Exception("Unknown type constructor code %s" % byte0)
+
+
 # Tools for Pretty Printing
 
 def pp_flat(node):
@@ -3,8 +3,11 @@ unambiguous_weaving provides various tools to "weave together" (aka merge, aka r
 this is possible to do in an unambiguous way.
 """
 
+import os
+
 from posacts import Actuality
 from collections import namedtuple
+from historiography import find_point_of_divergence
 from itertools import takewhile
 
 from dsn.s_expr.construct_x import construct_x
@@ -22,12 +25,13 @@ RelevantTAddresses = namedtuple('RelevantTAddresses', (
 
 
 def nout_hashes_are_chronlogical(possible_timelines, list_of_nout_hashes):
-    # NOTE: performance charactaristics for the case False potentially horrible (check of the full history)
+    # NOTE: performance charactaristics for the case False potentially horrible (check of the full history); walking
+    # back through the index of previous_hashes at least avoids parsing the nouts along the way.
 
     pointer = len(list_of_nout_hashes) - 1
 
-    for nh_tup in possible_timelines.all_nhtups_for_nout_hash(list_of_nout_hashes[-1]):
-        if nh_tup.nout_hash == list_of_nout_hashes[pointer]:
+    for nout_hash in possible_timelines.all_preceding_nout_hashes(list_of_nout_hashes[-1]):
+        if nout_hash == list_of_nout_hashes[pointer]:
             pointer -= 1
             if pointer == -1:
                 return True
@@ -36,45 +40,78 @@ def nout_hashes_are_chronlogical(possible_timelines, list_of_nout_hashes):
 
 
 def collect_t_addresses(m, stores, tree, note_nout_hashes):
+    """Collects the t_addresses that are relevant for weaving, for the notes (note_nout_hashes) played on tree.
+
+    Rather than constructing the tree after each note, we keep track of the only 2 things we need from it (s2t, and the
+    nout_hashes of the children) incrementally, in the same way that x_note_play & spacetime's st_* would.
+    """
     beginnings = False
     insertion_edges = []
     deletions = []
     replacements = {}
 
+    s2t = tree.s2t[:]
+    child_nout_hashes = [child.metadata.nout_hash for child in tree.children]
+    next_t_address = len(tree.t2s)
+
+    # Broken trees (which, in the present context, only arise by Becoming on an existing structure) are never changed.
+    broken = tree.broken
+
     for note_nout_hash in note_nout_hashes:
         note = stores.note_nout.get(note_nout_hash).note
 
+        # we look at the pre-note_play s2t for our addressess (in particular required to be able to deal with Delete);
+        # hence we update s2t only after having done so.
+
         if isinstance(note, Insert):
             # An Insert happens between the point of insertion and the item to the left of it:
-            left = 'begin' if note.index == 0 else tree.s2t[note.index - 1]
-            right = 'end' if note.index == len(tree.s2t) else tree.s2t[note.index]
+            left = 'begin' if note.index == 0 else s2t[note.index - 1]
+            right = 'end' if note.index == len(s2t) else s2t[note.index]
 
             insertion_edges.append((left, right))
 
+            if not broken:
+                s2t.insert(note.index, next_t_address)
+                child_nout_hashes.insert(note.index, note.nout_hash)
+                next_t_address += 1
+
         elif isinstance(note, Delete):
-            deletions.append(tree.s2t[note.index])
+            deletions.append(s2t[note.index])
+
+            if not broken:
+                del s2t[note.index]
+                del child_nout_hashes[note.index]
 
         elif isinstance(note, Replace):
-            t_address = tree.s2t[note.index]
+            t_address = s2t[note.index]
             if t_address not in replacements:
-                replacements[t_address] = [tree.children[note.index].metadata.nout_hash]
+                replacements[t_address] = [child_nout_hashes[note.index]]
 
             replacements[t_address].append(note.nout_hash)
 
+            if not broken:
+                child_nout_hashes[note.index] = note.nout_hash
+
         elif isinstance(note, BecomeNode) or isinstance(note, TextBecome):
             # Any kind of becomming is unmergeable: encountering it while looking at one of the branches of history
             # implies that there is no shared history.
             beginnings = True
+            broken = True
         else:
             raise Exception("Unexpected note: %s" % type(note))
 
-        # we look at the pre-note_play tree for our addressess (in particular required to be able to deal with Delete);
-        # hence we fetch tree at the end of the loop.
-        tree = construct_x(m, stores, note_nout_hash)
-
     return RelevantTAddresses(beginnings, insertion_edges, deletions, replacements)
 
 
+def membership_indexes(relevant_t_addresses):
+    """Returns sets of (deletions, left edges, right edges), for quick membership tests."""
+    return (
+        set(relevant_t_addresses.deletions),
+        set(left for (left, right) in relevant_t_addresses.insertion_edges),
+        set(right for (left, right) in relevant_t_addresses.insertion_edges),
+    )
+
+
 def hashes_between(stores, new_hash, older_hash_not_included):
     return reversed(list(takewhile(
         lambda v: v != older_hash_not_included,
@@ -98,14 +135,19 @@ def is_valid_double_edge(m, stores, pod, nout_hash_0, nout_hash_1):
     c0 = collect_t_addresses(m, stores, tree_at_pod, timeline_0)
     c1 = collect_t_addresses(m, stores, tree_at_pod, timeline_1)
 
-    for one, other in [(c0, c1), (c1, c0)]:
+    indexes_0 = membership_indexes(c0)
+    indexes_1 = membership_indexes(c1)
+
+    for one, other, (other_deletions, other_left_edges, other_right_edges) in [
+            (c0, c1, indexes_1), (c1, c0, indexes_0)]:
+
         if one.beginnings:
             problems.add("Beginning a new history implies merging is impossible.")
 
         for i in one.deletions:
             # TODO max_t_at_pod must be considered.
 
-            if i in other.deletions:
+            if i in other_deletions:
                 problems.add("Deletion w/ t_address=%s was deleted in both histories" % i)
 
             if i in other.replacements.keys():
@@ -141,17 +183,17 @@ def is_valid_double_edge(m, stores, pod, nout_hash_0, nout_hash_1):
 
         for left, right in one.insertion_edges:
             if left in ['begin', 'end'] or left <= max_t_at_pod:
-                if left in other.deletions:
+                if left in other_deletions:
                     problems.add("Left edge w/ t_address=%s was deleted in the other history" % left)
 
-                if left in [l for (l, r) in other.insertion_edges]:
+                if left in other_left_edges:
                     problems.add("Left-edge w/ t_address=%s is used in both histories" % left)
 
             if right in ['begin', 'end'] or right <= max_t_at_pod:
-                if right in other.deletions:
+                if right in other_deletions:
                     problems.add("Right edge w/ t_address=%s was deleted in the other history" % right)
 
-                if right in [r for (l, r) in other.insertion_edges]:
+                if right in other_right_edges:
                     problems.add("Right edge w/ t_address=%s is used in both histories" % right)
 
     if problems:
@@ -181,13 +223,11 @@ def uw_double_edge(m, stores, pod, nout_hash_0, nout_hash_1, ordering_mechanism)
     If you want to automatically determine the pod, you may do this as such:
 
     ```
-    from historiography import find_point_of_divergence
-    pod = find_point_of_divergence(
-        stores.note_nout.all_preceding_nout_hashes(nout_hash_0),
-        stores.note_nout.all_preceding_nout_hashes(nout_hash_1),
-        )
+    pod = common_point_of_divergence(stores.note_nout, [nout_hash_0, nout_hash_1])
     ```
 
+    (uw_multi_edge does this for you, for any number of branches)
+
     An `ordering_mechanism` is passed as a list of 0's and 1's, denoting the picking order of the final relinearization.
     It must contain as many 0's as there are nouts between nout_hash_0 and the pod, and similarly for 1's.
 
@@ -197,12 +237,6 @@ def uw_double_edge(m, stores, pod, nout_hash_0, nout_hash_1, ordering_mechanism)
 
     # NOTE: we don't check whether pod is actually in both histories (yet?)
 
-    tree_at_pod = construct_x(m, stores, pod)
-
-    # max_t_at_pod is relevant, because anything happening at or in relation to a t_address greater than it is unique to
-    # that timeline by definition, and hence never causes a collision.
-    max_t_at_pod = len(tree_at_pod.t2s) - 1
-
     timeline_0 = list(hashes_between(stores, nout_hash_0, pod))
     timeline_1 = list(hashes_between(stores, nout_hash_1, pod))
 
@@ -213,22 +247,115 @@ def uw_double_edge(m, stores, pod, nout_hash_0, nout_hash_1, ordering_mechanism)
     assert len(timeline_0) == len([x for x in ordering_mechanism if x == 0])
     assert len(timeline_1) == len([x for x in ordering_mechanism if x == 1])
 
-    i_timeline_0 = iter(timeline_0)
-    i_timeline_1 = iter(timeline_1)
+    yield from weave_timelines(m, stores, pod, [timeline_0, timeline_1], ordering_mechanism)
+
+
+def common_point_of_divergence(possible_timelines, nout_hashes):
+    """The most recent nout_hash that is shared by the histories of all of nout_hashes (None if there is no such hash).
+
+    The histories are walked back pairwise, through the index of previous_hashes (i.e. without parsing any nouts); each
+    walk stops as soon as the two histories meet. Because the pod found so far is itself in the history of all heads
+    seen so far, it is the only thing that needs to be compared with the next head.
+    """
+    pod = nout_hashes[0]
+
+    for nout_hash in nout_hashes[1:]:
+        pod = find_point_of_divergence(
+            possible_timelines.all_preceding_nout_hashes(pod),
+            possible_timelines.all_preceding_nout_hashes(nout_hash))
+
+        if pod is None:
+            return None
+
+    return pod
+
+
+# Below this number of pairs of branches, multi_edge_problems checks the pairs in the present process by default: the
+# cost of starting worker processes (and of snapshotting the store for them) outweighs that of the checks themselves. (A
+# check takes a few milliseconds for branches of a hundred notes; starting the workers a few hundred.)
+PARALLEL_PAIRS_THRESHOLD = 128
+
+
+def multi_edge_problems(m, stores, pod, nout_hashes, max_workers=None):
+    """Validates all pairs of branches (each of the branches running from pod to one of nout_hashes); returns a list of
+    problems, one for each pair that cannot be woven.
+
+    The pairs are checked using check_double_edges, with at most max_workers processes, but never more than there are
+    pairs; with a single worker, the checks are done in the present process (using m). By default (max_workers=None),
+    that's what's done for fewer than PARALLEL_PAIRS_THRESHOLD pairs; for more, as many workers as there are CPUs are
+    used."""
+    # imported here, because merge_checks imports the present module
+    from dsn.s_expr.merge_checks import check_double_edges
+
+    pairs = [(i, j) for i in range(len(nout_hashes)) for j in range(i + 1, len(nout_hashes))]
+
+    if max_workers is None:
+        max_workers = 1 if len(pairs) < PARALLEL_PAIRS_THRESHOLD else (os.cpu_count() or 1)
+    max_workers = max(1, min(max_workers, len(pairs)))
+
+    results, report = check_double_edges(
+        stores, [(pod, nout_hashes[i], nout_hashes[j]) for (i, j) in pairs], max_workers, m)
+
+    return ["Branches %s and %s: %s" % (i, j, msg) for ((i, j), (ok, msg)) in zip(pairs, results) if not ok]
+
+
+def uw_multi_edge(m, stores, nout_hashes, ordering_mechanism=None, max_workers=None):
+    """Unambiguous weaving of any number of branches, which is a generator of posacts in the same way as uw_double_edge.
+
+    As opposed to uw_double_edge, the pod is calculated: it is the most recent nout_hash that all branches share.
+
+    Weaving K branches is possible if each pair of branches can be woven (relative to that shared pod): the conditions
+    for unambiguous weaving are all about the t_addresses at the pod, and each such t_address is used in a conflicting
+    manner by at most a single branch if there are no conflicts between any 2 branches.
+
+    An `ordering_mechanism` is a list of branch-indexes (0 .. K-1), analogous to the one for uw_double_edge. If it's
+    not provided, the branches are picked in order, i.e. all of the 0th branch, then all of the 1st branch etc.
+
+    The pairs of branches are validated using at most max_workers processes; by default, in parallel only when there
+    are many of them (see multi_edge_problems).
+    """
+    pod = common_point_of_divergence(stores.note_nout, nout_hashes)
+    if pod is None:
+        raise Exception("The branches do not share any history")
+
+    problems = multi_edge_problems(m, stores, pod, nout_hashes, max_workers)
+    if problems:
+        raise Exception(", ".join(problems))
+
+    timelines = [list(hashes_between(stores, nout_hash, pod)) for nout_hash in nout_hashes]
+
+    if ordering_mechanism is None:
+        ordering_mechanism = [i for i, timeline in enumerate(timelines) for nout_hash in timeline]
+
+    for i, timeline in enumerate(timelines):
+        assert len(timeline) == len([x for x in ordering_mechanism if x == i])
+
+    yield from weave_timelines(m, stores, pod, timelines, ordering_mechanism)
+
+
+def weave_timelines(m, stores, pod, timelines, ordering_mechanism):
+    """Yields the posacts of the relinearization of timelines (lists of note_nout_hashes, each starting right after
+    pod) in the order as given by ordering_mechanism. The timelines are assumed to be validated already."""
+    tree_at_pod = construct_x(m, stores, pod)
+
+    # max_t_at_pod is relevant, because anything happening at or in relation to a t_address greater than it is unique to
+    # that timeline by definition, and hence never causes a collision.
+    max_t_at_pod = len(tree_at_pod.t2s) - 1
+
+    i_timelines = [iter(timeline) for timeline in timelines]
 
     # Any t_address that precedes the divergence of histories can be mapped to itself
-    t0_to_t_in_joint_history = {t: t for t in range(max_t_at_pod + 1)}
-    t1_to_t_in_joint_history = {t: t for t in range(max_t_at_pod + 1)}
+    ts_to_t_in_joint_history = [{t: t for t in range(max_t_at_pod + 1)} for timeline in timelines]
 
-    tree_0, tree_1, joint_tree = tree_at_pod, tree_at_pod, tree_at_pod
+    trees = [tree_at_pod for timeline in timelines]
+    joint_tree = tree_at_pod
 
     joint_note_nout_hash = pod
 
     for which_timeline in ordering_mechanism:
-        timeline = (i_timeline_0, i_timeline_1)[which_timeline]
-        tree = (tree_0, tree_1)[which_timeline]
-        t_in_joint_history = (t0_to_t_in_joint_history, t1_to_t_in_joint_history)[which_timeline]
-        note_nout_hash = next(timeline)
+        tree = trees[which_timeline]
+        t_in_joint_history = ts_to_t_in_joint_history[which_timeline]
+        note_nout_hash = next(i_timelines[which_timeline])
 
         note = stores.note_nout.get(note_nout_hash).note
 
@@ -276,10 +403,7 @@ def uw_double_edge(m, stores, pod, nout_hash_0, nout_hash_1, ordering_mechanism)
             joint_note = Replace(joint_tree.t2s[t_in_joint_history[tree.s2t[note.index]]], note.nout_hash)
 
         # Advance the relevant tree with the loop.
-        if which_timeline == 0:
-            tree_0 = construct_x(m, stores, note_nout_hash)
-        else:
-            tree_1 = construct_x(m, stores, note_nout_hash)
+        trees[which_timeline] = construct_x(m, stores, note_nout_hash)
 
         joint_note_nout = NoteSlur(joint_note, joint_note_nout_hash)
         possibility, joint_note_nout_hash = calc_possibility(joint_note_nout)
@@ -12,7 +12,7 @@ nouts_for_notes:
 
 from hashstore import NoutAndHash
 from posacts import Possibility, Actuality
-from s_address import node_for_s_address, longest_common_prefix
+from s_address import node_for_s_address
 
 from dsn.s_expr.legato import NoteCapo, NoteSlur, NoteNoutHash
 from dsn.s_expr.clef import (
@@ -115,6 +115,13 @@ def bubble_history_up(hash_to_bubble, tree, s_address):
 def _bubble_history_up(hash_to_bubble, tree, s_address):
     """Like bubble_history_up; but keeping the "final actuality's hash" separate in the return-type"""
 
+    # The nodes in which the replacements take place, i.e. the ancestors of the node at s_address, root first. Looking
+    # them up in a single pass down the tree (rather than once per replacement, from the root) keeps bubbling linear in
+    # the depth of s_address.
+    replace_in_nodes = [tree]
+    for index in s_address[:-1]:
+        replace_in_nodes.append(replace_in_nodes[-1].children[index])
+
     posacts = []
     for i in reversed(range(len(s_address))):
         # We slide a window of size 2 over the s_address from right to left, like so:
@@ -127,7 +134,7 @@ def _bubble_history_up(hash_to_bubble, tree, s_address):
         # Regarding the range (0, len(s_address)) the following:
         # * len(s_address) means the s_address itself is the first thing to be replaced.
         # * 0 means: the last replacement is _inside_ the root node (s_address=[]), at index s_address[0]
-        replace_in = node_for_s_address(tree, s_address[:i])
+        replace_in = replace_in_nodes[i]
 
         p, hash_to_bubble = calc_possibility(
             NoteSlur(Replace(s_address[i], hash_to_bubble), replace_in.metadata.nout_hash))
@@ -146,31 +153,79 @@ def weave_disjoint_replaces(tree, s_address_0, hash_0, s_address_1, hash_1):
     assert s_address_0[:len(s_address_1)] != s_address_1
     assert s_address_1[:len(s_address_0)] != s_address_0
 
-    join_point_address = longest_common_prefix(s_address_0, s_address_1)
+    return weave_many_disjoint_replaces(tree, [(s_address_0, hash_0), (s_address_1, hash_1)])
+
 
-    tree_0 = node_for_s_address(tree, s_address_0[:len(join_point_address) + 1])
-    tree_1 = node_for_s_address(tree, s_address_1[:len(join_point_address) + 1])
+def weave_many_disjoint_replaces(tree, replacements):
+    """Like weave_disjoint_replaces, but for any number of replacements, given as a list of (s_address, hash) tuples.
 
-    posacts_0, actuality_hash_0 = _bubble_history_up(hash_0, tree_0, s_address_0[len(join_point_address) + 1:])
-    posacts_1, actuality_hash_1 = _bubble_history_up(hash_1, tree_1, s_address_1[len(join_point_address) + 1:])
+    Bubbling up happens in a single pass: each ancestor of the replaced nodes gets a single Replace per replaced child
+    (rather than a full chain of Replaces up to the root per replacement).
+    """
+    ordered = sorted(s_address for (s_address, hash_) in replacements)
+    for s_address_0, s_address_1 in zip(ordered, ordered[1:]):
+        # In sorted order, if any address is a prefix of another, it's also a prefix of its direct successor.
+        if s_address_1[:len(s_address_0)] == s_address_0:
+            raise Exception("Replaces must be disjoint; %s is a prefix of %s" % (s_address_0, s_address_1))
 
-    join_point_node = node_for_s_address(tree, s_address_0[:len(join_point_address)])
+    posacts, final_hash = _weave_many_disjoint_replaces(tree, replacements)
+    return posacts + [calc_actuality(final_hash)]
 
-    p0, hash_0 = calc_possibility(
-        NoteSlur(Replace(s_address_0[len(join_point_address)], actuality_hash_0), join_point_node.metadata.nout_hash))
 
-    p1, hash_1 = calc_possibility(
-        NoteSlur(Replace(s_address_1[len(join_point_address)], actuality_hash_1), hash_0))
+def _weave_many_disjoint_replaces(tree, replacements, depth=0):
+    """Like weave_many_disjoint_replaces, but without validation, and keeping the "final actuality's hash" separate in
+    the return-type. Replacements are relative to tree, with the first `depth` items of their s_addresses ignored.
+
+    Children are visited in order of their first appearance in replacements, and all posacts for a subtree precede the
+    Replaces in its parent; for 2 replacements this yields precisely the nouts of the original (pairwise) weave.
+    """
+    for s_address, hash_ in replacements:
+        if len(s_address) == depth:
+            return [], hash_  # disjointness implies: this is the only replacement
+
+    by_index = {}
+    indices = []
+    for s_address, hash_ in replacements:
+        if s_address[depth] not in by_index:
+            by_index[s_address[depth]] = []
+            indices.append(s_address[depth])
+        by_index[s_address[depth]].append((s_address, hash_))
 
-    # ... if you stop the function here here... (returning posacts so far, hash_1, join_point_address), you could
-    # generalize into n-weave
-    posacts_joint, joint_actuality_hash = _bubble_history_up(hash_1, tree, join_point_address)
+    posacts = []
+    replaced_hashes = []
+    for index in indices:
+        child_posacts, child_hash = _weave_many_disjoint_replaces(tree.children[index], by_index[index], depth + 1)
+        posacts.extend(child_posacts)
+        replaced_hashes.append(child_hash)
+
+    hash_ = tree.metadata.nout_hash
+    for index, child_hash in zip(indices, replaced_hashes):
+        p, hash_ = calc_possibility(NoteSlur(Replace(index, child_hash), hash_))
+        posacts.append(p)
 
-    return posacts_0 + posacts_1 + [p0] + [p1] + posacts_joint + [calc_actuality(joint_actuality_hash)]
+    return posacts, hash_
 
 
 # TODO: insert_xxx_at: I see a pattern here!
 def insert_text_at(tree, parent_s_address, index, text):
+    posacts, insertion = local_insert_text_at(tree, parent_s_address, index, text)
+    return posacts + bubble_history_up(insertion, tree, parent_s_address)
+
+
+def insert_node_at(tree, parent_s_address, index):
+    posacts, insertion = local_insert_node_at(tree, parent_s_address, index)
+    return posacts + bubble_history_up(insertion, tree, parent_s_address)
+
+
+def replace_text_at(tree, s_address, text):
+    posacts, replacement = local_replace_text_at(tree, s_address, text)
+    return posacts + bubble_history_up(replacement, tree, s_address[:-1])
+
+
+# The local_* variants of the above do not bubble up; they return (posacts, hash) where hash is the new history of the
+# parent node, i.e. the thing to bubble up.
+
+def local_insert_text_at(tree, parent_s_address, index, text):
     parent_node = node_for_s_address(tree, parent_s_address)
 
     pa0, begin = calc_possibility(NoteCapo())
@@ -179,11 +234,10 @@ def insert_text_at(tree, parent_s_address, index, text):
     pa2, insertion = calc_possibility(
         NoteSlur(Insert(index, to_be_inserted), parent_node.metadata.nout_hash))
 
-    posacts = bubble_history_up(insertion, tree, parent_s_address)
-    return [pa0, pa1, pa2] + posacts
+    return [pa0, pa1, pa2], insertion
 
 
-def insert_node_at(tree, parent_s_address, index):
+def local_insert_node_at(tree, parent_s_address, index):
     parent_node = node_for_s_address(tree, parent_s_address)
 
     pa0, begin = calc_possibility(NoteCapo())
@@ -192,11 +246,10 @@ def insert_node_at(tree, parent_s_address, index):
     pa2, insertion = calc_possibility(
         NoteSlur(Insert(index, to_be_inserted), parent_node.metadata.nout_hash))
 
-    posacts = bubble_history_up(insertion, tree, parent_s_address)
-    return [pa0, pa1, pa2] + posacts
+    return [pa0, pa1, pa2], insertion
 
 
-def replace_text_at(tree, s_address, text):
+def local_replace_text_at(tree, s_address, text):
     parent_node = node_for_s_address(tree, s_address[:-1])
 
     pa0, begin = calc_possibility(NoteCapo())
@@ -204,8 +257,7 @@ def replace_text_at(tree, s_address, text):
 
     index = s_address[-1]
 
-    pa2, insertion = calc_possibility(
+    pa2, replacement = calc_possibility(
         NoteSlur(Replace(index, to_be_inserted), parent_node.metadata.nout_hash))
 
-    posacts = bubble_history_up(insertion, tree, s_address[:-1])
-    return [pa0, pa1, pa2] + posacts
+    return [pa0, pa1, pa2], replacement
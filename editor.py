@@ -14,11 +14,12 @@ from filehandler import (
     read_from_file
 )
 
-from posacts import Actuality, HashStoreChannelListener, LatestActualityListener
+from posacts import Actuality, HashStoreChannelListener, LatestActualityListener, PinningActualityListener
 
 from widgets.tree import TreeWidget
 from widgets.history import HistoryWidget
 
+from dsn.editor.session import SessionRecorder
 from dsn.historiography.legato import HistoriographyNoteNoutHash, HistoriographyNoteNout, HistoriographyNoteCapo
 from hashstore import NoutHashStore
 from memoization import Memoization, Stores
@@ -30,7 +31,7 @@ Config.set('kivy', 'exit_on_escape', '0')
 
 class EditorGUI(App):
 
-    def __init__(self, filename):
+    def __init__(self, filename, session_filename=None):
         super(EditorGUI, self).__init__()
 
         self.m = Memoization()
@@ -39,6 +40,8 @@ class EditorGUI(App):
             HistoriographyNoteNoutHash, HistoriographyNoteNout, HistoriographyNoteCapo)
 
         self.filename = filename
+        self.session_filename = session_filename
+        self.session_recorder = None
 
         self.setup_channels()
 
@@ -51,6 +54,7 @@ class EditorGUI(App):
         self.history_channel = ClosableChannel()  # No relation with the T.V. channel of the same name
         self.possible_timelines = HashStoreChannelListener(self.history_channel).possible_timelines
         self.lnh = LatestActualityListener(self.history_channel)
+        PinningActualityListener(self.history_channel, self.m.construct_x)
 
     def do_initial_file_read(self):
         if isfile(self.filename):
@@ -95,15 +99,23 @@ class EditorGUI(App):
         # we kick off with the state so far
         tree.receive_from_channel(Actuality(self.lnh.nout_hash))
 
+        if self.session_filename is not None:
+            self.session_recorder = SessionRecorder(tree.edit_note_channel, self.session_filename, self.lnh.nout_hash)
+
         return self.vertical_layout
 
+    def on_stop(self):
+        if self.session_recorder is not None:
+            self.session_recorder.close()
+
 
 def main():
-    if len(argv) != 2:
-        print("Usage: ", argv[0], "FILENAME")
+    if len(argv) not in [2, 3]:
+        print("Usage: ", argv[0], "FILENAME [SESSION_FILENAME]")
+        print("(if SESSION_FILENAME is given, the editing session is recorded to it; see dsn.editor.session)")
         exit()
 
-    EditorGUI(argv[1]).run()
+    EditorGUI(*argv[1:]).run()
 
 
 if __name__ == "__main__":
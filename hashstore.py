@@ -2,6 +2,8 @@ from collections import namedtuple
 from binascii import unhexlify
 from utils import pmts
 
+import instrumentation
+
 NoutAndHash = namedtuple('NoutAndHash', (
     'nout',
     'nout_hash'))
@@ -35,12 +37,22 @@ class HashStore(object):
         # The ability to store as bytes is guaranteed by the interface of HashStore (it's implied by the fact that we
         # store serializable objects) so it does not impose new constraints on our design.
         self.d[hash_] = bytes_
+
+        if instrumentation.enabled:
+            instrumentation.count("hashstore.add." + self.ObjClass.__name__)
+            instrumentation.count("hashstore.add_bytes." + self.ObjClass.__name__, len(bytes_))
+
         return hash_
 
     def get(self, hash_):
         pmts(hash_, self.Hash)
         if hash_ not in self.d:
             raise KeyError(repr(hash_))
+
+        if instrumentation.enabled:
+            instrumentation.count("hashstore.get." + self.ObjClass.__name__)
+            instrumentation.count("hashstore.get_bytes." + self.ObjClass.__name__, len(self.d[hash_]))
+
         return self.ObjClass.from_stream(iter(self.d[hash_]))
 
     def guess(self, human_readable_hash):
@@ -53,12 +65,23 @@ class HashStore(object):
 
 
 class NoutHashStore(HashStore):
-    """HashStore to store Nouts."""
+    """HashStore to store Nouts.
+
+    Besides the serialized nouts, an index of previous_hashes is kept (filled on `add`); this allows for walking back
+    through history without re-parsing each nout along the way.
+    """
 
     def __init__(self, Hash, Nout, NoutCapo):
         super(NoutHashStore, self).__init__(Hash, Nout)
         self.NoutCapo = NoutCapo
-        self.add(NoutCapo())
+        self.previous_hashes = {}
+        self.capo_hash = self.add(NoutCapo())
+
+    def add(self, nout):
+        nout_hash = super(NoutHashStore, self).add(nout)
+        if not isinstance(nout, self.NoutCapo):
+            self.previous_hashes[nout_hash] = nout.previous_hash
+        return nout_hash
 
     def all_nhtups_for_nout_hash(self, nout_hash):
         pmts(nout_hash, self.Hash)
@@ -71,8 +94,70 @@ class NoutHashStore(HashStore):
             yield NoutAndHash(nout, nout_hash)
             nout_hash = nout.previous_hash
 
+    def previous_hash(self, nout_hash):
+        if nout_hash not in self.previous_hashes:
+            raise KeyError(repr(nout_hash))
+
+        return self.previous_hashes[nout_hash]
+
     def all_preceding_nout_hashes(self, nout_hash):
-        return (t.nout_hash for t in self.all_nhtups_for_nout_hash(nout_hash))
+        pmts(nout_hash, self.Hash)
+
+        while nout_hash != self.capo_hash:
+            previous_hash = self.previous_hash(nout_hash)
+
+            if instrumentation.enabled:
+                instrumentation.count("ancestry_steps." + self.ObjClass.__name__)
+
+            yield nout_hash
+            nout_hash = previous_hash
+
+    def snapshot(self):
+        """Returns the store's contents (including the index of previous_hashes) in terms of bytes only; this is
+        picklable (the Hash classes themselves are not, because they are dynamically created) and can be turned into an
+        identical store using from_snapshot without re-parsing or re-hashing anything."""
+        return (
+            {hash_.as_bytes(): bytes_ for hash_, bytes_ in self.d.items()},
+            {hash_.as_bytes(): previous_hash.as_bytes() for hash_, previous_hash in self.previous_hashes.items()},
+        )
+
+    @classmethod
+    def from_snapshot(cls, Hash, Nout, NoutCapo, snapshot):
+        d, previous_hashes = snapshot
+
+        result = cls(Hash, Nout, NoutCapo)
+        result.d.update({Hash(hash_bytes): bytes_ for hash_bytes, bytes_ in d.items()})
+        result.previous_hashes.update({
+            Hash(hash_bytes): Hash(previous_hash_bytes)
+            for hash_bytes, previous_hash_bytes in previous_hashes.items()})
+        return result
+
+
+class OverlayNoutHashStore(NoutHashStore):
+    """A NoutHashStore on top of another one (the delegate): reads fall through to the delegate, additions are kept in
+    the overlay only. Useful to play with new nouts (e.g. construct trees for them) before deciding to publish them.
+    """
+
+    def __init__(self, delegate):
+        super(OverlayNoutHashStore, self).__init__(delegate.Hash, delegate.ObjClass, delegate.NoutCapo)
+        self.delegate = delegate
+
+    def get(self, hash_):
+        if hash_ in self.d:
+            return super(OverlayNoutHashStore, self).get(hash_)
+        return self.delegate.get(hash_)
+
+    def previous_hash(self, nout_hash):
+        if nout_hash in self.previous_hashes:
+            return self.previous_hashes[nout_hash]
+        return self.delegate.previous_hash(nout_hash)
+
+    def snapshot(self):
+        d, previous_hashes = self.delegate.snapshot()
+        own_d, own_previous_hashes = super(OverlayNoutHashStore, self).snapshot()
+        d.update(own_d)
+        previous_hashes.update(own_previous_hashes)
+        return d, previous_hashes
 
 
 class ReadOnlyHashStore(object):
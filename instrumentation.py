@@ -0,0 +1,142 @@
+"""
+Low-overhead instrumentation of the hot paths: counters and distributions (of which timers are a special case).
+
+Instrumentation is off by default; when it's off, each instrumentation point costs no more than a check of the
+module-level `enabled` flag. It can be turned on in 2 ways:
+
+* programmatically, using `enable()`; results can then be inspected using `snapshot()` or `dump_json()`
+* by setting the environment variable NERF_INSTRUMENTATION (to anything non-empty); in that case the JSON dump is
+    printed to stderr when the process exits.
+
+Names are dotted strings, the first part denoting the kind of thing that's measured, e.g. "memo_hits.construct_x" or
+"hashstore.get_bytes.NoteNout".
+
+>>> enable()
+>>> count("example.things")
+>>> count("example.things", 2)
+>>> observe("example.sizes", 3)
+>>> observe("example.sizes", 5)
+>>> snapshot()
+{'counters': {'example.things': 3}, 'distributions': {'example.sizes': {'count': 2, 'total': 8, 'max': 5}}}
+>>> disable()
+>>> count("example.things")
+>>> snapshot()['counters']
+{'example.things': 3}
+>>> reset()
+>>> snapshot()
+{'counters': {}, 'distributions': {}}
+"""
+
+import atexit
+import os
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+
+ENVIRONMENT_VARIABLE = 'NERF_INSTRUMENTATION'
+
+enabled = False
+
+counters = {}
+distributions = {}  # name => [count, total, max]
+
+
+def enable():
+    global enabled
+    enabled = True
+
+    # imported here to avoid circular imports (construction itself uses the present module for counting)
+    import construction
+    if _construction_hook not in construction.timing_hooks:
+        construction.timing_hooks.append(_construction_hook)
+
+
+def disable():
+    global enabled
+    enabled = False
+
+    import construction
+    if _construction_hook in construction.timing_hooks:
+        construction.timing_hooks.remove(_construction_hook)
+
+
+def reset():
+    counters.clear()
+    distributions.clear()
+
+
+def count(name, amount=1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def observe(name, value):
+    if enabled:
+        if name not in distributions:
+            distributions[name] = [0, 0, value]
+
+        d = distributions[name]
+        d[0] += 1
+        d[1] += value
+        d[2] = max(d[2], value)
+
+
+@contextmanager
+def timed(name):
+    """Observes the elapsed time (in seconds) of the with-block as a distribution."""
+    if not enabled:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, perf_counter() - start)
+
+
+def _construction_hook(name, played_count, elapsed):
+    observe("construct_time." + name, elapsed)
+
+
+def snapshot():
+    return {
+        'counters': dict(counters),
+        'distributions': {
+            name: {'count': c, 'total': total, 'max': max_} for name, (c, total, max_) in distributions.items()},
+    }
+
+
+def hit_rates(counters_=None):
+    """:: {name: hit rate}, for each memoized function that has "memo_hits.<name>" or "memo_misses.<name>" counters (by
+    default: the present counters).
+
+    >>> hit_rates({'memo_hits.f': 3, 'memo_misses.f': 1, 'memo_misses.g': 2, 'other.h': 5})
+    {'f': 0.75, 'g': 0.0}
+    """
+    if counters_ is None:
+        counters_ = counters
+
+    names = sorted({
+        name.split(".", 1)[1] for name in counters_ if name.split(".", 1)[0] in ("memo_hits", "memo_misses")})
+
+    result = {}
+    for name in names:
+        hits = counters_.get("memo_hits." + name, 0)
+        result[name] = hits / (hits + counters_.get("memo_misses." + name, 0))
+    return result
+
+
+def dump_json(file=None):
+    import json  # not imported at the top, because it's relatively expensive and only needed for the actual dump
+    json.dump(snapshot(), file if file is not None else sys.stderr, indent=4, sort_keys=True)
+
+
+def _dump_at_exit():
+    dump_json()
+    sys.stderr.write("\n")
+
+
+if os.environ.get(ENVIRONMENT_VARIABLE):
+    enable()
+    atexit.register(_dump_at_exit)
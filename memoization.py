@@ -10,8 +10,11 @@ particular point in time. This is answered in the nerfy world including the "glo
 component of the cache lookup (sometimes: as the only component).
 
 Assuming that we don't have infinite storage space for our caches, this still leaves other cache-related questions open
-though, such as the question "which caches must be kept around?" (Cache replacement policies) I currently have no such
-policy (we use up as much space as we need).
+though, such as the question "which caches must be kept around?" (Cache replacement policies) For most caches I
+currently have no such policy (we use up as much space as we need). The exceptions are the StridedMemo, which allows for
+a "dumb but effective" policy for the (potentially very long) linear histories of the construct_* functions: keep only
+every k-th step; and the LRUMemo, for the structural analyses of forms (which are cheap to recalculate, but of which
+there's one result per form, i.e. many).
 
 There's also the following idea: if you can just make it faster, rather than caching stuff, that's always preferred.
 Said differently: caching buys you some performance for storage space, but it's a cheap replacement for thinking hard
@@ -25,45 +28,241 @@ we are not yet explicit about which functions rely on this fact for decent perfo
 
 """
 
+from collections import OrderedDict
+
+import instrumentation
+
+# The number of entries in each of the tables for structural analyses (see LRUMemo); this is large enough to hold the
+# analyses of all forms of a large program, and the forms that were recently replaced by edits.
+DEFAULT_ANALYSIS_CAPACITY = 100000
+
+
+# Stores that are created on first access: attribute name => (legato module, prefix of the nout_factory-created names)
+LAZY_STORES = {
+    'historiography_note_nout': ('dsn.historiography.legato', 'HistoriographyNote'),
+    'form_note_nout': ('dsn.form_analysis.legato', 'FormNote'),
+    'form_list_note_nout': ('dsn.form_analysis.legato', 'FormListNote'),
+    'atom_note_nout': ('dsn.form_analysis.legato', 'AtomNote'),
+    'atom_list_note_nout': ('dsn.form_analysis.legato', 'AtomListNote'),
+}
+
 
 class Stores(object):
-    """Keep the various NoutHashStore objects in a single container"""
+    """Keep the various NoutHashStore objects in a single container
+
+    Apart from note_nout, the stores are created on first access (see LAZY_STORES), which means that callers that never
+    use e.g. form analysis don't pay for importing it, nor for creating its stores.
+    """
 
-    def __init__(self, note_nout, historiography_note_nout):
+    def __init__(self, note_nout, historiography_note_nout=None):
         self.note_nout = note_nout
-        self.historiography_note_nout = historiography_note_nout
 
-        # TODO: the organization of construction of the various NoutHashStores is TBD. I've taken an ad hoc approach of
-        # doing it inline for now
+        if historiography_note_nout is not None:
+            self.historiography_note_nout = historiography_note_nout
+
+    def __getattr__(self, attr_name):
+        # __getattr__ is only called for attributes that are not (yet) set on the instance.
+        if attr_name not in LAZY_STORES:
+            raise AttributeError(attr_name)
+
+        from importlib import import_module
         from hashstore import NoutHashStore
-        from dsn.form_analysis.legato import FormNoteNoutHash, FormNoteNout, FormNoteCapo
-        self.form_note_nout = NoutHashStore(FormNoteNoutHash, FormNoteNout, FormNoteCapo)
 
-        from dsn.form_analysis.legato import FormListNoteNoutHash, FormListNoteNout, FormListNoteCapo
-        self.form_list_note_nout = NoutHashStore(FormListNoteNoutHash, FormListNoteNout, FormListNoteCapo)
+        module_name, prefix = LAZY_STORES[attr_name]
+        legato = import_module(module_name)
+
+        store = NoutHashStore(
+            getattr(legato, prefix + "NoutHash"), getattr(legato, prefix + "Nout"), getattr(legato, prefix + "Capo"))
+
+        setattr(self, attr_name, store)
+        return store
+
+
+class StridedMemo(object):
+    """Memoization for structures that are constructed by playing notes from a linear history, one note at a time.
+
+    Rather than storing the structure for each note (i.e. one structure per point in time, which means a full history's
+    worth of structures is kept alive), only the structures at every `stride`-th height (distance from the capo) are
+    stored, as well as any explicitly pinned nout_hashes (e.g. Actualities). A lookup that misses is expected to be
+    answered by the caller by replaying from the nearest stored ancestor, which is at most `stride - 1` notes away.
+
+    The default stride of 1 is equivalent to a plain dict (every structure is stored).
+
+    >>> memo = StridedMemo(3)
+    >>> for height, key in enumerate("abcdefg", 1):
+    ...     memo.remember(key, key.upper(), height)
+    >>> sorted(memo.d.keys())
+    ['c', 'f']
+    >>> memo.height('f')
+    6
+
+    Pinned keys are stored regardless of their height; pinning may happen before the structure is actually seen.
+    >>> memo.pin('h')
+    >>> memo.remember('h', 'H', 8)
+    >>> 'h' in memo, memo['h'], len(memo)
+    (True, 'H', 3)
+
+    Pinning may also happen right after the structure was seen (e.g. the editor constructs a tree before broadcasting
+    it as an Actuality): the most recently remembered structure is kept around for that purpose. Structures that were
+    seen earlier than that, and skipped by the stride, are gone; pinning those has no effect until they're seen again.
+    >>> memo.remember('i', 'I', 10)
+    >>> memo.pin('i')
+    >>> memo['i'], memo.height('i')
+    ('I', 10)
+    >>> memo.pin('g')
+    >>> 'g' in memo
+    False
+    """
+
+    def __init__(self, stride=1):
+        if stride < 1:
+            raise Exception("stride must be a positive integer: %s" % stride)
+
+        self.stride = stride
+        self.d = {}  # key => (value, height)
+        self.pinned = set()
+        self.latest = None  # (key, value, height) of the most recent call to remember
+
+    def __contains__(self, key):
+        return key in self.d
+
+    def __getitem__(self, key):
+        return self.d[key][0]
+
+    def __len__(self):
+        return len(self.d)
+
+    def height(self, key):
+        return self.d[key][1]
+
+    def remember(self, key, value, height):
+        if height % self.stride == 0 or key in self.pinned:
+            self.d[key] = (value, height)
+
+        self.latest = (key, value, height)
 
-        from dsn.form_analysis.legato import AtomNoteNoutHash, AtomNoteNout, AtomNoteCapo
-        self.atom_note_nout = NoutHashStore(AtomNoteNoutHash, AtomNoteNout, AtomNoteCapo)
+    def pin(self, key):
+        self.pinned.add(key)
 
-        from dsn.form_analysis.legato import AtomListNoteNoutHash, AtomListNoteNout, AtomListNoteCapo
-        self.atom_list_note_nout = NoutHashStore(AtomListNoteNoutHash, AtomListNoteNout, AtomListNoteCapo)
+        if self.latest is not None and self.latest[0] == key:
+            self.d[key] = self.latest[1:]
+
+
+_MISSING = object()
+
+
+class LRUMemo(object):
+    """Memoization with a bounded number of entries: when full, the least recently used entry is evicted. Evictions are
+    counted (instrumentation) as "memo_evictions.<name>".
+
+    >>> memo = LRUMemo(2)
+    >>> memo['a'] = 'A'
+    >>> memo['b'] = 'B'
+    >>> memo['a']
+    'A'
+    >>> memo['c'] = 'C'
+    >>> 'a' in memo, 'b' in memo, 'c' in memo, len(memo)
+    (True, False, True, 2)
+    """
+
+    def __init__(self, capacity, name="lru_memo"):
+        if capacity < 1:
+            raise Exception("capacity must be a positive integer: %s" % capacity)
+
+        self.capacity = capacity
+        self.name = name
+        self.d = OrderedDict()  # in order of use, least recent first
+
+    def __contains__(self, key):
+        return key in self.d
+
+    def __getitem__(self, key):
+        self.d.move_to_end(key)
+        return self.d[key]
+
+    def __setitem__(self, key, value):
+        self.d[key] = value
+        self.d.move_to_end(key)
+
+        if len(self.d) > self.capacity:
+            self.d.popitem(last=False)
+            instrumentation.count("memo_evictions." + self.name)
+
+    def __len__(self):
+        return len(self.d)
+
+    def get(self, key, default=None):
+        value = self.d.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+
+        self.d.move_to_end(key)
+        return value
+
+    def setdefault(self, key, value):
+        existing = self.get(key, _MISSING)
+        if existing is not _MISSING:
+            return existing
+
+        self[key] = value
+        return value
 
 
 class Memoization(object):
     """Single point of access for all memoized functions"""
 
-    def __init__(self):
-        self.construct_x = {}
+    def __init__(self, checkpoint_stride=1, analysis_capacity=DEFAULT_ANALYSIS_CAPACITY):
+        # Tables for the functions that construct structures by playing linear histories note-by-note are StridedMemo
+        # objects; checkpoint_stride trades the memory for intermediate structures for the cost of replaying up to
+        # (checkpoint_stride - 1) notes on a miss.
+        self.construct_x = StridedMemo(checkpoint_stride)
         self.construct_y = {}
-        self.construct_historiography = {}
+        self.construct_historiography = StridedMemo(checkpoint_stride)
+
+        # construct_historiography_treenode is a plain dict rather than a StridedMemo: construct_y (and h_utils) rely on
+        # it containing each state (i.e. it is used for application logic, and not just as a cache).
         self.construct_historiography_treenode = {}
+
         self.view_past_from_present = {}
         self.texture_for_text = {}
-        self.construct_form_note = {}
-        self.construct_form_list_note = {}
-        self.construct_atom_note = {}
-        self.construct_atom_list_note = {}
-        self.construct_form = {}
-        self.construct_form_list = {}
-        self.construct_atom = {}
-        self.construct_atom_list = {}
+
+        # These tables hold the whole state of the translation (see construct_analysis_note in into.py): the note and
+        # nout_hash, but also the s_expr and the constructed structure; hence they are strided like the others.
+        self.construct_form_note = StridedMemo(checkpoint_stride)
+        self.construct_form_list_note = StridedMemo(checkpoint_stride)
+        self.construct_atom_note = StridedMemo(checkpoint_stride)
+        self.construct_atom_list_note = StridedMemo(checkpoint_stride)
+        self.construct_form = StridedMemo(checkpoint_stride)
+        self.construct_form_list = StridedMemo(checkpoint_stride)
+        self.construct_atom = StridedMemo(checkpoint_stride)
+        self.construct_atom_list = StridedMemo(checkpoint_stride)
+
+        # Incremental analyses of forms (see e.g. free_variables.py)
+        self.construct_free_variables = StridedMemo(checkpoint_stride)
+        self.construct_free_variables_list = StridedMemo(checkpoint_stride)
+        self.construct_definitions = StridedMemo(checkpoint_stride)
+        self.construct_definitions_list = StridedMemo(checkpoint_stride)
+        self.construct_unused_definitions = StridedMemo(checkpoint_stride)
+
+        # form nout_hash => compiled form (see compiler.py)
+        self.compile_form = LRUMemo(analysis_capacity, "compile_form")
+
+        # Structural analyses of forms, i.e. of a form as it is (not of its history), memoized by the form's nout_hash;
+        # (see memoized_analysis in dsn/form_analysis/utils.py). These are LRUMemo objects, of analysis_capacity each.
+        self.free_variables = LRUMemo(analysis_capacity, "free_variables")
+        self.collect_definitions = LRUMemo(analysis_capacity, "collect_definitions")
+        self.find_lambda_children = LRUMemo(analysis_capacity, "find_lambda_children")
+
+        # Memoized construction of lambda trees (see lexical_addressing_x.py): lambda form nout_hash => LambdaScope;
+        # the same => LambdaTree; (lambda form nout_hash, surrounding addresses) => LexicallyAddressedLambdaTree; the
+        # same => lexical addresses (for MostCompleteLambdaTrees)
+        self.lambda_scope = LRUMemo(analysis_capacity, "lambda_scope")
+        self.lambda_tree = LRUMemo(analysis_capacity, "lambda_tree")
+        self.lexically_addressed_lambda_tree = LRUMemo(analysis_capacity, "lexically_addressed_lambda_tree")
+        self.most_complete_lexical_addresses = LRUMemo(analysis_capacity, "most_complete_lexical_addresses")
+
+        # Name closures (see name_closures.py): lambda form nout_hash => LocalNameClosures; the same, but keyed by the
+        # (frozen) name_dependencies; (LocalNameClosures, parent ScopeNameClosures) => ScopeNameClosures
+        self.local_name_closures = LRUMemo(analysis_capacity, "local_name_closures")
+        self.local_name_closures_by_dependencies = LRUMemo(analysis_capacity, "local_name_closures_by_dependencies")
+        self.scope_name_closures = LRUMemo(analysis_capacity, "scope_name_closures")
@@ -0,0 +1,363 @@
+"""
+Headless command-line access to nerf0 documents (the files that are written by the editor).
+
+Kivy (and anything in widgets.*) is never imported from here, which makes the present tool usable on machines without a
+display, and quick to start.
+
+Usage examples:
+
+    python nerf.py tree FILENAME [--style flat|lispy|todo]
+    python nerf.py history FILENAME
+    python nerf.py eval FILENAME
+    python nerf.py stats FILENAME
+    python nerf.py check-merges FILENAME [TRIPLES_FILENAME] [--workers N]
+    python nerf.py analyze FILENAME
+"""
+
+import argparse
+import json
+import sys
+from binascii import hexlify
+from time import perf_counter
+
+from channel import ClosableChannel
+from filehandler import read_from_file
+from memoization import Memoization, Stores
+from posacts import Possibility, Actuality, HashStoreChannelListener, LatestActualityListener, PinningActualityListener
+
+from dsn.s_expr.construct_x import construct_x
+from dsn.s_expr.structure import TreeText, pp_flat, pp_2, pp_todo
+
+
+class Document(object):
+    """A document, as loaded from a file: all its possibilities, and the latest actuality."""
+
+    def __init__(self, filename):
+        self.m = Memoization()
+        self.possibility_count = 0
+        self.actuality_count = 0
+
+        history_channel = ClosableChannel()
+        self.possible_timelines = HashStoreChannelListener(history_channel).possible_timelines
+        self.lnh = LatestActualityListener(history_channel)
+        PinningActualityListener(history_channel, self.m.construct_x)
+        history_channel.connect(self._count)
+
+        read_from_file(filename, history_channel)
+
+        self.stores = Stores(self.possible_timelines)
+
+    def _count(self, data):
+        if isinstance(data, Possibility):
+            self.possibility_count += 1
+        if isinstance(data, Actuality):
+            self.actuality_count += 1
+
+    @property
+    def nout_hash(self):
+        return self.lnh.nout_hash
+
+    def tree(self):
+        return construct_x(self.m, self.stores, self.nout_hash)
+
+
+def pp_value(value):
+    # imported here, like all of form_analysis, only for the subcommands that need it
+    from dsn.form_analysis.evaluator import BuiltinProcedure, CompoundProcedure
+
+    if isinstance(value, (BuiltinProcedure, CompoundProcedure)):
+        return "<procedure>"
+
+    if isinstance(value, str):
+        return '"' + value
+
+    return repr(value)
+
+
+def do_tree(document, args):
+    tree = document.tree()
+
+    if args.style == 'lispy':
+        print(pp_2(tree, 0))
+    elif args.style == 'todo':
+        print(pp_todo(tree, 0))
+    else:
+        print(pp_flat(tree))
+
+
+def do_history(document, args):
+    from debug_tools import print_nouts_2
+    print(print_nouts_2(document.possible_timelines, document.nout_hash, 0, set()))
+
+
+def top_level_s_exprs(tree):
+    """The program's top-level forms (as s-expressions) for a document's tree: the root itself if it is a form, the
+    root's children if the root is a list of forms.
+
+    The root is taken to be a form when it's an atom, or when its first child is an atom (e.g. `(define ...)` or
+    `(+ ...)`); a list of forms starts with a list (e.g. `((define ...) (+ ...))`), or is empty."""
+    if isinstance(tree, TreeText) or (tree.children != [] and isinstance(tree.children[0], TreeText)):
+        return [tree]
+
+    return tree.children
+
+
+def do_eval(document, args):
+    """Evaluates the document's top-level forms (see top_level_s_exprs) in a single shared environment."""
+    from dsn.form_analysis.construct import construct_form
+    from dsn.form_analysis.evaluator import SpecialValue, builtins_frame
+    from dsn.form_analysis.stack_evaluator import evaluate
+    from dsn.form_analysis.into import construct_form_note
+
+    environment = builtins_frame()
+
+    for s_expr in top_level_s_exprs(document.tree()):
+        form_note, form_note_nout_hash = construct_form_note(document.m, document.stores, s_expr.metadata.nout_hash)
+        form = construct_form(document.m, document.stores, form_note_nout_hash)
+
+        try:
+            value = evaluate(form, environment)
+        except Exception as e:
+            print("%s => error: %s" % (pp_flat(s_expr), e))
+            return 1
+
+        if not isinstance(value, SpecialValue):
+            print("%s => %s" % (pp_flat(s_expr), pp_value(value)))
+
+
+def tree_stats(node, depth=0):
+    """Returns (node_count, text_count, max_depth)"""
+    if isinstance(node, TreeText):
+        return 0, 1, depth
+
+    node_count, text_count, max_depth = 1, 0, depth
+    for child in node.children:
+        n, t, d = tree_stats(child, depth + 1)
+        node_count, text_count, max_depth = node_count + n, text_count + t, max(max_depth, d)
+
+    return node_count, text_count, max_depth
+
+
+def do_stats(document, args):
+    node_count, text_count, max_depth = tree_stats(document.tree())
+
+    for key, value in [
+            ("possibilities", document.possibility_count),
+            ("actualities", document.actuality_count),
+            ("distinct nouts", len(document.possible_timelines.d)),
+            ("current history length", len(list(document.possible_timelines.all_preceding_nout_hashes(
+                document.nout_hash)))),
+            ("nodes", node_count),
+            ("texts", text_count),
+            ("depth", max_depth)]:
+        print("%s: %s" % (key, value))
+
+
+def parse_nout_hash(document, s):
+    """Parses a NoteNoutHash, either as a full (64 hex digits) hash, or as printed by e.g. `history` (12 hex digits)."""
+    from binascii import unhexlify
+    from dsn.s_expr.legato import NoteNoutHash
+
+    if len(s) == 64:
+        return NoteNoutHash(unhexlify(s))
+
+    if not hasattr(document, '_nout_hashes_by_repr'):
+        document._nout_hashes_by_repr = {repr(h): h for h in document.possible_timelines.d}
+
+    if s not in document._nout_hashes_by_repr:
+        raise Exception("Unknown nout_hash: %s" % s)
+
+    return document._nout_hashes_by_repr[s]
+
+
+def _read_triples_lines(f):
+    return [line.split() for line in f if line.strip() and not line.startswith('#')]
+
+
+def do_check_merges(document, args):
+    """Checks, for each line of the form `POD NOUT_HASH_0 NOUT_HASH_1` in the triples file, whether the 2 branches can
+    be woven; prints a line (in the same order) for each."""
+    from dsn.s_expr.merge_checks import check_double_edges, pp_throughput_report
+
+    if args.triples == '-':
+        lines = _read_triples_lines(sys.stdin)
+    else:
+        with open(args.triples) as f:
+            lines = _read_triples_lines(f)
+
+    triples = [tuple(parse_nout_hash(document, s) for s in line) for line in lines]
+    for line, triple in zip(lines, triples):
+        if len(triple) != 3:
+            raise Exception("Expected 3 nout_hashes per line: %s" % " ".join(line))
+
+    results, report = check_double_edges(document.stores, triples, args.workers)
+
+    for line, (ok, problems) in zip(lines, results):
+        print("%s: %s" % (" ".join(line), "ok" if ok else problems))
+
+    sys.stderr.write(pp_throughput_report(report) + "\n")
+    return 0 if all(ok for ok, problems in results) else 1
+
+
+class StreamingAnalysis(object):
+    """Analyses the document at each Actuality as it is read from a file (i.e. without loading the whole file first),
+    writing a line of JSON per Actuality to `out`.
+
+    The program's top-level forms are taken from the document as in `eval` (see top_level_s_exprs). The memoization is
+    shared between the Actualities, and the analyses are incremental (per top-level form for the free variables and the
+    definitions; per lambda for the unused definitions; per scope for the lexical addressing), which means that the cost
+    of each step tracks the size of the change rather than that of the document.
+
+    Unused definitions are reported per scope, in pre-order (as the lexical addressing is); definitions that are used
+    only by their own definition (recursively) are reported as unused."""
+
+    def __init__(self, out):
+        from dsn.form_analysis.loosely_coupled import analysis_graph
+
+        self.out = out
+        self.analysis_graph = analysis_graph
+        self.m = Memoization()
+        self.actuality_count = 0
+        self.scope_tree = None
+
+        # s-expr nout_hash (of a top-level form) => (definitions, free variables, form); for the present Actuality only
+        self.top_level_forms = {}
+
+        self.history_channel = ClosableChannel()
+        self.possible_timelines = HashStoreChannelListener(self.history_channel).possible_timelines
+        self.stores = Stores(self.possible_timelines)
+        self.history_channel.connect(self.receive)
+
+    def read(self, filename):
+        read_from_file(filename, self.history_channel)
+
+    def receive(self, data):
+        if isinstance(data, Actuality):
+            self.out.write(json.dumps(self.analyze(data.nout_hash), sort_keys=True) + "\n")
+            self.actuality_count += 1
+
+    def analyze(self, nout_hash):
+        from collections import Counter
+
+        from dsn.form_analysis.collect_definitions import construct_definitions
+        from dsn.form_analysis.construct import construct_form
+        from dsn.form_analysis.free_variables import construct_free_variables
+        from dsn.form_analysis.into import construct_form_note
+        from dsn.form_analysis.lexical_addressing_x import construct_lambda_tree_memoized
+        from dsn.form_analysis.loosely_coupled import tick
+        from dsn.form_analysis.structure import FormList, LambdaForm, SymbolList
+        from dsn.form_analysis.unused_definitions import self_used_definitions
+
+        m, stores = self.m, self.stores
+        s_exprs = top_level_s_exprs(construct_x(m, stores, nout_hash))
+
+        # Only the present Actuality's top-level forms are kept (reusing the previous Actuality's where unchanged)
+        previous_top_level_forms, self.top_level_forms = self.top_level_forms, {}
+
+        for s_expr in s_exprs:
+            key = s_expr.metadata.nout_hash
+            if key in previous_top_level_forms:
+                self.top_level_forms[key] = previous_top_level_forms[key]
+            elif key not in self.top_level_forms:
+                form_nout_hash = construct_form_note(m, stores, key)[1]
+                self.top_level_forms[key] = (
+                    construct_definitions(m, stores, form_nout_hash),
+                    construct_free_variables(m, stores, form_nout_hash).names,
+                    construct_form(m, stores, form_nout_hash),
+                    )
+
+        top_level_forms = [self.top_level_forms[s_expr.metadata.nout_hash] for s_expr in s_exprs]
+
+        defined = set().union(*[definitions for definitions, _, _ in top_level_forms])
+        used = set().union(*[names for _, names, _ in top_level_forms])
+        counts = Counter(name for _, names, _ in top_level_forms for name in names)
+
+        # The top-level forms are analysed as the body of a parameter-less lambda
+        program = LambdaForm(SymbolList([]), FormList([form for _, _, form in top_level_forms]))
+        self.scope_tree, work = tick(self.analysis_graph, self.scope_tree, program, self.actuality_count)
+
+        top_level_unused = (defined - used) | self_used_definitions(
+            [definitions for definitions, _, _ in top_level_forms], [names for _, names, _ in top_level_forms], counts)
+
+        unused_definitions = [sorted(top_level_unused)]
+        for child in construct_lambda_tree_memoized(m, program).children:
+            unused_definitions.extend(self.unused_definitions_in_preorder(child))
+
+        return {
+            "actuality": self.actuality_count,
+            "nout_hash": str(hexlify(nout_hash.as_bytes()), 'utf-8'),
+            "free_variables": sorted(used - defined),
+            "unused_definitions": unused_definitions,
+            "lexical_addressing": lexical_addressing_in_preorder(self.scope_tree),
+        }
+
+    def unused_definitions_in_preorder(self, lambda_tree):
+        from dsn.form_analysis.unused_definitions import construct_unused_definitions, unused_or_self_used_definitions
+
+        structure = construct_unused_definitions(self.m, self.stores, lambda_tree.lambda_form.metadata.nout_hash)
+        result = [sorted(unused_or_self_used_definitions(structure))]
+        for child in lambda_tree.children:
+            result.extend(self.unused_definitions_in_preorder(child))
+        return result
+
+
+def lexical_addressing_in_preorder(scope_tree):
+    """The lexical addressing of each of the scopes, in pre-order (i.e. the outermost scope first)"""
+    result = [scope_tree.output('lexical_addressing')]
+    for child in scope_tree.children:
+        result.extend(lexical_addressing_in_preorder(child))
+    return result
+
+
+def do_analyze(filename, args):
+    """Prints a line of JSON with the analyses for each Actuality in the file; see StreamingAnalysis."""
+    start = perf_counter()
+
+    analysis = StreamingAnalysis(sys.stdout)
+    analysis.read(filename)
+
+    seconds = perf_counter() - start
+    sys.stderr.write("%s actualities in %.3fs (%.1f actualities/s)\n" % (
+        analysis.actuality_count, seconds, analysis.actuality_count / seconds if seconds else 0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nerf", description="Headless access to nerf0 documents.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    tree_parser = subparsers.add_parser("tree", help="print the current tree")
+    tree_parser.add_argument("--style", choices=["flat", "lispy", "todo"], default="flat")
+    tree_parser.set_defaults(f=do_tree)
+
+    subparsers.add_parser("history", help="print the current tree's history").set_defaults(f=do_history)
+    subparsers.add_parser("eval", help="evaluate the document's top-level forms").set_defaults(f=do_eval)
+    subparsers.add_parser("stats", help="report statistics about the document").set_defaults(f=do_stats)
+
+    check_merges_parser = subparsers.add_parser(
+        "check-merges", help="check which pairs of branches can be woven (see do_check_merges)")
+    check_merges_parser.add_argument("--workers", type=int, default=None, help="number of processes (default: #CPUs)")
+    check_merges_parser.set_defaults(f=do_check_merges)
+
+    # analyze streams through the file, rather than loading a Document
+    subparsers.add_parser(
+        "analyze", help="analyse the document at each actuality, printing JSON lines").set_defaults(
+        f=do_analyze, streaming=True)
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("filename")
+
+    check_merges_parser.add_argument("triples", nargs="?", default="-", help="file with triples (default: stdin)")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_usage()
+        return 2
+
+    if getattr(args, 'streaming', False):
+        return args.f(args.filename, args) or 0
+
+    return args.f(Document(args.filename), args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
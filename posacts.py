@@ -20,7 +20,14 @@ class PosAct(object):
     @staticmethod
     def all_from_stream(byte_stream):
         while True:
-            yield PosAct.from_stream(byte_stream)  # Transparently yields the StopIteration at the lower level
+            try:
+                posact = PosAct.from_stream(byte_stream)
+            except StopIteration:
+                # The lower level's StopIteration signals the end of the stream; since PEP 479 it may no longer simply
+                # bubble up through the present generator.
+                return
+
+            yield posact
 
 
 class Possibility(object):
@@ -77,3 +84,19 @@ class LatestActualityListener(object):
         # Receives: Possibility | Actuality; the latter are stored, the former ignored.
         if isinstance(data, Actuality):
             self.nout_hash = data.nout_hash
+
+
+class PinningActualityListener(object):
+    def __init__(self, channel, memo):
+        # memo: a StridedMemo keyed by NoteNoutHash (i.e. m.construct_x); pinning the Actualities ensures that the
+        # "present" structures are never subject to the memo's stride. Actualities may be broadcast right after their
+        # structure was constructed; StridedMemo.pin handles that case too.
+        self.memo = memo
+
+        # receive-only connection
+        channel.connect(self.receive)
+
+    def receive(self, data):
+        # Receives: Possibility | Actuality; the latter are pinned, the former ignored.
+        if isinstance(data, Actuality):
+            self.memo.pin(data.nout_hash)
@@ -8,10 +8,14 @@ import vlq
 import utils
 import s_address
 import vim
+import memoization
+import instrumentation
 
 from dsn.s_expr import utils as s_expr_utils
 from dsn.s_expr import from_python as s_expr_from_python
 from dsn.viewports import utils as viewports_utils
+from dsn.form_analysis import utils as form_analysis_utils
+from benchmarks import generator as benchmarks_generator
 
 
 def load_tests(loader, tests, ignore):
@@ -25,21 +29,41 @@ def load_tests(loader, tests, ignore):
     tests.addTests(doctest.DocTestSuite(s_expr_utils))
     tests.addTests(doctest.DocTestSuite(vim))
     tests.addTests(doctest.DocTestSuite(viewports_utils))
+    tests.addTests(doctest.DocTestSuite(form_analysis_utils))
     tests.addTests(doctest.DocTestSuite(s_expr_from_python))
+    tests.addTests(doctest.DocTestSuite(memoization))
+    tests.addTests(doctest.DocTestSuite(instrumentation))
+    tests.addTests(doctest.DocTestSuite(benchmarks_generator))
 
     # Some tests in the doctests style are too large to nicely fit into a docstring; better to keep them separate:
     tests.addTests(doctest.DocFileSuite("doctests/construct_x.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/construct_y.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/h_utils.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/unambiguous_weaving.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/weave_many_disjoint_replaces.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/uw_multi_edge.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/merge_checks.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/form_analysis_into.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/form_analysis_construct.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/evaluator.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/stack_evaluator.txt", optionflags=doctest.ELLIPSIS))
+    tests.addTests(doctest.DocFileSuite("doctests/compiler.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/addressed_compiler.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/bytecode.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/incremental_evaluation.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/free_variables.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/structural_analyses.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/unused_definitions.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/name_dependencies.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/lexical_addressing_x.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/lexical_addressing_memoized.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/name_closures.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/loosely_coupled.txt"))
     tests.addTests(doctest.DocFileSuite("doctests/concoct.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/edit_transaction.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/edit_session.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/nerf.txt"))
+    tests.addTests(doctest.DocFileSuite("doctests/import_budget.txt"))
 
     return tests
 
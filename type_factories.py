@@ -1,5 +1,8 @@
 from binascii import hexlify
 from hashlib import sha256
+from time import perf_counter
+
+import instrumentation
 
 from utils import pmts, rfs
 
@@ -35,6 +38,13 @@ def hash_factory(clazz, name_prefix):
         @staticmethod
         def _for_bytes(bytes_):
             pmts(bytes_, bytes)
+
+            if instrumentation.enabled:
+                start = perf_counter()
+                hash_ = sha256(bytes_).digest()
+                instrumentation.observe("sha256_time", perf_counter() - start)
+                return Hash(hash_)
+
             hash_ = sha256(bytes_).digest()
             return Hash(hash_)
 
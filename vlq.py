@@ -25,6 +25,19 @@ arranged most significant first in a stream.
        16384: b'\x81\x80\x00'
   1234567890: b'\x84\xcc\xd8\x85R'
 
+VLQs are unsigned; signed integers are mapped onto them by "zigzagging" (0, -1, 1, -2, 2, ... map to 0, 1, 2, 3, 4...),
+which keeps numbers of small magnitude short:
+
+>>> for i in [0, -1, 1, -64, 64]:
+...     print("%12d: %s" % (i, to_signed_vlq(i)))
+...     assert from_signed_vlq(iter(to_signed_vlq(i))) == i
+...
+           0: b'\x00'
+          -1: b'\x01'
+           1: b'\x02'
+         -64: b'\x7f'
+          64: b'\x81\x00'
+
 """
 
 from utils import pmts
@@ -60,3 +73,13 @@ def from_vlq(bytes_stream):
             return result
 
         result *= 128
+
+
+def to_signed_vlq(i):
+    pmts(i, int)
+    return to_vlq(i * 2 if i >= 0 else -i * 2 - 1)
+
+
+def from_signed_vlq(bytes_stream):
+    zigzagged = from_vlq(bytes_stream)
+    return zigzagged // 2 if zigzagged % 2 == 0 else -(zigzagged + 1) // 2
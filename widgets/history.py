@@ -7,6 +7,8 @@ from kivy.metrics import pt
 from kivy.uix.behaviors.focus import FocusBehavior
 from kivy.uix.widget import Widget
 
+import instrumentation
+
 from dsn.historiography.legato import (
     HistoriographyNoteNoutHash,
     HistoriographyNoteSlur,
@@ -296,8 +298,9 @@ class HistoryWidget(FocusBehavior, Widget):
         self.viewport_ds = play_viewport_note(note, self.viewport_ds)
 
     def _construct_box_structure(self):
-        offset_nonterminals = self.draw_past_from_present(self.ds.annotated_hashes, ColWidths(0, 0, 30, 250), [])
-        self.box_structure = annotate_boxes_with_s_addresses(BoxNonTerminal(offset_nonterminals, []), [])
+        with instrumentation.timed("layout_time.HistoryWidget"):
+            offset_nonterminals = self.draw_past_from_present(self.ds.annotated_hashes, ColWidths(0, 0, 30, 250), [])
+            self.box_structure = annotate_boxes_with_s_addresses(BoxNonTerminal(offset_nonterminals, []), [])
 
     def refresh(self, *args):
         # As it stands: _PURE_ copy-pasta from TreeWidget;
@@ -311,7 +314,8 @@ class HistoryWidget(FocusBehavior, Widget):
             Rectangle(pos=self.pos, size=self.size,)
 
         with apply_offset(self.canvas, self.offset):
-            self._render_box(self.box_structure.underlying_node)
+            with instrumentation.timed("render_time.HistoryWidget"):
+                self._render_box(self.box_structure.underlying_node)
 
         self._invalidated = False
 
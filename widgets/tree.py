@@ -7,6 +7,7 @@ from kivy.uix.widget import Widget
 from kivy.metrics import pt
 from kivy.uix.behaviors.focus import FocusBehavior
 
+import instrumentation
 from annotations import Annotation
 from channel import Channel, ClosableChannel
 
@@ -205,6 +206,9 @@ class TreeWidget(FocusBehavior, Widget):
 
         self.cursor_channel = Channel()
 
+        # Broadcasts (s_cursor, edit_note, new_s_cursor) for each EditNote that's played; e.g. for recording sessions
+        self.edit_note_channel = ClosableChannel()
+
         self.send_to_channel, _ = self.history_channel.connect(self.receive_from_channel, self.channel_closed)
 
         self.bind(pos=self.invalidate)
@@ -277,7 +281,9 @@ class TreeWidget(FocusBehavior, Widget):
         self.cursor_channel.broadcast(do_create)
 
     def _handle_edit_note(self, edit_note):
+        s_cursor = self.ds.s_cursor[:]  # copied, because edit_note_play may modify it in-place
         new_s_cursor, posacts, error = edit_note_play(self.ds, edit_note)
+        self.edit_note_channel.broadcast((s_cursor, edit_note, new_s_cursor))
         self._update_internal_state_for_posacts(posacts, new_s_cursor, user_moved_cursor=True)
 
     def _handle_selection_note(self, selection_note):
@@ -716,7 +722,8 @@ class TreeWidget(FocusBehavior, Widget):
         self.invalidate()
 
     def _construct_box_structure(self):
-        self.box_structure = annotate_boxes_with_s_addresses(self._nts_for_pp_annotated_node(self.ds.pp_tree), [])
+        with instrumentation.timed("layout_time.TreeWidget"):
+            self.box_structure = annotate_boxes_with_s_addresses(self._nts_for_pp_annotated_node(self.ds.pp_tree), [])
 
     def refresh(self, *args):
         """refresh means: redraw (I suppose we could rename, but I believe it's "canonical Kivy" to use 'refresh')"""
@@ -733,7 +740,8 @@ class TreeWidget(FocusBehavior, Widget):
         self.offset = (self.pos[X], self.pos[Y] + self.size[Y] + self.viewport_ds.get_position())
 
         with apply_offset(self.canvas, self.offset):
-            self._render_box(self.box_structure.underlying_node)
+            with instrumentation.timed("render_time.TreeWidget"):
+                self._render_box(self.box_structure.underlying_node)
 
         self._invalidated = False
 